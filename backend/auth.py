@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+import asyncio
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -7,11 +8,31 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
 from dotenv import load_dotenv
 
+from pools import ProcessPool
+
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes at any other cost are upgraded (or downgraded) on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 security = HTTPBearer()
 
+# bcrypt is CPU-bound by design, so it runs in its own process pool. At most
+# PASSWORD_HASH_MAX_PENDING calls may be running or queued; callers wait up to
+# PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot before getting a 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", PASSWORD_HASH_WORKERS * 8))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 5))
+
+hash_pool = ProcessPool(PASSWORD_HASH_WORKERS)
+_hash_slots: Optional[asyncio.Semaphore] = None
+
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRATION_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", 24))
@@ -22,6 +43,39 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a new hash when the stored one uses a different cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def _run_in_hash_pool(fn, *args):
+    global _hash_slots
+    if _hash_slots is None:
+        _hash_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await hash_pool.run(fn, *args)
+    finally:
+        _hash_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run_in_hash_pool(verify_and_update_password, plain_password, hashed_password)
+
+def shutdown_hash_pool():
+    global _hash_slots
+    hash_pool.shutdown()
+    _hash_slots = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,233 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import os
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from blobs import store_profile_picture
+from cache import response_cache
+from categories import category_ids, store_category_id
+from database import contacts_collection
+from importers import DUPLICATE_KEY_ERROR, describe_validation_error
+from models import BatchOperation, Contact, ContactCreate, ContactUpdate
+from normalize import normalize_name, normalize_phones
+from search import tokens_for_document
+from stats import category_key, record_contact_changes
+from sync import record_deletions
+
+MAX_BATCH_OPERATIONS = int(os.getenv("MAX_BATCH_OPERATIONS", 1000))
+# Updating any of these fields requires recomputing search_tokens
+SEARCHABLE_FIELDS = {"name", "phones", "emails", "notes"}
+# Fields read up front for every contact a batch updates or deletes
+PREFETCH_PROJECTION = {
+    "_id": 0, "contact_id": 1, "category": 1, "category_id": 1, "name": 1, "phones": 1, "emails": 1, "notes": 1,
+}
+
+async def build_contact_update(
+    existing: Dict[str, Any],
+    update_data: Dict[str, Any],
+    categories: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    $set document for applying a ContactUpdate's fields to an existing contact.
+    A new category name must be among `categories` (see categories.category_ids).
+    """
+    update_data["updated_at"] = datetime.utcnow()
+    if "category" in update_data:
+        store_category_id(update_data, categories or {})
+    if update_data.get("name") is not None:
+        update_data["name_key"] = normalize_name(update_data["name"])
+    update_data = await store_profile_picture(update_data)
+    if SEARCHABLE_FIELDS & update_data.keys():
+        update_data["search_tokens"] = tokens_for_document({**existing, **update_data})
+    if "phones" in update_data:
+        update_data["phone_e164"] = normalize_phones(p.get("number", "") for p in update_data["phones"] or [])
+    return update_data
+
+def _result(index: int, op: BatchOperation, status: int, contact_id: Optional[str] = None,
+            error: Optional[str] = None) -> Dict[str, Any]:
+    result = {"index": index, "op": op.op, "contact_id": contact_id or op.contact_id, "status": status}
+    if error:
+        result["error"] = error
+    return result
+
+class ContactBatch:
+    """
+    Applies a list of create/update/delete operations with one bulk_write.
+
+    Every operation is validated like its single-contact endpoint. The
+    contacts being updated or deleted are read with a single query, so a
+    batch costs a handful of round trips however many operations it holds.
+    With `ordered`, the first failure stops the batch and later operations
+    are reported as not executed (424).
+    """
+
+    def __init__(self, user_id: str, operations: List[BatchOperation], ordered: bool = True):
+        self.user_id = user_id
+        self.operations = operations
+        self.ordered = ordered
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+        # (index, contact it touches, validated data) of each operation that passed _check
+        self.planned: List[Tuple[int, Optional[Dict[str, Any]], Any]] = []
+        self.requests = []
+        # Index into `operations` and category changes of each queued write
+        self.queued: List[int] = []
+        self.changes: Dict[int, tuple] = {}
+        self.category_ids: Dict[str, str] = {}
+
+    async def _category_ids(self) -> Dict[str, str]:
+        """
+        Ids for the category names the planned operations write. Names are only
+        created for operations that passed validation and found their contact.
+        """
+        names = set()
+        for index, _, data in self.planned:
+            op = self.operations[index]
+            if op.op == "create":
+                names.add(data.category)
+            elif op.op == "update" and "category" in data:
+                names.add(data["category"])
+        # Validated by ContactCreate/ContactUpdate, but never let a stray value reach the lookup
+        return await category_ids(self.user_id, [name for name in names if name is None or isinstance(name, str)])
+
+    async def _existing(self) -> Dict[str, Dict[str, Any]]:
+        ids = {op.contact_id for op in self.operations if op.op != "create" and op.contact_id}
+        if not ids:
+            return {}
+        cursor = contacts_collection.find(
+            {"user_id": self.user_id, "contact_id": {"$in": list(ids)}}, PREFETCH_PROJECTION
+        )
+        return {doc["contact_id"]: doc async for doc in cursor}
+
+    def _check(self, index: int, op: BatchOperation, existing: Dict[str, Dict[str, Any]]):
+        """Validate one operation and plan it, or return its error result."""
+        if op.op == "create":
+            self.planned.append((index, None, ContactCreate(**op.data)))
+            return None
+
+        if not op.contact_id:
+            return _result(index, op, 400, error="contact_id is required")
+        current = existing.get(op.contact_id)
+        if current is None:
+            return _result(index, op, 404, error="Contact not found")
+
+        if op.op == "delete":
+            # Later operations in the batch see the contact as gone
+            del existing[op.contact_id]
+            self.planned.append((index, current, None))
+        else:
+            self.planned.append((index, current, ContactUpdate(**op.data).dict(exclude_unset=True)))
+        return None
+
+    async def _queue(self, index: int, current: Optional[Dict[str, Any]], data: Any):
+        """Queue the write for one planned operation."""
+        op = self.operations[index]
+        if op.op == "create":
+            contact = Contact(user_id=self.user_id, **data.dict())
+            doc = store_category_id(await store_profile_picture(contact.dict()), self.category_ids)
+            self.requests.append(InsertOne(doc))
+            self.queued.append(index)
+            self.changes[index] = (Counter([doc["category_id"]]), Counter())
+            self.results[index] = _result(index, op, 201, contact.contact_id)
+            return
+
+        selector = {"contact_id": op.contact_id, "user_id": self.user_id}
+        if op.op == "delete":
+            self.requests.append(DeleteOne(selector))
+            self.changes[index] = (Counter(), Counter([category_key(current)]))
+            status = 204
+        else:
+            fields = await build_contact_update(current, data, self.category_ids)
+            self.requests.append(UpdateOne(selector, {"$set": fields}))
+            self.changes[index] = (Counter([fields.get("category_id", category_key(current))]),
+                                   Counter([category_key(current)]))
+            # A later update of the same contact builds on this one
+            current.update(fields)
+            status = 200
+        self.queued.append(index)
+        self.results[index] = _result(index, op, status)
+
+    async def run(self) -> Dict[str, Any]:
+        existing = await self._existing()
+        stopped = False
+        for index, op in enumerate(self.operations):
+            if stopped:
+                self.results[index] = _result(index, op, 424, error="Not executed: an earlier operation failed")
+                continue
+            try:
+                error = self._check(index, op, existing)
+            except ValidationError as e:
+                error = _result(index, op, 400, error=describe_validation_error(e))
+            if error:
+                self.results[index] = error
+                stopped = self.ordered
+
+        self.category_ids = await self._category_ids()
+        # Every planned operation came before any validation failure
+        stopped = False
+        for index, current, data in self.planned:
+            op = self.operations[index]
+            if stopped:
+                self.results[index] = _result(index, op, 424, error="Not executed: an earlier operation failed")
+                continue
+            try:
+                await self._queue(index, current, data)
+            except HTTPException as e:
+                # A profile picture is only decoded once its operation is queued
+                self.results[index] = _result(index, op, e.status_code, error=e.detail)
+                stopped = self.ordered
+
+        failed = set()
+        if self.requests:
+            try:
+                await contacts_collection.bulk_write(self.requests, ordered=self.ordered)
+            except BulkWriteError as e:
+                failed = self._apply_write_errors(e)
+
+        added, removed = Counter(), Counter()
+        deleted = []
+        for index in self.queued:
+            if index not in failed:
+                added.update(self.changes[index][0])
+                removed.update(self.changes[index][1])
+                if self.operations[index].op == "delete":
+                    deleted.append(self.operations[index].contact_id)
+        await record_contact_changes(self.user_id, added=added, removed=removed)
+        await record_deletions(self.user_id, deleted)
+        response_cache.invalidate_user(self.user_id)
+        return self.summary()
+
+    def _apply_write_errors(self, e: BulkWriteError) -> set:
+        failed = set()
+        for err in e.details.get("writeErrors", []):
+            index = self.queued[err["index"]]
+            failed.add(index)
+            op = self.operations[index]
+            if err.get("code") == DUPLICATE_KEY_ERROR:
+                message, status = "Contact with this name already exists", 400
+            else:
+                message, status = err.get("errmsg", "Write failed"), 500
+            # A failed create has no contact to point at
+            self.results[index] = _result(index, op, status, error=message)
+        if self.ordered and failed:
+            # An ordered bulk_write stops at its first error
+            first = min(failed)
+            for index in self.queued:
+                if index > first:
+                    failed.add(index)
+                    self.results[index] = _result(
+                        index, self.operations[index], 424, error="Not executed: an earlier operation failed"
+                    )
+        return failed
+
+    def summary(self) -> Dict[str, Any]:
+        succeeded = sum(1 for result in self.results if result["status"] < 300)
+        return {
+            "succeeded": succeeded,
+            "failed": len(self.results) - succeeded,
+            "results": self.results,
+        }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for GET /api/contacts.
+
+Fires parallel list requests at a running server and reports latency
+percentiles. Run it once against a build and once against another to compare:
+
+    python benchmarks/concurrency.py --concurrency 50 --requests 2000 --out after.json
+    python benchmarks/concurrency.py --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed_user(client: httpx.AsyncClient, contacts: int) -> str:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/api/auth/register", json={
+        "email": email, "password": "benchpass123", "name": "Bench User"
+    })
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(contacts):
+        await client.post("/api/contacts", headers=headers, json={
+            "name": f"Bench Contact {i:05d}",
+            "phones": [{"number": f"+1415555{i:04d}", "label": "mobile"}],
+            "emails": [{"email": f"contact{i}@example.com", "label": "work"}],
+        })
+    return token
+
+
+async def run(base_url: str, concurrency: int, total: int, contacts: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        token = await seed_user(client, contacts)
+        headers = {"Authorization": f"Bearer {token}"}
+        latencies = []
+        errors = 0
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get("/api/contacts", headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "endpoint": "/api/contacts",
+        "concurrency": concurrency,
+        "requests": total,
+        "contacts": contacts,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+        print(f"{key:>15}: {before[key]:>10} -> {after[key]:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--contacts", type=int, default=200)
+    parser.add_argument("--out")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    result = asyncio.run(run(args.base_url, args.concurrency, args.requests, args.contacts))
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
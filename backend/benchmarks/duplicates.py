@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Duplicate detection benchmark.
+
+Builds an in-memory contact book (no database needed) with a known set of
+planted duplicates: nickname spellings, reordered names, shared phones in
+different formats and shared emails. Times the blocking + scoring pass that
+GET /api/contacts/duplicates runs and reports how many planted pairs it found:
+
+    python benchmarks/duplicates.py --contacts 100000 --duplicate-ratio 0.03
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from duplicates import find_duplicate_pairs  # noqa: E402
+from models import Contact, EmailAddress, PhoneNumber  # noqa: E402
+
+FIRST = ["John", "Jane", "Alex", "Maria", "Li", "Ahmed", "Olga", "Pierre", "Sofia", "Kenji", "Amara", "Lucas",
+         "Noah", "Emma", "Liam", "Ava", "Mateo", "Chloe", "Omar", "Ines", "Yuki", "Priya", "Tomas", "Zara"]
+LAST = ["Smith", "Garcia", "Nguyen", "Muller", "Rossi", "Kowalski", "Tanaka", "Silva", "Dubois", "Okafor",
+        "Jensen", "Haddad", "Novak", "Costa", "Ivanova", "Fischer", "Moreau", "Sato", "Khan", "Byrne"]
+VARIANTS = {"John": "Jon", "Jane": "Jayne", "Alex": "Alec", "Maria": "Mariah", "Sofia": "Sophia",
+            "Lucas": "Lukas", "Emma": "Ema", "Tomas": "Thomas", "Zara": "Sara"}
+
+def contact_doc(name: str, number: str, email: str) -> dict:
+    doc = Contact(
+        user_id="bench",
+        name=name,
+        phones=[PhoneNumber(number=number)],
+        emails=[EmailAddress(email=email)],
+    ).dict()
+    doc.pop("search_tokens")
+    return doc
+
+def build_book(count: int, duplicate_ratio: float):
+    contacts = []
+    planted = set()
+    for i in range(count):
+        first, last = random.choice(FIRST), random.choice(LAST)
+        digits = f"{random.randint(200, 989)}{random.randint(200, 999)}{i % 10000:04d}"
+        contacts.append(contact_doc(f"{first} {last} {i}", f"+1{digits}", f"{first}.{last}{i}@example.com".lower()))
+        if random.random() < duplicate_ratio:
+            variant = VARIANTS.get(first, first)
+            # Same person typed differently: national format, nickname, maybe reordered
+            name = f"{variant} {last} {i}" if random.random() < 0.7 else f"{last} {variant} {i}"
+            number = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+            contacts.append(contact_doc(name, number, f"{variant}{i}@mail.example".lower()))
+            planted.add((contacts[-2]["contact_id"], contacts[-1]["contact_id"]))
+    return contacts, planted
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=100000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.03)
+    parser.add_argument("--min-score", type=float, default=0.6)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    contacts, planted = build_book(args.contacts, args.duplicate_ratio)
+    built = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pairs, stats = find_duplicate_pairs(contacts, args.min_score)
+    elapsed = time.perf_counter() - started
+
+    found = {tuple(sorted(c["contact_id"] for c in pair["contacts"])) for pair in pairs}
+    recalled = sum(1 for pair in planted if tuple(sorted(pair)) in found)
+    print(json.dumps({
+        **stats,
+        "build_s": round(built, 2),
+        "detect_s": round(elapsed, 2),
+        "pairs_found": len(pairs),
+        "planted": len(planted),
+        "planted_recalled": recalled,
+        "pairs_per_contact_compared": round(stats["compared"] / max(len(contacts), 1), 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Login storm benchmark.
+
+Sends a burst of concurrent logins to a running server while a second set of
+clients keeps calling a cheap authenticated endpoint, and reports login
+throughput alongside the latency those other requests saw during the storm:
+
+    python benchmarks/login_storm.py --logins 200 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+from concurrency import percentile
+
+async def run(base_url: str, logins: int, concurrency: int, probes: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        credentials = {"email": f"storm-{uuid.uuid4().hex[:8]}@example.com", "password": "stormpass123"}
+        response = await client.post("/api/auth/register", json={**credentials, "name": "Storm"})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        login_latencies, probe_latencies = [], []
+        statuses = {}
+        remaining = logins
+        storm_done = asyncio.Event()
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                r = await client.post("/api/auth/login", json=credentials)
+                login_latencies.append((time.perf_counter() - start) * 1000)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        async def probe_worker():
+            while not storm_done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/auth/me", headers=headers)
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+
+        probe_tasks = [asyncio.create_task(probe_worker()) for _ in range(probes)]
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await asyncio.gather(*probe_tasks)
+
+    return {
+        "logins": logins,
+        "concurrency": concurrency,
+        "login_statuses": statuses,
+        "logins_per_second": round(logins / elapsed, 1),
+        "login_p50_ms": round(percentile(login_latencies, 50), 2),
+        "login_p99_ms": round(percentile(login_latencies, 99), 2),
+        "other_requests": len(probe_latencies),
+        "other_p50_ms": round(percentile(probe_latencies, 50), 2),
+        "other_p99_ms": round(percentile(probe_latencies, 99), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--probes", type=int, default=4, help="concurrent non-auth clients")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.base_url, args.logins, args.concurrency, args.probes)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Instrumentation overhead benchmark.
+
+Calls a trivial FastAPI route directly over ASGI (no sockets, no database)
+with and without MetricsMiddleware, and times the Mongo command listener on
+synthetic events, so the cost of the instrumentation itself is isolated:
+
+    python benchmarks/metrics_overhead.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI  # noqa: E402
+
+from metrics import MetricsMiddleware, MongoCommandListener, RequestStats, current_request  # noqa: E402
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: str):
+        return {"item_id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+async def drive(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": f"/api/items/{i}", "raw_path": b"",
+            "root_path": "", "query_string": b"", "headers": [], "server": ("test", 80),
+            "client": ("test", 1),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+def listener_cost(events: int) -> float:
+    listener = MongoCommandListener()
+    event = SimpleNamespace(command_name="find", duration_micros=850, reply={"ok": 1})
+    token = current_request.set(RequestStats())
+    start = time.perf_counter()
+    for _ in range(events):
+        listener.succeeded(event)
+    elapsed = time.perf_counter() - start
+    current_request.reset(token)
+    return elapsed / events * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+
+    baseline = asyncio.run(drive(build_app(False), args.requests))
+    instrumented = asyncio.run(drive(build_app(True), args.requests))
+    print(json.dumps({
+        "requests": args.requests,
+        "baseline_us_per_request": round(baseline, 2),
+        "instrumented_us_per_request": round(instrumented, 2),
+        "middleware_overhead_us": round(instrumented - baseline, 2),
+        "listener_us_per_command": round(listener_cost(args.events), 3),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
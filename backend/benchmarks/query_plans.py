@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Query plan regression harness.
+
+Seeds a user (see suite.py), drives every endpoint once in-process while
+recording the MongoDB commands each one issues, then runs explain() with
+executionStats on every distinct query shape. Fails when a winning plan
+contains a COLLSCAN or a blocking SORT, and reports docs-examined/returned
+per query so index coverage cannot silently regress:
+
+    python benchmarks/query_plans.py --contacts 5000 --out plans.json
+
+Needs a local mongod; uses DATABASE_NAME=contactbook_bench unless set.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+from pymongo import monitoring
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Driver and session fields explain() rejects or ignores
+SESSION_FIELDS = {
+    "lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "readConcern", "writeConcern",
+    "ordered", "autocommit", "startTransaction", "apiVersion", "apiStrict", "apiDeprecationErrors",
+}
+# Relevance ranking sorts on a score computed per match; nothing can index it
+ALLOWED_SORT_LEADING_FIELDS = {"_score"}
+
+class CommandCapture(monitoring.CommandListener):
+    def __init__(self):
+        self.scenario = None
+        self.commands = []
+
+    def started(self, event):
+        if self.scenario and event.command_name in EXPLAINABLE:
+            self.commands.append((self.scenario, event.database_name, dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+# Registered before the app (and its MongoClient) is imported so it sees every command
+capture = CommandCapture()
+monitoring.register(capture)
+
+import httpx  # noqa: E402
+
+import suite  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from database import client, contacts_collection, create_indexes  # noqa: E402
+
+def explainable(command: dict) -> dict:
+    command = {key: value for key, value in command.items() if key not in SESSION_FIELDS}
+    # Bulk writes carry many statements; explain takes one, and they share a shape
+    for field in ("updates", "deletes"):
+        if field in command:
+            command[field] = command[field][:1]
+    return command
+
+def shape(value):
+    """The query with literal values blanked out, for de-duplication."""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape(value[0])] if value else []
+    return "?"
+
+def walk_plan(node, found):
+    """Collect plan nodes, skipping the plans the optimizer rejected."""
+    if isinstance(node, dict):
+        if "stage" in node:
+            found.append(node)
+        for key, item in node.items():
+            if key not in ("rejectedPlans", "allPlansExecution"):
+                walk_plan(item, found)
+    elif isinstance(node, list):
+        for item in node:
+            walk_plan(item, found)
+    return found
+
+def execution_totals(explain: dict):
+    docs = keys = returned = 0
+    stack = [explain]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stats = node.get("executionStats")
+            if isinstance(stats, dict):
+                docs += stats.get("totalDocsExamined", 0)
+                keys += stats.get("totalKeysExamined", 0)
+                returned += stats.get("nReturned", 0)
+            stack.extend(value for key, value in node.items() if key != "executionStats")
+        elif isinstance(node, list):
+            stack.extend(node)
+    return docs, keys, returned
+
+def violations(explain: dict):
+    problems = []
+    for node in walk_plan(explain, []):
+        stage = node["stage"]
+        if stage == "COLLSCAN":
+            problems.append("COLLSCAN")
+        elif stage == "SORT" and next(iter(node.get("sortPattern", {})), None) not in ALLOWED_SORT_LEADING_FIELDS:
+            problems.append(f"SORT {json.dumps(node.get('sortPattern'))}")
+    return sorted(set(problems))
+
+def extra_scenarios(contact_ids, category_name):
+    """Query shapes the load suite does not exercise, as (name, [(method, path, kwargs)])."""
+    return [
+        ("contacts_sorted_created", [("GET", "/api/contacts", {"params": {"sort_by": "created_at", "limit": 50}})]),
+        ("contacts_category_updated", [("GET", "/api/contacts", {
+            "params": {"category": category_name, "sort_by": "updated_at", "limit": 50}})]),
+        ("contacts_search_category", [("GET", "/api/contacts", {
+            "params": {"search": "smith", "category": category_name, "limit": 50}})]),
+        ("contacts_changes", [("GET", "/api/contacts/changes", {"params": {"limit": 100}})]),
+        ("contacts_lookup", [("GET", "/api/contacts/lookup", {"params": {"phone": "(415) 555-0100"}})]),
+        ("contacts_lookup_batch", [("POST", "/api/contacts/lookup", {
+            "json": {"phones": [f"+1 415 555 {i:04d}" for i in range(200)]}})]),
+        ("contacts_duplicates", [("GET", "/api/contacts/duplicates", {"params": {"min_score": 0.9}})]),
+        ("contacts_batch", [("POST", "/api/contacts/batch", {"json": {"ordered": False, "operations": [
+            {"op": "update", "contact_id": contact_ids[0], "data": {"notes": "plan check"}},
+            {"op": "create", "data": {"name": f"Plan {uuid.uuid4().hex}"}},
+        ]}})]),
+        ("category_create", [("POST", "/api/categories", {"params": {"name": f"Plan {uuid.uuid4().hex[:8]}"}})]),
+    ]
+
+async def drive(client_, headers, scenario, requests):
+    capture.scenario = scenario
+    try:
+        for method, path, kwargs in requests:
+            if method == "CRUD":
+                await suite.crud_cycle(client_, headers)
+                continue
+            response = await client_.request(method, path, headers=headers, **kwargs)
+            if response.status_code >= 400:
+                print(f"warning: {scenario} {method} {path} -> {response.status_code}", file=sys.stderr)
+    finally:
+        capture.scenario = None
+
+async def run(contacts: int, reuse: bool, max_ratio: float):
+    await create_indexes()
+    pictures = await suite.seed_pictures(5)
+    user_id = await suite.seed_user(contacts, pictures, reuse)
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user_id})}"}
+    sample = await contacts_collection.find({"user_id": user_id}, {"contact_id": 1}).limit(3).to_list(length=3)
+    contact_ids = [doc["contact_id"] for doc in sample]
+
+    transport = httpx.ASGITransport(app=suite.server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plans", timeout=600) as http:
+        for name, method, path, factory in suite.scenarios(contact_ids[0], pictures[0]):
+            await drive(http, headers, name, [(method, path, factory() if factory else {})])
+        for name, requests in extra_scenarios(contact_ids, suite.CATEGORIES[0]):
+            await drive(http, headers, name, requests)
+        # Changes since a token, which also reads tombstones
+        response = await http.get("/api/contacts/changes", headers=headers, params={"limit": 10})
+        token = response.json()["next_token"]
+        await drive(http, headers, "contacts_changes_since", [
+            ("GET", "/api/contacts/changes", {"params": {"since": token}})
+        ])
+
+    reports = []
+    seen = set()
+    for scenario, database_name, command in capture.commands:
+        command = explainable(command)
+        command_name = next(iter(command))
+        key = (scenario, command_name, json.dumps(shape(command), sort_keys=True, default=str))
+        if key in seen:
+            continue
+        seen.add(key)
+        started = time.perf_counter()
+        explain = await client[database_name].command({"explain": command, "verbosity": "executionStats"})
+        docs, keys, returned = execution_totals(explain)
+        problems = violations(explain)
+        ratio = docs / max(returned, 1)
+        if max_ratio and ratio > max_ratio:
+            problems.append(f"docs examined/returned {ratio:.1f} > {max_ratio}")
+        stages = sorted({node["stage"] for node in walk_plan(explain, [])})
+        reports.append({
+            "endpoint": scenario,
+            "command": command_name,
+            "collection": command[command_name],
+            "stages": stages,
+            "docs_examined": docs,
+            "keys_examined": keys,
+            "returned": returned,
+            "docs_per_returned": round(ratio, 2),
+            "explain_ms": round((time.perf_counter() - started) * 1000, 1),
+            "violations": problems,
+        })
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--reuse", action="store_true", help="keep a previously seeded user")
+    parser.add_argument("--max-ratio", type=float, default=0,
+                        help="also fail when docs examined per returned doc exceeds this")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args.contacts, args.reuse, args.max_ratio))
+    for report in reports:
+        flag = "FAIL" if report["violations"] else "ok  "
+        print(f"{flag} {report['endpoint']:<26} {report['command']:<14} {report['collection']:<18} "
+              f"{report['docs_examined']:>7}/{report['returned']:<7} {','.join(report['stages'])}",
+              file=sys.stderr)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+    failures = [report for report in reports if report["violations"]]
+    if failures:
+        for report in failures:
+            print(f"{report['endpoint']} {report['command']} on {report['collection']}: "
+                  f"{'; '.join(report['violations'])}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{len(reports)} query shapes checked, no collection scans or blocking sorts", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Cold start and multi-worker scaling benchmark.
+
+Starts serve.py as a real server once per worker count, records the time
+until /api/health answers (cold start), then measures throughput against an
+endpoint over HTTP:
+
+    python benchmarks/scaling.py --workers 1,2,4 --requests 5000
+    python benchmarks/scaling.py --endpoint "/api/contacts?limit=50" --token $TOKEN
+
+Needs a reachable MongoDB unless --skip-indexes is given and the endpoint
+does not query it (the default /api/health does not).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from concurrency import percentile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def start_server(workers: int, port: int, skip_indexes: bool) -> subprocess.Popen:
+    command = [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port),
+               "--host", "127.0.0.1", "--log-level", "warning"]
+    if skip_indexes:
+        command.append("--skip-indexes")
+    return subprocess.Popen(command, cwd=BACKEND)
+
+def wait_ready(base_url: str, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+async def load(base_url: str, endpoint: str, headers, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = requests
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.get(endpoint)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, os.cpu_count() or 1})))
+    parser.add_argument("--endpoint", default="/api/health")
+    parser.add_argument("--token", help="bearer token for authenticated endpoints")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--skip-indexes", action="store_true")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for workers in (int(w) for w in args.workers.split(",") if w):
+        server = start_server(workers, args.port, args.skip_indexes)
+        try:
+            cold_start = wait_ready(base_url, args.timeout)
+            # Let every worker finish booting before measuring throughput
+            time.sleep(1)
+            result = asyncio.run(load(base_url, args.endpoint, headers, args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+        result.update({"workers": workers, "cold_start_s": round(cold_start, 2)})
+        results.append(result)
+        print(f"{workers:>3} workers  cold start {result['cold_start_s']}s  "
+              f"{result['throughput_rps']} rps", file=sys.stderr)
+
+    baseline = results[0]["throughput_rps"] if results else 0
+    for result in results:
+        result["speedup"] = round(result["throughput_rps"] / baseline, 2) if baseline else None
+    print(json.dumps({"endpoint": args.endpoint, "concurrency": args.concurrency, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Search latency benchmark.
+
+Seeds one synthetic user with N contacts straight into MongoDB (use a
+throwaway DATABASE_NAME) and times ranked searches through the same
+pipeline GET /api/contacts?search= runs:
+
+    DATABASE_NAME=contactbook_bench python benchmarks/search.py --contacts 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database import contacts_collection, create_indexes  # noqa: E402
+from models import Contact, PhoneNumber, EmailAddress  # noqa: E402
+from search import build_search_pipeline, parse_search_terms  # noqa: E402
+
+FIRST = ["john", "jane", "alex", "maria", "li", "ahmed", "olga", "pierre", "sofia", "kenji"]
+LAST = ["smith", "garcia", "nguyen", "muller", "rossi", "kowalski", "tanaka", "silva", "dubois", "okafor"]
+WORDS = ["dentist", "plumber", "school", "gym", "neighbour", "client", "vendor", "college", "team", "club"]
+QUERIES = ["john", "garcia", "maria silva", "plumber", "example.org", "0142", "+1 415 555", "zzzz"]
+
+async def seed(user_id: str, count: int):
+    await contacts_collection.delete_many({"user_id": user_id})
+    batch = []
+    for i in range(count):
+        name = f"{random.choice(FIRST).title()} {random.choice(LAST).title()} {i}"
+        batch.append(Contact(
+            user_id=user_id,
+            name=name,
+            phones=[PhoneNumber(number=f"+1 415 555 {i % 10000:04d}")],
+            emails=[EmailAddress(email=f"user{i}@example.{random.choice(['com', 'org', 'net'])}")],
+            notes=" ".join(random.sample(WORDS, 3))
+        ).dict())
+        if len(batch) == 1000:
+            await contacts_collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await contacts_collection.insert_many(batch, ordered=False)
+
+async def run(count: int, repeat: int, page: int, skip_seed: bool):
+    user_id = f"bench-search-{count}"
+    await create_indexes()
+    if not skip_seed:
+        await seed(user_id, count)
+
+    results = {}
+    for query in QUERIES:
+        terms = parse_search_terms(query)
+        timings = []
+        for _ in range(repeat):
+            pipeline = build_search_pipeline(user_id, terms)
+            pipeline += [{"$project": {"_id": 0, "contact_id": 1, "name": 1}}, {"$limit": page}]
+            start = time.perf_counter()
+            await contacts_collection.aggregate(pipeline).to_list(length=None)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        hits = await contacts_collection.count_documents(build_search_pipeline(user_id, terms)[0]["$match"])
+        results[query] = {
+            "matches": hits,
+            "p50_ms": round(timings[len(timings) // 2], 2),
+            "max_ms": round(timings[-1], 2),
+        }
+    return {"contacts": count, "page_size": page, "queries": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.contacts, args.repeat, args.page, args.skip_seed)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Response serialization benchmark.
+
+Builds synthetic contact documents shaped like the ones Mongo returns
+(datetimes included, no database needed) and times encoding them through
+FastAPI's default path (`jsonable_encoder` + `json.dumps`) against
+FastJSONResponse, plus the per-contact export encoders:
+
+    python benchmarks/serialization.py --contacts 10000 --rounds 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from models import Contact, EmailAddress, PhoneNumber  # noqa: E402
+from responses import FastJSONResponse, dumps  # noqa: E402
+
+def build_contacts(count: int):
+    contacts = []
+    for i in range(count):
+        contact = Contact(
+            user_id="bench",
+            name=f"Contact {i} {random.choice(['Smith', 'Garcia', 'Nguyen', 'Rossi'])}",
+            phones=[PhoneNumber(number=f"+1 415 555 {i % 10000:04d}"),
+                    PhoneNumber(number="+1 212 555 0100", label="work")],
+            emails=[EmailAddress(email=f"user{i}@example.com")],
+            category=random.choice(["Family", "Friends", "Work", "General"]),
+            notes="met at the conference, follow up next quarter",
+        )
+        doc = contact.dict()
+        doc.pop("search_tokens")
+        contacts.append(doc)
+    return contacts
+
+def best_of(rounds: int, fn) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    contacts = build_contacts(args.contacts)
+    default_body = JSONResponse(jsonable_encoder(contacts)).body
+    fast_body = FastJSONResponse(contacts).body
+    assert json.loads(default_body) == json.loads(fast_body), "encoders disagree"
+
+    default_ms = best_of(args.rounds, lambda: JSONResponse(jsonable_encoder(contacts)))
+    fast_ms = best_of(args.rounds, lambda: FastJSONResponse(contacts))
+    export_default_ms = best_of(args.rounds, lambda: [json.dumps(c, default=str) for c in contacts])
+    export_fast_ms = best_of(args.rounds, lambda: [dumps(c) for c in contacts])
+    print(json.dumps({
+        "contacts": args.contacts,
+        "body_bytes": len(fast_body),
+        "jsonable_encoder_ms": round(default_ms, 2),
+        "fast_json_response_ms": round(fast_ms, 2),
+        "speedup": round(default_ms / fast_ms, 1),
+        "export_json_dumps_ms": round(export_default_ms, 2),
+        "export_orjson_ms": round(export_fast_ms, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+API load-testing suite.
+
+Seeds synthetic users with 1k/10k/100k contacts (phones, emails, notes and
+profile pictures) into a local mongod, then drives every endpoint in-process
+through an ASGI client at a configurable concurrency. Results are written as
+machine-readable JSON so runs can be diffed in CI. Memory is sampled while
+each scenario runs (Linux), so every result carries its own RSS figures:
+
+    python benchmarks/suite.py --sizes 1000,10000 --concurrency 16 --out bench.json
+
+Uses DATABASE_NAME=contactbook_bench unless DATABASE_NAME is already set;
+the benchmark users are dropped and re-seeded on every run unless --reuse.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import time
+import uuid
+from typing import Optional
+
+os.environ.setdefault("DATABASE_NAME", "contactbook_bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from blobs import blob_store, picture_url  # noqa: E402
+from cache import response_cache  # noqa: E402
+from categories import store_category_id  # noqa: E402
+from concurrency import percentile  # noqa: E402
+from database import (  # noqa: E402
+    categories_collection, contacts_collection, create_indexes, stats_collection, users_collection
+)
+from models import Category, Contact, EmailAddress, PhoneNumber, User  # noqa: E402
+from stats import reconcile_user_stats  # noqa: E402
+
+FIRST = ["John", "Jane", "Alex", "Maria", "Li", "Ahmed", "Olga", "Pierre", "Sofia", "Kenji", "Amara", "Lucas"]
+LAST = ["Smith", "Garcia", "Nguyen", "Muller", "Rossi", "Kowalski", "Tanaka", "Silva", "Dubois", "Okafor"]
+WORDS = ["dentist", "plumber", "school", "gym", "neighbour", "client", "vendor", "college", "team", "club"]
+CATEGORIES = ["Family", "Friends", "Work", "General"]
+PICTURE_RATIO = 0.2
+SEED_BATCH = 1000
+
+RSS_SAMPLE_SECONDS = 0.01
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def peak_rss_mb() -> float:
+    """Highest RSS of the whole run so far; it never goes down."""
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def current_rss_mb() -> Optional[float]:
+    """RSS right now, from /proc; None where there is no /proc."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * _PAGE_SIZE / 2**20, 1)
+    except OSError:
+        return None
+
+class RSSSampler:
+    """
+    Samples RSS on the event loop while a scenario runs. ru_maxrss is the
+    peak of the whole process, so once a large size has run every later
+    scenario would report it; the samples give each scenario its own peak.
+    Pool workers (image resizing, password hashing, duplicate scoring) are
+    separate processes and not included.
+    """
+
+    def __init__(self):
+        self.start = self.peak = None
+        self._task = None
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, current_rss_mb())
+            await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+    async def __aenter__(self):
+        gc.collect()
+        self.start = self.peak = current_rss_mb()
+        if self.start is not None:
+            self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._task:
+            self._task.cancel()
+            self.peak = max(self.peak, current_rss_mb())
+
+    def report(self) -> dict:
+        if self.start is None:
+            return {"rss_start_mb": None, "rss_peak_mb": None, "rss_growth_mb": None}
+        return {"rss_start_mb": self.start, "rss_peak_mb": self.peak,
+                "rss_growth_mb": round(self.peak - self.start, 1)}
+
+async def seed_pictures(count: int):
+    """A handful of distinct small images; contacts share them like real avatars do."""
+    ids = []
+    for i in range(count):
+        payload = bytes(random.getrandbits(8) for _ in range(4096)) + str(i).encode()
+        ids.append(await blob_store.put(payload, "image/webp"))
+    return ids
+
+async def seed_user(size: int, pictures, reuse: bool) -> str:
+    email = f"bench-{size}@example.com"
+    existing = await users_collection.find_one({"email": email})
+    if existing and reuse:
+        return existing["user_id"]
+    if existing:
+        user_id = existing["user_id"]
+        for collection in (users_collection, contacts_collection, categories_collection, stats_collection):
+            await collection.delete_many({"user_id": user_id})
+
+    user = User(email=email, name=f"Bench {size}", hashed_password="!")
+    await users_collection.insert_one(user.dict())
+    categories = [Category(user_id=user.user_id, name=name).dict() for name in CATEGORIES]
+    await categories_collection.insert_many(categories)
+    category_ids = {category["name"]: category["category_id"] for category in categories}
+
+    batch = []
+    for i in range(size):
+        picture = random.choice(pictures) if random.random() < PICTURE_RATIO else None
+        contact = Contact(
+            user_id=user.user_id,
+            name=f"{random.choice(FIRST)} {random.choice(LAST)} {i}",
+            phones=[PhoneNumber(number=f"+1 415 555 {random.randint(0, 9999):04d}", label=label)
+                    for label in random.sample(["mobile", "home", "work"], random.randint(1, 2))],
+            emails=[EmailAddress(email=f"user{i}@example.{random.choice(['com', 'org'])}")],
+            category=random.choice(CATEGORIES),
+            notes=" ".join(random.sample(WORDS, 3)),
+            profile_picture=picture_url(picture) if picture else None,
+            profile_picture_id=picture,
+        )
+        batch.append(store_category_id(contact.dict(), category_ids))
+        if len(batch) >= SEED_BATCH:
+            await contacts_collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await contacts_collection.insert_many(batch, ordered=False)
+    await reconcile_user_stats(user.user_id)
+    return user.user_id
+
+def vcard_upload() -> str:
+    """50 cards under fresh names, so every import writes them."""
+    prefix = uuid.uuid4().hex[:6]
+    return "".join(
+        f"BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Vcf {prefix} {i}\r\nN:{prefix} {i};Vcf;;;\r\n"
+        f"TEL;TYPE=CELL:+1 415 555 {i:04d}\r\nEMAIL;TYPE=HOME:vcf{i}@example.com\r\n"
+        f"CATEGORIES:{random.choice(CATEGORIES)}\r\nEND:VCARD\r\n"
+        for i in range(50)
+    )
+
+def lookup_number() -> str:
+    # Seeded numbers are E.164; callers format them every which way
+    digits = f"{random.randint(0, 9999):04d}"
+    return random.choice([f"+1415555{digits}", f"(415) 555-{digits}", f"415.555.{digits}"])
+
+def scenarios(sample_contact_id: str, picture_id: str, sync_token: str):
+    """(name, method, path, params/body factory) for every endpoint exercised."""
+    csv_upload = "name,phone,email\n" + "\n".join(
+        f"Imported {uuid.uuid4().hex[:10]},+14155550{i:03d},imp{i}@example.com" for i in range(50)
+    )
+    return [
+        ("health", "GET", "/api/health", None),
+        ("auth_me", "GET", "/api/auth/me", None),
+        ("contacts_page", "GET", "/api/contacts", lambda: {"params": {"limit": 50}}),
+        ("contacts_page_summary", "GET", "/api/contacts",
+         lambda: {"params": {"limit": 50, "fields": "name,category,profile_picture"}}),
+        ("contacts_full", "GET", "/api/contacts", None),
+        ("contacts_search", "GET", "/api/contacts",
+         lambda: {"params": {"search": random.choice(FIRST), "limit": 50}}),
+        ("contacts_by_category", "GET", "/api/contacts",
+         lambda: {"params": {"category": random.choice(CATEGORIES), "limit": 50}}),
+        ("contact_detail", "GET", f"/api/contacts/{sample_contact_id}", None),
+        ("categories", "GET", "/api/categories", None),
+        ("stats", "GET", "/api/stats", None),
+        ("picture", "GET", f"/api/pictures/{picture_id}", None),
+        ("changes_initial", "GET", "/api/contacts/changes", lambda: {"params": {"limit": 500}}),
+        ("changes_incremental", "GET", "/api/contacts/changes", lambda: {"params": {"since": sync_token}}),
+        ("lookup", "GET", "/api/contacts/lookup", lambda: {"params": {"phone": lookup_number()}}),
+        ("duplicates", "GET", "/api/contacts/duplicates", None),
+        ("create_update_delete", "CRUD", "/api/contacts", None),
+        ("batch", "BATCH", "/api/contacts/batch", None),
+        ("import_csv", "POST", "/api/contacts/import/csv",
+         lambda: {"files": {"file": ("c.csv", csv_upload.replace("Imported ", f"Imp {uuid.uuid4().hex[:6]} "))}}),
+        ("import_vcard", "POST", "/api/contacts/import/vcard",
+         lambda: {"files": {"file": ("c.vcf", vcard_upload(), "text/vcard")}}),
+        ("export_json", "GET", "/api/contacts/export/json", None),
+        ("export_csv", "GET", "/api/contacts/export/csv", None),
+        ("export_vcard", "GET", "/api/contacts/export/vcard", None),
+    ]
+
+# Scenarios that read or write the whole book get fewer iterations so large sizes finish
+HEAVY_SCENARIOS = {
+    "contacts_full", "changes_initial", "duplicates", "import_csv", "import_vcard",
+    "export_json", "export_csv", "export_vcard",
+}
+BATCH_SIZE = 20
+
+async def crud_cycle(client: httpx.AsyncClient, headers) -> int:
+    r = await client.post("/api/contacts", headers=headers, json={
+        "name": f"Bench {uuid.uuid4().hex}", "phones": [{"number": "+14155550000"}]
+    })
+    if r.status_code != 201:
+        return r.status_code
+    contact_id = r.json()["contact_id"]
+    r = await client.put(f"/api/contacts/{contact_id}", headers=headers, json={"notes": "updated"})
+    if r.status_code != 200:
+        return r.status_code
+    r = await client.delete(f"/api/contacts/{contact_id}", headers=headers)
+    return 200 if r.status_code == 204 else r.status_code
+
+async def batch_cycle(client: httpx.AsyncClient, headers) -> int:
+    """Create BATCH_SIZE contacts in one batch, then update half and delete the rest in another."""
+    creates = [{"op": "create", "data": {"name": f"Batch {uuid.uuid4().hex}", "category": random.choice(CATEGORIES),
+                                         "phones": [{"number": "+14155550000"}]}} for _ in range(BATCH_SIZE)]
+    r = await client.post("/api/contacts/batch", headers=headers, json={"operations": creates, "ordered": False})
+    if r.status_code != 200 or r.json()["failed"]:
+        return r.status_code if r.status_code != 200 else 500
+    ids = [result["contact_id"] for result in r.json()["results"]]
+    half = len(ids) // 2
+    operations = [{"op": "update", "contact_id": contact_id, "data": {"notes": "updated"}} for contact_id in ids[:half]]
+    operations += [{"op": "delete", "contact_id": contact_id} for contact_id in ids[half:]]
+    r = await client.post("/api/contacts/batch", headers=headers, json={"operations": operations, "ordered": False})
+    if r.status_code != 200 or r.json()["failed"]:
+        return r.status_code if r.status_code != 200 else 500
+    return 200
+
+async def run_scenario(client, headers, scenario, requests: int, concurrency: int) -> dict:
+    name, method, path, factory = scenario
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            kwargs = factory() if factory else {}
+            start = time.perf_counter()
+            if method == "CRUD":
+                status_code = await crud_cycle(client, headers)
+            elif method == "BATCH":
+                status_code = await batch_cycle(client, headers)
+            else:
+                response = await client.request(method, path, headers=headers, **kwargs)
+                status_code = response.status_code
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status_code >= 400:
+                errors += 1
+
+    async with RSSSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "endpoint": name,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        **rss.report(),
+    }
+
+async def sync_to_end(client: httpx.AsyncClient, headers) -> str:
+    token = None
+    while True:
+        params = {"limit": 500, **({"since": token} if token else {})}
+        r = await client.get("/api/contacts/changes", headers=headers, params=params)
+        r.raise_for_status()
+        body = r.json()
+        token = body["next_token"]
+        if not body.get("has_more"):
+            return token
+
+async def run(sizes, requests: int, heavy_requests: int, concurrency: int, reuse: bool, only) -> dict:
+    await create_indexes()
+    pictures = await seed_pictures(20)
+    results = []
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        for size in sizes:
+            started = time.perf_counter()
+            user_id = await seed_user(size, pictures, reuse)
+            seed_seconds = round(time.perf_counter() - started, 2)
+            headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user_id})}"}
+            sample = await contacts_collection.find_one({"user_id": user_id}, {"contact_id": 1})
+            # A token from a finished sync, so the incremental scenario only sees what changed since
+            sync_token = await sync_to_end(client, headers)
+
+            for scenario in scenarios(sample["contact_id"], pictures[0], sync_token):
+                if only and scenario[0] not in only:
+                    continue
+                count = heavy_requests if scenario[0] in HEAVY_SCENARIOS else requests
+                result = await run_scenario(client, headers, scenario, count, concurrency)
+                result.update({"contacts": size, "seed_seconds": seed_seconds})
+                results.append(result)
+                print(f"{size:>7} {result['endpoint']:<24} {result['throughput_rps']:>9} rps  "
+                      f"p99 {result['p99_ms']:>9} ms  rss +{result['rss_growth_mb']} MB", file=sys.stderr)
+    return {
+        "concurrency": concurrency,
+        "python": sys.version.split()[0],
+        "peak_rss_mb": peak_rss_mb(),
+        "response_cache": response_cache.stats(),
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--heavy-requests", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", help="comma-separated endpoint names to run")
+    parser.add_argument("--reuse", action="store_true", help="keep previously seeded users")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = set(args.only.split(",")) if args.only else None
+    report = asyncio.run(run(sizes, args.requests, args.heavy_requests, args.concurrency, args.reuse, only))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+vCard import/export benchmark.
+
+Writes a synthetic .vcf with N cards through the exporter's card writer
+(some with an embedded photo), then reads it back through the importer's
+streaming parser and validation, reporting throughput and peak memory:
+
+    python benchmarks/vcard.py --cards 100000 --photo-ratio 0.05
+
+With --import the parsed cards are also written to MongoDB for a throwaway
+user, exactly as POST /api/contacts/import/vcard does (needs a local
+mongod; use a throwaway DATABASE_NAME).
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from exporters import vcard_card  # noqa: E402
+from importers import (  # noqa: E402
+    ContactImporter, RowError, contact_fields_from_vcard, contact_from_fields, iter_vcards, run_import
+)
+
+FIRST = ["John", "Jane", "Zoë", "Maria", "Li", "Ahmed", "Olga", "Pierre", "Sofia", "Kenji", "Amara", "Lucas"]
+LAST = ["Smith", "García", "Nguyen", "Müller", "Rossi", "Kowalski", "Tanaka", "Silva", "Dubois", "Okafor"]
+WORDS = ["dentist", "plumber", "school", "gym", "neighbour", "client", "vendor", "college", "team", "club"]
+CATEGORIES = ["Family", "Friends", "Work", "General"]
+PHOTO_BYTES = 24 * 1024
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def synthetic_contact(i: int, photo) -> dict:
+    return {
+        "contact_id": str(uuid.uuid4()),
+        "name": f"{random.choice(FIRST)} {random.choice(LAST)} {i}",
+        "phones": [{"number": f"+1 415 555 {random.randint(0, 9999):04d}", "label": label}
+                   for label in random.sample(["mobile", "home", "work"], random.randint(1, 2))],
+        "emails": [{"email": f"user{i}@example.com", "label": random.choice(["personal", "work"])}],
+        "category": random.choice(CATEGORIES),
+        "notes": "; ".join(random.sample(WORDS, 3)) + ",\nsecond line",
+        "updated_at": datetime.utcnow(),
+        "_photo": photo,
+    }
+
+def write_file(path: str, cards: int, photo_ratio: float, version: str) -> int:
+    photos = [("image/jpeg", base64.b64encode(os.urandom(PHOTO_BYTES)).decode()) for _ in range(8)]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i in range(cards):
+            photo = random.choice(photos) if random.random() < photo_ratio else None
+            contact = synthetic_contact(i, photo)
+            f.write(vcard_card(contact, version, contact.pop("_photo")))
+    return os.path.getsize(path)
+
+def parse_file(path: str) -> dict:
+    """Read every card; vCard parsing and model validation are timed separately."""
+    valid = failed = 0
+    validate_s = 0.0
+    started = time.perf_counter()
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for _, lines in iter_vcards(f):
+            fields = contact_fields_from_vcard(lines)
+            validating = time.perf_counter()
+            try:
+                contact_from_fields("bench", fields)
+                valid += 1
+            except RowError:
+                failed += 1
+            validate_s += time.perf_counter() - validating
+    total = time.perf_counter() - started
+    return {"valid": valid, "failed": failed, "vcard_parse_s": round(total - validate_s, 2),
+            "validate_s": round(validate_s, 2)}
+
+async def import_file(path: str) -> dict:
+    from database import contacts_collection, create_indexes
+
+    await create_indexes()
+    user_id = f"bench-vcard-{uuid.uuid4()}"
+    importer = ContactImporter(user_id)
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            summary = await run_import(
+                importer, iter_vcards(f), lambda lines: contact_from_fields(user_id, contact_fields_from_vcard(lines))
+            )
+    finally:
+        await contacts_collection.delete_many({"user_id": user_id})
+    summary.pop("errors", None)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=100000)
+    parser.add_argument("--photo-ratio", type=float, default=0.05)
+    parser.add_argument("--version", choices=["3.0", "4.0"], default="3.0")
+    parser.add_argument("--import", dest="import_", action="store_true", help="also write the cards to MongoDB")
+    args = parser.parse_args()
+
+    report = {"cards": args.cards, "version": args.version, "photo_ratio": args.photo_ratio}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "contacts.vcf")
+        started = time.perf_counter()
+        size = write_file(path, args.cards, args.photo_ratio, args.version)
+        elapsed = time.perf_counter() - started
+        report.update(file_mb=round(size / 2**20, 1), write_s=round(elapsed, 2),
+                      write_cards_per_s=round(args.cards / elapsed))
+        report["peak_rss_mb_after_write"] = peak_rss_mb()
+
+        started = time.perf_counter()
+        report.update(parse_file(path))
+        elapsed = time.perf_counter() - started
+        report.update(read_s=round(elapsed, 2), read_cards_per_s=round(args.cards / elapsed),
+                      vcard_parse_mb_per_s=round(size / 2**20 / report["vcard_parse_s"], 1))
+        # Unchanged from after the write when parsing holds one card at a time
+        report["peak_rss_mb_after_read"] = peak_rss_mb()
+
+        if args.import_:
+            report["import"] = asyncio.run(import_file(path))
+            report["peak_rss_mb_after_import"] = peak_rss_mb()
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from dataclasses import dataclass, field
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from gridfs.errors import FileExists, NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+from database import db
+from images import INPUT_CONTENT_TYPES, OUTPUT_CONTENT_TYPE, check_image_size, process_image
+
+BLOB_STORE = os.getenv("BLOB_STORE", "gridfs")  # gridfs, local
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join(os.path.dirname(__file__), "blobs"))
+READ_CHUNK_SIZE = 256 * 1024
+
+PICTURE_URL_PREFIX = "/api/pictures/"
+_PICTURE_URL = re.compile(r"/api/pictures/([0-9a-f]{64})$")
+# Types a picture may be served as; older blobs stored as anything else are
+# sent as an attachment rather than rendered
+PICTURE_CONTENT_TYPES = frozenset(INPUT_CONTENT_TYPES) | {OUTPUT_CONTENT_TYPE}
+# Room for the "data:...;base64," prefix and line breaks in the encoded text
+_DATA_URL_SLACK = 1024
+_DATA_URL = re.compile(r"^data:([\w.+-]+/[\w.+-]+)?(;[^,]*)?,(.*)$", re.DOTALL)
+
+@dataclass
+class BlobInfo:
+    blob_id: str
+    length: int
+    content_type: str
+    # Alternate renditions of the same picture, keyed by size (see images.py)
+    variants: Dict[str, str] = field(default_factory=dict)
+
+def blob_id_for(data: bytes) -> str:
+    """Blobs are addressed by the SHA-256 of their content, so re-uploads dedupe."""
+    return hashlib.sha256(data).hexdigest()
+
+class BlobStore(ABC):
+    @abstractmethod
+    async def put(self, data: bytes, content_type: str, variants: Optional[Dict[str, str]] = None) -> str:
+        """Store `data` under its content hash and return that id."""
+
+    @abstractmethod
+    async def info(self, blob_id: str) -> Optional[BlobInfo]:
+        """Length, content type and variants of a blob, or None if there is no such blob."""
+
+    @abstractmethod
+    def read(self, blob_id: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes `start` through `end` inclusive."""
+
+class GridFSBlobStore(BlobStore):
+    def __init__(self, database, bucket_name: str = "pictures"):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+        self.files = database[f"{bucket_name}.files"]
+
+    async def put(self, data: bytes, content_type: str, variants: Optional[Dict[str, str]] = None) -> str:
+        blob_id = blob_id_for(data)
+        if await self.files.find_one({"_id": blob_id}, {"_id": 1}):
+            if variants:
+                await self.files.update_one({"_id": blob_id}, {"$set": {"metadata.variants": variants}})
+            return blob_id
+        try:
+            await self.bucket.upload_from_stream_with_id(
+                blob_id, blob_id, data, metadata={"contentType": content_type, "variants": variants or {}}
+            )
+        except (FileExists, DuplicateKeyError):
+            # Uploaded concurrently by another request; same content either way
+            pass
+        return blob_id
+
+    async def info(self, blob_id: str) -> Optional[BlobInfo]:
+        doc = await self.files.find_one({"_id": blob_id}, {"length": 1, "metadata": 1})
+        if not doc:
+            return None
+        metadata = doc.get("metadata") or {}
+        content_type = metadata.get("contentType", "application/octet-stream")
+        return BlobInfo(blob_id, doc["length"], content_type, metadata.get("variants") or {})
+
+    async def read(self, blob_id: str, start: int, end: int) -> AsyncIterator[bytes]:
+        try:
+            grid_out = await self.bucket.open_download_stream(blob_id)
+        except NoFile:
+            return
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under `root/<first two hex chars>/<id>`, with a JSON sidecar."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id[:2], blob_id)
+
+    def _write(self, blob_id: str, data: bytes, content_type: str, variants: Optional[Dict[str, str]]):
+        path = self._path(blob_id)
+        exists = os.path.exists(path)
+        if exists and not variants:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({"content_type": content_type, "variants": variants or {}}, f)
+        os.replace(path + ".json.tmp", path + ".json")
+        if exists:
+            return
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    async def put(self, data: bytes, content_type: str, variants: Optional[Dict[str, str]] = None) -> str:
+        blob_id = blob_id_for(data)
+        await run_in_threadpool(self._write, blob_id, data, content_type, variants)
+        return blob_id
+
+    def _info(self, blob_id: str) -> Optional[BlobInfo]:
+        path = self._path(blob_id)
+        try:
+            length = os.path.getsize(path)
+            with open(path + ".json") as f:
+                meta = json.load(f)
+        except OSError:
+            return None
+        return BlobInfo(blob_id, length, meta["content_type"], meta.get("variants") or {})
+
+    async def info(self, blob_id: str) -> Optional[BlobInfo]:
+        return await run_in_threadpool(self._info, blob_id)
+
+    def _read_chunk(self, blob_id: str, offset: int, size: int) -> bytes:
+        with open(self._path(blob_id), "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    async def read(self, blob_id: str, start: int, end: int) -> AsyncIterator[bytes]:
+        offset = start
+        while offset <= end:
+            chunk = await run_in_threadpool(
+                self._read_chunk, blob_id, offset, min(READ_CHUNK_SIZE, end - offset + 1)
+            )
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+def create_blob_store() -> BlobStore:
+    if BLOB_STORE == "local":
+        return LocalBlobStore(BLOB_DIR)
+    return GridFSBlobStore(db)
+
+blob_store = create_blob_store()
+
+def parse_byte_range(header: str, length: int):
+    """
+    Parse a single `bytes=start-end` Range header into inclusive offsets.
+    Returns None when the header should be ignored (whole body is served) and
+    raises ValueError when the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header or "")
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), length - 1) if last else length - 1
+    else:
+        # Suffix range: the final N bytes
+        start = max(length - int(last), 0)
+        end = length - 1
+    if start >= length or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+def pick_variant(info: BlobInfo, size: int) -> str:
+    """Smallest rendition at least `size` pixels wide, else the largest one available."""
+    sizes = sorted(int(s) for s in info.variants)
+    if not sizes:
+        return info.blob_id
+    fitting = [s for s in sizes if s >= size]
+    return info.variants[str(fitting[0] if fitting else sizes[-1])]
+
+def picture_url(blob_id: str) -> str:
+    return f"{PICTURE_URL_PREFIX}{blob_id}"
+
+async def store_picture_variants(variants: Dict[int, bytes]) -> Tuple[str, Dict[str, str]]:
+    """
+    Store the renditions from images.process_image once each. Returns the id
+    of the largest, whose blob indexes the others, and the ids by size.
+    """
+    largest = max(variants)
+    variant_ids = {}
+    for size in sorted(variants):
+        if size != largest:
+            variant_ids[str(size)] = await blob_store.put(variants[size], OUTPUT_CONTENT_TYPE)
+    variant_ids[str(largest)] = blob_id_for(variants[largest])
+    picture_id = await blob_store.put(variants[largest], OUTPUT_CONTENT_TYPE, variants=variant_ids)
+    return picture_id, variant_ids
+
+def parse_data_url(value: str):
+    """Return (content_type, bytes) for a base64 data URL, or None for anything else."""
+    match = _DATA_URL.match(value)
+    if not match or not (match.group(2) or "").endswith("base64"):
+        return None
+    try:
+        data = base64.b64decode(match.group(3), validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    return match.group(1) or "application/octet-stream", data
+
+async def store_profile_picture(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize `profile_picture` on a contact document before it is written:
+    inline data URLs move into the blob store, and pictures already there are
+    referenced by `profile_picture_id`. Other URLs are kept as given.
+
+    A data URL must hold a JPEG, PNG, WebP or GIF image within the upload
+    limit. It goes through the same pipeline as an upload: re-encoded, so only
+    pixels are stored under a content type set here rather than the client's,
+    and stored with its thumbnail variants.
+    """
+    if "profile_picture" not in fields:
+        return fields
+
+    value = fields.get("profile_picture")
+    fields["profile_picture_id"] = None
+    if not value:
+        return fields
+
+    if value.startswith("data:"):
+        # Base64 is 4 characters per 3 bytes; refuse oversized pictures before decoding
+        check_image_size(len(value) * 3 // 4 - _DATA_URL_SLACK)
+        decoded = parse_data_url(value)
+        if not decoded or decoded[0].lower() not in INPUT_CONTENT_TYPES:
+            raise HTTPException(status_code=400, detail="Profile picture must be a JPEG, PNG, WebP or GIF image")
+        check_image_size(len(decoded[1]))
+        blob_id, _ = await store_picture_variants(await process_image(decoded[1]))
+    else:
+        match = _PICTURE_URL.search(value)
+        if not match:
+            return fields
+        blob_id = match.group(1)
+
+    fields["profile_picture_id"] = blob_id
+    fields["profile_picture"] = picture_url(blob_id)
+    return fields
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import os
+import time
+
+from fastapi import Response
+
+from metrics import registry
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 300))
+# A single huge contact list should not flush everyone else's entries
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", RESPONSE_CACHE_MAX_BYTES // 8))
+# Rough per-entry bookkeeping cost added to the body size
+ENTRY_OVERHEAD_BYTES = 512
+
+registry.describe("response_cache_requests_total", "counter", "Response cache lookups by endpoint and result")
+registry.describe("response_cache_evictions_total", "counter", "Response cache entries dropped, by reason")
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+@dataclass
+class CacheEntry:
+    version: Optional[int]
+    body: bytes
+    headers: Dict[str, str]
+    media_type: str
+    expires: float
+    size: int
+
+class ResponseCache:
+    """
+    LRU of rendered JSON bodies keyed by (user_id, endpoint, query params),
+    bounded by total bytes and a TTL.
+
+    Entries remember the user's data version they were rendered at and only
+    hit for that same version, so writes made by other worker processes are
+    never served stale. Writes in this process also drop the user's entries
+    right away to free the memory. Accessed only from the event loop thread.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, max_entry_bytes: int, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.enabled = enabled
+        self.entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self.keys_by_user: Dict[str, set] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(user_id: str, endpoint: str, params) -> CacheKey:
+        # Normalized so ?a=1&b=2 and ?b=2&a=1 share an entry
+        return user_id, endpoint, tuple(sorted(params.multi_items()) if params else ())
+
+    def get(self, user_id: str, endpoint: str, params, version: Optional[int] = None) -> Optional[Response]:
+        if not self.enabled:
+            return None
+        key = self.key(user_id, endpoint, params)
+        entry = self.entries.get(key)
+        if entry is not None and (entry.version != version or entry.expires <= time.monotonic()):
+            self._remove(key, "stale" if entry.version != version else "expired")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            registry.inc("response_cache_requests_total", (("endpoint", endpoint), ("result", "miss")))
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        registry.inc("response_cache_requests_total", (("endpoint", endpoint), ("result", "hit")))
+        return Response(entry.body, headers=entry.headers, media_type=entry.media_type)
+
+    def put(self, user_id: str, endpoint: str, params, response: Response, version: Optional[int] = None):
+        if not self.enabled:
+            return
+        size = len(response.body) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_entry_bytes:
+            return
+        key = self.key(user_id, endpoint, params)
+        if key in self.entries:
+            self._remove(key)
+        # Content-Length and Content-Type are recomputed when the entry is served
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name not in ("content-length", "content-type")
+        }
+        self.entries[key] = CacheEntry(
+            version, response.body, headers, response.media_type, time.monotonic() + self.ttl, size
+        )
+        self.keys_by_user.setdefault(user_id, set()).add(key)
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)), "lru")
+
+    def invalidate_user(self, user_id: str):
+        for key in list(self.keys_by_user.get(user_id, ())):
+            self._remove(key, "invalidated")
+
+    def clear(self):
+        self.entries.clear()
+        self.keys_by_user.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: CacheKey, reason: Optional[str] = None):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+        user_keys = self.keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self.keys_by_user[key[0]]
+        if reason:
+            self.evictions += 1
+            registry.inc("response_cache_evictions_total", (("reason", reason),))
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRY_BYTES, RESPONSE_CACHE_ENABLED
+)
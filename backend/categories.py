@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+import os
+
+from pymongo import ReturnDocument
+
+from database import categories_collection
+from models import Category
+from versions import bump_data_version, get_data_version
+
+# Contacts created without a category, and contacts of a deleted category, go here
+DEFAULT_CATEGORY = "General"
+# Users whose category maps are kept per process; each map is a few hundred bytes
+CATEGORY_MAP_USERS = int(os.getenv("CATEGORY_MAP_USERS", 10000))
+
+class CategoryMap:
+    """One user's categories, by id and by name."""
+
+    def __init__(self, categories: List[Dict[str, Any]]):
+        self.by_id = {category["category_id"]: category for category in categories}
+        self.ids_by_name: Dict[str, str] = {}
+        for category in categories:
+            # Oldest wins if a race ever stored the same name twice
+            self.ids_by_name.setdefault(category["name"], category["category_id"])
+
+    def name(self, category_id: Optional[str]) -> Optional[str]:
+        category = self.by_id.get(category_id)
+        return category["name"] if category else None
+
+    def id_for(self, name: Optional[str]) -> Optional[str]:
+        return self.ids_by_name.get(name or DEFAULT_CATEGORY)
+
+# user_id -> (data version, map). Renames and deletes bump the version, so a
+# map cached by any process is only used while it is current.
+_maps: "OrderedDict[str, tuple]" = OrderedDict()
+
+async def category_map(user_id: str, version: Optional[int] = None) -> CategoryMap:
+    """The user's categories, loaded at most once per data version."""
+    if version is None:
+        version = await get_data_version(user_id)
+    entry = _maps.get(user_id)
+    if entry and entry[0] == version:
+        _maps.move_to_end(user_id)
+        return entry[1]
+
+    docs = await categories_collection.find({"user_id": user_id}, {"_id": 0}).to_list(length=None)
+    # Sorted here rather than in the query, which would need its own index for a few documents
+    categories = CategoryMap(sorted(docs, key=lambda doc: doc.get("created_at") or datetime.min))
+    _maps[user_id] = (version, categories)
+    _maps.move_to_end(user_id)
+    while len(_maps) > CATEGORY_MAP_USERS:
+        _maps.popitem(last=False)
+    return categories
+
+def forget_category_map(user_id: str):
+    _maps.pop(user_id, None)
+
+async def category_ids(user_id: str, names: Iterable[Optional[str]]) -> Dict[str, str]:
+    """
+    Ids for category names contacts are being written with, keyed by name.
+    Names the user has no category for yet are created, as contacts could
+    always name any category.
+    """
+    wanted = {name or DEFAULT_CATEGORY for name in names}
+    categories = await category_map(user_id)
+    ids = {name: categories.id_for(name) for name in wanted}
+
+    missing = [name for name, category_id in ids.items() if category_id is None]
+    for name in missing:
+        category = await categories_collection.find_one_and_update(
+            {"user_id": user_id, "name": name},
+            {"$setOnInsert": Category(user_id=user_id, name=name).dict()},
+            projection={"_id": 0, "category_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        ids[name] = category["category_id"]
+    if missing:
+        await bump_data_version(user_id)
+        forget_category_map(user_id)
+    return ids
+
+async def resolve_category_id(user_id: str, name: Optional[str]) -> str:
+    return (await category_ids(user_id, [name]))[name or DEFAULT_CATEGORY]
+
+def store_category_id(doc: Dict[str, Any], ids: Dict[str, str]) -> Dict[str, Any]:
+    """Swap the category name a contact was written with for its category id."""
+    doc["category_id"] = ids[doc.pop("category", None) or DEFAULT_CATEGORY]
+    return doc
+
+def with_category_names(contacts: Iterable[Dict[str, Any]], categories: CategoryMap):
+    """Fill in `category` from `category_id` on contacts read back for a response."""
+    for contact in contacts:
+        if "category_id" in contact:
+            contact["category"] = categories.name(contact["category_id"])
+    return contacts
@@ -0,0 +1,114 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+import os
+from dotenv import load_dotenv
+
+from metrics import MongoCommandListener
+
+load_dotenv()
+
+# MongoDB connection
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "contactbook")
+
+def _optional_int(name: str, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+# Connection pool, per worker process. An unset socket timeout waits forever.
+MONGO_MAX_POOL_SIZE = _optional_int("MONGO_MAX_POOL_SIZE", 100)
+MONGO_MIN_POOL_SIZE = _optional_int("MONGO_MIN_POOL_SIZE", 0)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = _optional_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000)
+MONGO_CONNECT_TIMEOUT_MS = _optional_int("MONGO_CONNECT_TIMEOUT_MS", 20000)
+MONGO_SOCKET_TIMEOUT_MS = _optional_int("MONGO_SOCKET_TIMEOUT_MS")
+
+# Motor runs every pymongo call on its own thread pool, so route handlers can
+# await queries without stalling the event loop for other requests.
+# connect=False: nothing touches the network until the first query, so
+# importing the app is cheap and safe before worker processes start.
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    connect=False,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    event_listeners=[MongoCommandListener()],
+)
+db = client[DATABASE_NAME]
+
+# Collections
+users_collection = db["users"]
+contacts_collection = db["contacts"]
+categories_collection = db["categories"]
+stats_collection = db["user_stats"]
+tombstones_collection = db["contact_tombstones"]
+
+# Deleted contact ids are kept this long for delta sync, then expire
+TOMBSTONE_TTL_DAYS = int(os.getenv("TOMBSTONE_TTL_DAYS", 30))
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+def close_client():
+    client.close()
+
+# Superseded by compound indexes that start with the same key, or by the
+# category_id indexes once contacts reference categories by id
+REDUNDANT_INDEXES = [
+    (contacts_collection, "user_id_1"),
+    (categories_collection, "user_id_1"),
+] + [
+    (contacts_collection, f"user_id_1_category_1_{sort_field}_1_contact_id_1")
+    for sort_field in ("name", "created_at", "updated_at")
+]
+
+async def create_indexes():
+    # Every query the API issues is answered by one of these without a
+    # collection scan or in-memory sort; benchmarks/query_plans.py checks it
+    await users_collection.create_index("email", unique=True)
+    await users_collection.create_index("user_id", unique=True)
+    await contacts_collection.create_index([("user_id", 1), ("contact_id", 1)], unique=True)
+    await _create_name_key_index()
+    await contacts_collection.create_index([("user_id", 1), ("search_tokens", 1)])
+    await contacts_collection.create_index([("user_id", 1), ("phone_e164", 1)])
+    # Keyset pagination: one index per list sort order, contact_id as tie-breaker,
+    # with and without the category filter. (user_id, updated_at, contact_id)
+    # also serves the delta sync endpoint, and any (user_id, category_id, ...)
+    # one the reassignment of a deleted category's contacts.
+    for sort_field in ("name", "created_at", "updated_at"):
+        await contacts_collection.create_index([("user_id", 1), (sort_field, 1), ("contact_id", 1)])
+        await contacts_collection.create_index(
+            [("user_id", 1), ("category_id", 1), (sort_field, 1), ("contact_id", 1)]
+        )
+    await categories_collection.create_index([("user_id", 1), ("name", 1)])
+    await categories_collection.create_index([("user_id", 1), ("category_id", 1)])
+    await stats_collection.create_index("user_id", unique=True)
+    await tombstones_collection.create_index([("user_id", 1), ("deleted_at", 1)])
+    await _create_ttl_index(tombstones_collection, "deleted_at", TOMBSTONE_TTL_DAYS * 24 * 3600)
+
+async def _create_name_key_index():
+    # Partial, so contacts stored before name_key existed (which would all
+    # collide on a missing key) do not stop the index from building; run
+    # `python migrations.py backfill_name_keys` to bring them under it
+    try:
+        await contacts_collection.create_index(
+            [("user_id", 1), ("name_key", 1)],
+            unique=True,
+            partialFilterExpression={"name_key": {"$type": "string"}}
+        )
+    except OperationFailure as e:
+        if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+            raise
+        # Built as a full unique index by an earlier release, which is stricter; keep it
+
+async def _create_ttl_index(collection, field: str, seconds: int):
+    try:
+        await collection.create_index(field, expireAfterSeconds=seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        # The TTL setting changed since the index was built
+        await db.command(
+            "collMod", collection.name, index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds}
+        )
@@ -0,0 +1,212 @@
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Set, Tuple
+import os
+
+from fastapi import HTTPException
+from pymongo import DeleteMany, UpdateOne
+
+from batch import build_contact_update
+from cache import response_cache
+from categories import category_map, with_category_names
+from database import contacts_collection
+from normalize import normalize_phone
+from pools import ProcessPool
+from stats import category_key, record_contact_changes
+from sync import record_deletions
+
+# Blocks larger than this (a shared switchboard number, a very common name)
+# are skipped: comparing inside them is quadratic and rarely finds duplicates
+MAX_BLOCK_SIZE = int(os.getenv("DUPLICATE_MAX_BLOCK_SIZE", 50))
+DEFAULT_MIN_SCORE = 0.6
+MAX_MERGE_CONTACTS = 50
+# Scoring is pure Python and holds the GIL, so it runs in its own process pool
+DUPLICATE_WORKERS = int(os.getenv("DUPLICATE_WORKERS", 1))
+# Similar names alone stay just under the default threshold; a shared phone
+# or email on top of them is enough
+NAME_WEIGHT = 0.6
+PHONE_WEIGHT = 0.4
+EMAIL_WEIGHT = 0.4
+
+SCAN_PROJECTION = {
+    "_id": 0, "contact_id": 1, "name": 1, "name_key": 1, "phones": 1, "emails": 1,
+    "phone_e164": 1, "category": 1, "category_id": 1, "profile_picture": 1,
+}
+SUMMARY_FIELDS = ("contact_id", "name", "phones", "emails", "category", "category_id", "profile_picture")
+
+duplicates_pool = ProcessPool(DUPLICATE_WORKERS)
+
+_SOUNDEX_CODES = {
+    letter: digit
+    for digit, letters in {"1": "bfpv", "2": "cgjkqsxz", "3": "dt", "4": "l", "5": "mn", "6": "r"}.items()
+    for letter in letters
+}
+
+def soundex(word: str) -> str:
+    """American Soundex, so "jon" and "john" (J500) land in the same block."""
+    letters = [c for c in word if c.isalpha()]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code
+        if letter not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+def _emails(contact: Dict[str, Any]) -> Set[str]:
+    return {e["email"].casefold() for e in contact.get("emails") or [] if e.get("email")}
+
+def _phones(contact: Dict[str, Any]) -> Set[str]:
+    # Contacts written before phone_e164 existed are normalized on the fly
+    if "phone_e164" in contact:
+        return set(contact["phone_e164"])
+    return {e164 for e164 in (normalize_phone(p.get("number", "")) for p in contact.get("phones") or []) if e164}
+
+def blocking_keys(contact: Dict[str, Any]) -> Set[str]:
+    """Only contacts sharing at least one of these keys are ever compared."""
+    keys = {f"phone:{phone}" for phone in _phones(contact)}
+    keys.update(f"email:{email}" for email in _emails(contact))
+    words = [w for w in (contact.get("name_key") or "").split() if any(c.isalpha() for c in w)]
+    if words:
+        # First and last name, order-insensitive: "smith john" blocks with "john smith"
+        keys.add("name:" + ":".join(sorted({soundex(words[0]), soundex(words[-1])})))
+    return keys
+
+def score_pair(a: Dict[str, Any], b: Dict[str, Any]) -> Tuple[float, List[str]]:
+    reasons = []
+    score = 0.0
+    if _phones(a) & _phones(b):
+        score += PHONE_WEIGHT
+        reasons.append("phone")
+    if _emails(a) & _emails(b):
+        score += EMAIL_WEIGHT
+        reasons.append("email")
+    similarity = SequenceMatcher(None, a.get("name_key") or "", b.get("name_key") or "").ratio()
+    if similarity >= 0.8:
+        reasons.append("name")
+    score += NAME_WEIGHT * similarity
+    return min(round(score, 3), 1.0), reasons
+
+def find_duplicate_pairs(
+    contacts: List[Dict[str, Any]],
+    min_score: float = DEFAULT_MIN_SCORE,
+    max_block_size: int = MAX_BLOCK_SIZE
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Candidate duplicate pairs scored at least `min_score`, best first.
+
+    Contacts are bucketed by blocking keys (E.164 phone, email, phonetic
+    first/last name) and compared only within a bucket, so the work grows
+    with the number of contacts rather than its square.
+    """
+    blocks = defaultdict(list)
+    for index, contact in enumerate(contacts):
+        for key in blocking_keys(contact):
+            blocks[key].append(index)
+
+    candidates = set()
+    skipped_blocks = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block_size:
+            skipped_blocks += 1
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                candidates.add((first, second))
+
+    pairs = []
+    for first, second in candidates:
+        score, reasons = score_pair(contacts[first], contacts[second])
+        if score >= min_score:
+            pairs.append({
+                "score": score,
+                "reasons": reasons,
+                "contacts": [_summary(contacts[first]), _summary(contacts[second])],
+            })
+    pairs.sort(key=lambda pair: (-pair["score"], pair["contacts"][0]["name"]))
+    return pairs, {"contacts": len(contacts), "compared": len(candidates), "skipped_blocks": skipped_blocks}
+
+def _summary(contact: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: contact.get(field) for field in SUMMARY_FIELDS}
+
+async def find_duplicates(user_id: str, min_score: float, limit: int) -> Dict[str, Any]:
+    contacts = await contacts_collection.find({"user_id": user_id}, SCAN_PROJECTION).to_list(length=None)
+    with_category_names(contacts, await category_map(user_id))
+    # A thread would still hold the GIL and stall every other request for the
+    # whole pass; a worker process does not
+    pairs, stats = await duplicates_pool.run(find_duplicate_pairs, contacts, min_score)
+    return {**stats, "total": len(pairs), "pairs": pairs[:limit]}
+
+def merged_fields(primary: Dict[str, Any], duplicates: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fields for the surviving contact: the primary's name and category, every
+    distinct phone and email, notes joined, and a picture if it had none.
+    """
+    phones = list(primary.get("phones") or [])
+    emails = list(primary.get("emails") or [])
+    seen_phones = {normalize_phone(p["number"]) or p["number"] for p in phones}
+    seen_emails = {e["email"].casefold() for e in emails}
+    notes = [primary["notes"]] if primary.get("notes") else []
+    picture = primary.get("profile_picture")
+
+    for duplicate in duplicates:
+        for phone in duplicate.get("phones") or []:
+            key = normalize_phone(phone["number"]) or phone["number"]
+            if key not in seen_phones:
+                seen_phones.add(key)
+                phones.append(phone)
+        for email in duplicate.get("emails") or []:
+            if email["email"].casefold() not in seen_emails:
+                seen_emails.add(email["email"].casefold())
+                emails.append(email)
+        if duplicate.get("notes") and duplicate["notes"] not in notes:
+            notes.append(duplicate["notes"])
+        picture = picture or duplicate.get("profile_picture")
+
+    fields = {"phones": phones, "emails": emails, "notes": "\n".join(notes)}
+    if picture != primary.get("profile_picture"):
+        fields["profile_picture"] = picture
+    return fields
+
+async def merge_contacts(user_id: str, primary_id: str, duplicate_ids: List[str]) -> Dict[str, Any]:
+    """Fold `duplicate_ids` into `primary_id` with one bulk write, then delete them."""
+    duplicate_ids = list(dict.fromkeys(duplicate_ids))
+    if not duplicate_ids or primary_id in duplicate_ids:
+        raise HTTPException(status_code=400, detail="Give a primary contact and at least one other contact")
+    if len(duplicate_ids) > MAX_MERGE_CONTACTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_MERGE_CONTACTS} contacts can be merged at once")
+
+    ids = [primary_id] + duplicate_ids
+    found = {
+        doc["contact_id"]: doc
+        async for doc in contacts_collection.find({"user_id": user_id, "contact_id": {"$in": ids}}, {"_id": 0})
+    }
+    missing = [contact_id for contact_id in ids if contact_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Contacts not found: {', '.join(missing)}")
+
+    primary = found[primary_id]
+    duplicates = [found[contact_id] for contact_id in duplicate_ids]
+    fields = await build_contact_update(primary, merged_fields(primary, duplicates))
+    await contacts_collection.bulk_write([
+        UpdateOne({"user_id": user_id, "contact_id": primary_id}, {"$set": fields}),
+        DeleteMany({"user_id": user_id, "contact_id": {"$in": duplicate_ids}}),
+    ], ordered=True)
+
+    await record_contact_changes(
+        user_id,
+        added=Counter([category_key(primary)]),
+        removed=Counter([category_key(primary)] + [category_key(d) for d in duplicates])
+    )
+    await record_deletions(user_id, duplicate_ids)
+    response_cache.invalidate_user(user_id)
+    return {**primary, **fields}
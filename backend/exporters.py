@@ -0,0 +1,197 @@
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import base64
+import csv
+import io
+import os
+
+from blobs import blob_store
+from categories import category_map, with_category_names
+from database import contacts_collection
+from responses import dumps
+from vcard import CRLF, content_line, escape
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+# App labels as vCard TYPE values
+VCARD_PHONE_TYPES = {"mobile": "cell", "home": "home", "work": "work"}
+VCARD_EMAIL_TYPES = {"personal": "home", "work": "work"}
+# Contacts share pictures, so recently embedded ones are kept base64-encoded
+PHOTO_CACHE_SIZE = 32
+
+# Default projection for exports: everything the client can re-import
+EXPORT_PROJECTION = {"_id": 0, "search_tokens": 0, "phone_e164": 0}
+
+def contacts_cursor(user_id: str, projection: Dict[str, Any] = EXPORT_PROJECTION):
+    return contacts_collection.find({"user_id": user_id}, projection).batch_size(EXPORT_BATCH_SIZE)
+
+async def _batched(user_id: str, projection: Dict[str, Any] = EXPORT_PROJECTION) -> AsyncIterator[list]:
+    # Exports carry category names, which is what imports read back
+    categories = await category_map(user_id)
+
+    def named(batch):
+        for contact in with_category_names(batch, categories):
+            contact.pop("category_id", None)
+        return batch
+
+    batch = []
+    async for contact in contacts_cursor(user_id, projection):
+        batch.append(contact)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield named(batch)
+            batch = []
+    if batch:
+        yield named(batch)
+
+async def stream_json(user_id: str, ndjson: bool = False) -> AsyncIterator[bytes]:
+    """
+    Serialize contacts one cursor batch at a time: a JSON array, or one
+    object per line for NDJSON. Only the current batch is held in memory.
+    """
+    if not ndjson:
+        yield b"[\n"
+    first = True
+    async for batch in _batched(user_id):
+        lines = [dumps(contact) for contact in batch]
+        if ndjson:
+            yield b"\n".join(lines) + b"\n"
+        else:
+            prefix = b"" if first else b",\n"
+            yield prefix + b",\n".join(lines)
+        first = False
+    if not ndjson:
+        yield b"\n]\n"
+
+async def max_multi_values(user_id: str) -> Dict[str, int]:
+    """Largest number of phones and emails on any of the user's contacts."""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": None,
+            "phones": {"$max": {"$size": {"$ifNull": ["$phones", []]}}},
+            "emails": {"$max": {"$size": {"$ifNull": ["$emails", []]}}}
+        }}
+    ]
+    result = await contacts_collection.aggregate(pipeline).to_list(length=1)
+    widest = result[0] if result else {}
+    return {"phones": max(widest.get("phones") or 0, 1), "emails": max(widest.get("emails") or 0, 1)}
+
+def _numbered(base: str, index: int) -> str:
+    return base if index == 1 else f"{base}{index}"
+
+def csv_fieldnames(phones: int, emails: int) -> List[str]:
+    """Column layout read back by import_csv: phone, phone_label, phone2, ..."""
+    fields = ["name"]
+    for i in range(1, phones + 1):
+        fields += [_numbered("phone", i), f"{_numbered('phone', i)}_label"]
+    for i in range(1, emails + 1):
+        fields += [_numbered("email", i), f"{_numbered('email', i)}_label"]
+    return fields + ["category", "notes"]
+
+def csv_row(contact: Dict[str, Any], phones: int, emails: int) -> Dict[str, str]:
+    row = {
+        "name": contact.get("name", ""),
+        "category": contact.get("category", ""),
+        "notes": contact.get("notes", ""),
+    }
+    for i, phone in enumerate((contact.get("phones") or [])[:phones], start=1):
+        row[_numbered("phone", i)] = phone.get("number", "")
+        row[f"{_numbered('phone', i)}_label"] = phone.get("label", "")
+    for i, email in enumerate((contact.get("emails") or [])[:emails], start=1):
+        row[_numbered("email", i)] = email.get("email", "")
+        row[f"{_numbered('email', i)}_label"] = email.get("label", "")
+    return row
+
+async def stream_csv(user_id: str, phones: int, emails: int) -> AsyncIterator[bytes]:
+    """Write CSV rows one cursor batch at a time into a reused buffer."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=csv_fieldnames(phones, emails))
+    writer.writeheader()
+    projection = {"_id": 0, "name": 1, "phones": 1, "emails": 1, "category": 1, "category_id": 1, "notes": 1}
+    async for batch in _batched(user_id, projection):
+        for contact in batch:
+            writer.writerow(csv_row(contact, phones, emails))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _vcard_type(types: Dict[str, str], label: str, version: str) -> Optional[str]:
+    value = types.get(label) or (label.lower() if label.isalnum() else None)
+    if value and version == "3.0":
+        return value.upper()
+    return value
+
+def vcard_card(contact: Dict[str, Any], version: str, photo: Optional[Tuple[str, str]] = None) -> str:
+    """
+    One contact as a vCard. `photo` is (content type, base64 data) to embed;
+    otherwise an external picture URL is referenced.
+    """
+    name = contact.get("name", "")
+    # The app keeps one name; N wants it split, and most clients require N
+    words = name.split()
+    family, given = (words[-1], " ".join(words[:-1])) if len(words) > 1 else ("", name)
+    lines = ["BEGIN:VCARD" + CRLF, content_line("VERSION", version)]
+    lines.append(content_line("FN", escape(name)))
+    lines.append(content_line("N", f"{escape(family)};{escape(given)};;;"))
+
+    for phone in contact.get("phones") or []:
+        kind = _vcard_type(VCARD_PHONE_TYPES, phone.get("label", ""), version)
+        lines.append(content_line("TEL", escape(phone.get("number", "")), {"TYPE": kind} if kind else None))
+    for email in contact.get("emails") or []:
+        kind = _vcard_type(VCARD_EMAIL_TYPES, email.get("label", ""), version)
+        if version == "3.0":
+            kind = f"INTERNET,{kind}" if kind else "INTERNET"
+        lines.append(content_line("EMAIL", escape(email.get("email", "")), {"TYPE": kind} if kind else None))
+    if contact.get("category"):
+        lines.append(content_line("CATEGORIES", escape(contact["category"])))
+    if contact.get("notes"):
+        lines.append(content_line("NOTE", escape(contact["notes"])))
+
+    if photo:
+        content_type, data = photo
+        if version == "4.0":
+            lines.append(content_line("PHOTO", f"data:{content_type};base64,{data}"))
+        else:
+            subtype = content_type.rpartition("/")[2].upper()
+            lines.append(content_line("PHOTO", data, {"ENCODING": "b", "TYPE": subtype}))
+    elif (contact.get("profile_picture") or "").startswith(("http://", "https://")):
+        params = None if version == "4.0" else {"VALUE": "uri"}
+        lines.append(content_line("PHOTO", contact["profile_picture"], params))
+
+    if contact.get("contact_id"):
+        uid = contact["contact_id"]
+        lines.append(content_line("UID", f"urn:uuid:{uid}" if version == "4.0" else uid))
+    if contact.get("updated_at"):
+        lines.append(content_line("REV", contact["updated_at"].strftime("%Y%m%dT%H%M%SZ")))
+    lines.append("END:VCARD" + CRLF)
+    return "".join(lines)
+
+async def _embedded_photo(blob_id: str, cache: "OrderedDict[str, Optional[Tuple[str, str]]]"):
+    if blob_id in cache:
+        cache.move_to_end(blob_id)
+        return cache[blob_id]
+    info = await blob_store.info(blob_id)
+    photo = None
+    if info and info.length:
+        data = b"".join([chunk async for chunk in blob_store.read(blob_id, 0, info.length - 1)])
+        photo = (info.content_type, base64.b64encode(data).decode("ascii"))
+    cache[blob_id] = photo
+    if len(cache) > PHOTO_CACHE_SIZE:
+        cache.popitem(last=False)
+    return photo
+
+async def stream_vcard(user_id: str, version: str = "3.0", photos: bool = True) -> AsyncIterator[bytes]:
+    """
+    Write one chunk of vCards per cursor batch. Pictures in the blob store
+    are embedded as base64 when `photos` is set, read one at a time.
+    """
+    cache: "OrderedDict[str, Optional[Tuple[str, str]]]" = OrderedDict()
+    async for batch in _batched(user_id):
+        cards = []
+        for contact in batch:
+            photo = None
+            if photos and contact.get("profile_picture_id"):
+                photo = await _embedded_photo(contact["profile_picture_id"], cache)
+            cards.append(vcard_card(contact, version, photo))
+        yield "".join(cards).encode()
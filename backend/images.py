@@ -0,0 +1,150 @@
+from typing import Dict, Iterable
+import io
+import os
+import warnings
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from pools import ProcessPool
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+# Square bounding boxes rendered for every upload; the largest is the default variant
+THUMBNAIL_SIZES = (64, 128, 256, 512)
+OUTPUT_FORMAT = "WEBP"
+OUTPUT_CONTENT_TYPE = "image/webp"
+OUTPUT_QUALITY = 80
+# Raster formats accepted as input, by declared content type. Nothing else is
+# decoded, and what gets stored is always re-encoded as OUTPUT_FORMAT.
+INPUT_CONTENT_TYPES = {
+    "image/jpeg": "JPEG", "image/jpg": "JPEG", "image/png": "PNG", "image/webp": "WEBP", "image/gif": "GIF",
+}
+INPUT_FORMATS = tuple(sorted(set(INPUT_CONTENT_TYPES.values())))
+# Largest image decoded, in pixels; a few KB of PNG can otherwise expand to
+# gigabytes in a worker. Set on import, so it holds in the pool workers too.
+Image.MAX_IMAGE_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 40_000_000))
+# Modes resized as they are; anything else is converted first
+RESIZABLE_MODES = ("RGB", "RGBA", "L", "LA", "CMYK")
+READ_CHUNK_SIZE = 64 * 1024
+# Room in a multipart body for boundaries and part headers around the file
+MULTIPART_OVERHEAD = 16 * 1024
+
+image_pool = ProcessPool(IMAGE_WORKERS)
+
+def _too_large(limit: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content={"detail": f"Image must be at most {limit // (1024 * 1024)} MB"}
+    )
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping request bodies on upload routes. Starlette spools
+    a whole multipart body before the handler runs, so the limit has to hold
+    here: a Content-Length over it is refused before anything is read, and a
+    body without one is cut off once it passes the limit.
+    """
+
+    def __init__(self, app, paths: Iterable[str], limit: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        max_body = self.limit + MULTIPART_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > max_body:
+            await _too_large(self.limit)(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    rejected = True
+                    await _too_large(self.limit)(scope, receive, send)
+                    # The app sees the client go away and stops parsing
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def send_wrapper(message):
+            # Whatever the app answers after the cut-off, the 413 already went out
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, send_wrapper)
+
+async def read_limited(file: UploadFile, limit: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Read an upload in chunks, giving up as soon as it exceeds `limit` bytes.
+    The file part alone is checked here; UploadLimitMiddleware bounds the
+    request body before it is spooled.
+    """
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        check_image_size(size, limit)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def check_image_size(size: int, limit: int = MAX_UPLOAD_BYTES):
+    """413 for an image of `size` bytes over `limit`, however it arrived."""
+    if size > limit:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image must be at most {limit // (1024 * 1024)} MB"
+        )
+
+def render_variants(data: bytes) -> Dict[int, bytes]:
+    """
+    Decode an image and re-encode it at each of THUMBNAIL_SIZES. Runs in a
+    worker process. Re-encoding from pixels drops EXIF/GPS and other metadata;
+    orientation is applied first so rotated phone photos stay upright.
+
+    Only the largest size is made from the full decode; it shrinks in place
+    (JPEGs are even decoded at a reduced scale) and the others come from it.
+    """
+    largest = max(THUMBNAIL_SIZES)
+    with warnings.catch_warnings():
+        # Over MAX_IMAGE_PIXELS Pillow only warns; refuse such images outright
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+        with Image.open(io.BytesIO(data), formats=INPUT_FORMATS) as image:
+            if image.mode not in RESIZABLE_MODES:
+                # Palette and bilevel images would resize with nearest-neighbour
+                image = image.convert("RGBA" if image.mode in ("P", "PA") else "RGB")
+            image.thumbnail((largest, largest), Image.LANCZOS)
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P", "PA") else "RGB")
+
+    variants = {}
+    for size in THUMBNAIL_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        output = io.BytesIO()
+        thumbnail.save(output, OUTPUT_FORMAT, quality=OUTPUT_QUALITY, method=4)
+        variants[size] = output.getvalue()
+    return variants
+
+async def process_image(data: bytes) -> Dict[int, bytes]:
+    """Render thumbnail variants off the event loop, in the image process pool."""
+    try:
+        return await image_pool.run(render_variants, data)
+    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning, OSError, ValueError):
+        raise HTTPException(status_code=400, detail="File is not a supported image")
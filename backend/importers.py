@@ -0,0 +1,380 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+from itertools import islice
+import csv
+import json
+import os
+import re
+import time
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from blobs import store_profile_picture
+from cache import response_cache
+from categories import category_ids, store_category_id
+from database import contacts_collection
+from images import INPUT_CONTENT_TYPES
+from stats import category_counts, record_contact_changes
+from models import Contact, ContactCreate
+from normalize import normalize_name
+from vcard import VCardError, iter_logical_lines, parse_line, split_value, unescape
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+# Per-row errors returned to the client; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+READ_CHUNK_SIZE = 64 * 1024
+# A single JSON array element larger than this is rejected rather than buffered
+MAX_JSON_ITEM_SIZE = 16 * 1024 * 1024
+# Likewise a single vCard, which is nearly all embedded photo when it is this big
+MAX_VCARD_SIZE = 16 * 1024 * 1024
+
+DUPLICATE_KEY_ERROR = 11000
+
+class ImportFileError(ValueError):
+    """The upload as a whole cannot be parsed; no further rows can be read."""
+
+class RowError(ValueError):
+    """A single row is invalid; the import continues with the next one."""
+
+def describe_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+def contact_from_fields(user_id: str, fields: Dict[str, Any]) -> Contact:
+    """Validate raw import fields the same way POST /api/contacts does."""
+    values = {k: v for k, v in fields.items() if k in ContactCreate.__fields__ and v is not None}
+    try:
+        return Contact(user_id=user_id, **ContactCreate(**values).dict())
+    except ValidationError as e:
+        raise RowError(describe_validation_error(e))
+
+_NUMBER_CHARS = set("0123456789.eE+-")
+
+class _JSONArrayReader:
+    """Yields the elements of a top-level JSON array while reading it in chunks."""
+
+    def __init__(self, stream: TextIO, chunk_size: int = READ_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self):
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if len(self.buffer) > MAX_JSON_ITEM_SIZE:
+            raise ImportFileError("JSON array element too large or malformed")
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ""
+            self._read_more()
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            found = repr(char) if char else "end of file"
+            raise ImportFileError(f"Expected one of {chars!r}, found {found}")
+        self.pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ImportFileError(e.msg)
+                self._read_more()
+                continue
+            # A number or literal touching the end of the buffer may continue in the next
+            # chunk; so may a number cut at its "." or exponent ("-0." decodes as -0)
+            if not self.eof and (end == len(self.buffer) or self._number_cut_short(value, end)):
+                self._read_more()
+                continue
+            self.pos = end
+            return value
+
+    def _number_cut_short(self, value: Any, end: int) -> bool:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        rest = self.buffer[end:end + 3]
+        return len(rest) < 3 and all(char in _NUMBER_CHARS for char in rest)
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            self._peek()
+            yield self._decode_value()
+            if self._expect(",]") == "]":
+                return
+
+def iter_json_array(stream: TextIO) -> Iterator[Any]:
+    return iter(_JSONArrayReader(stream))
+
+# phone, phone2, phone3, ... and email, email2, ... with optional "<column>_label"
+_MULTI_VALUE_COLUMN = re.compile(r"^(phone|email)(\d*)$")
+DEFAULT_LABELS = {"phone": "mobile", "email": "personal"}
+
+def iter_csv_rows(stream: TextIO) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Lazily yield (line number, row) pairs from a CSV stream with a header row."""
+    reader = csv.DictReader(stream)
+    try:
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as e:
+        raise ImportFileError(f"line {reader.line_num}: {e}")
+
+def contact_fields_from_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """Map a CSV row (the export_csv column layout) onto ContactCreate fields."""
+    values: Dict[str, List[Tuple[int, Dict[str, str]]]] = {"phone": [], "email": []}
+    for column, value in row.items():
+        match = _MULTI_VALUE_COLUMN.match((column or "").strip().lower())
+        if not match or not value or not value.strip():
+            continue
+        kind, index = match.group(1), int(match.group(2) or 1)
+        label = (row.get(f"{column}_label") or "").strip() or DEFAULT_LABELS[kind]
+        entry = {"number" if kind == "phone" else "email": value.strip(), "label": label}
+        values[kind].append((index, entry))
+
+    return {
+        "name": row.get("name") or "",
+        "phones": [entry for _, entry in sorted(values["phone"], key=lambda v: v[0])],
+        "emails": [entry for _, entry in sorted(values["email"], key=lambda v: v[0])],
+        "category": row.get("category") or "General",
+        "notes": row.get("notes") or "",
+    }
+
+# vCard TYPE parameters mapped onto the app's phone and email labels
+VCARD_PHONE_LABELS = {"cell": "mobile", "mobile": "mobile", "iphone": "mobile", "home": "home", "work": "work"}
+VCARD_EMAIL_LABELS = {"work": "work", "home": "personal"}
+
+def iter_vcards(stream: TextIO) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Lazily yield (line number, unfolded content lines) for each
+    BEGIN:VCARD ... END:VCARD block; one card is held in memory at a time.
+    """
+    card: Optional[List[str]] = None
+    start = size = 0
+    try:
+        for number, line in iter_logical_lines(stream, MAX_VCARD_SIZE):
+            marker = line.strip().upper()
+            if card is None:
+                if marker == "BEGIN:VCARD":
+                    card, start, size = [], number, 0
+                elif marker:
+                    raise ImportFileError(f"line {number}: expected BEGIN:VCARD")
+            elif marker == "END:VCARD":
+                yield start, card
+                card = None
+            elif marker == "BEGIN:VCARD":
+                raise ImportFileError(f"line {start}: vCard has no END:VCARD")
+            elif marker:
+                size += len(line)
+                if size > MAX_VCARD_SIZE:
+                    raise ImportFileError(f"line {start}: vCard too large")
+                card.append(line)
+    except VCardError as e:
+        raise ImportFileError(str(e))
+    if card is not None:
+        raise ImportFileError(f"line {start}: vCard has no END:VCARD")
+
+def _vcard_label(types: List[str], labels: Dict[str, str], default: str) -> str:
+    return next((labels[t] for t in types if t in labels), default)
+
+def _vcard_photo(params: Dict[str, List[str]], value: str) -> Optional[str]:
+    """
+    An embedded photo as a data URL (stored like an uploaded one), or a photo
+    URL. Embedded photos in formats other than JPEG, PNG, WebP and GIF are dropped.
+    """
+    value = value.strip()
+    if {v.lower() for v in params.get("ENCODING", [])} & {"b", "base64"}:
+        # 3.0 TYPE=JPEG, 2.1 bare JPEG, or a full media type
+        media_type = (params.get("TYPE") or ["jpeg"])[0].lower()
+        if "/" not in media_type:
+            media_type = f"image/{media_type}"
+        if media_type not in INPUT_CONTENT_TYPES:
+            return None
+        return f"data:{media_type};base64,{''.join(value.split())}"
+    if value.startswith("data:"):
+        media_type = re.split(r"[;,]", value[len("data:"):], maxsplit=1)[0].lower()
+        return value if media_type in INPUT_CONTENT_TYPES else None
+    if value.startswith(("http://", "https://")):
+        return value
+    return None
+
+def contact_fields_from_vcard(lines: List[str]) -> Dict[str, Any]:
+    """Map one vCard (2.1, 3.0 or 4.0) onto ContactCreate fields."""
+    fields: Dict[str, Any] = {"name": "", "phones": [], "emails": []}
+    structured_name = organization = ""
+    notes = []
+    for line in lines:
+        try:
+            prop = parse_line(line)
+        except VCardError as e:
+            raise RowError(str(e))
+
+        if prop.name == "FN":
+            fields["name"] = unescape(prop.value).strip()
+        elif prop.name == "N":
+            # family;given;additional;prefixes;suffixes, shown as "prefix given additional family suffix"
+            parts = [part.strip() for part in split_value(prop.value)] + [""] * 5
+            structured_name = " ".join(p for p in (parts[3], parts[1], parts[2], parts[0], parts[4]) if p)
+        elif prop.name == "ORG":
+            organization = split_value(prop.value)[0].strip()
+        elif prop.name == "TEL":
+            number = unescape(prop.value).strip()
+            # 4.0 allows VALUE=uri: tel:+1-555-0100
+            if number.lower().startswith("tel:"):
+                number = number[4:]
+            if number:
+                label = _vcard_label(prop.types(), VCARD_PHONE_LABELS, DEFAULT_LABELS["phone"])
+                fields["phones"].append({"number": number, "label": label})
+        elif prop.name == "EMAIL":
+            email = unescape(prop.value).strip()
+            if email:
+                label = _vcard_label(prop.types(), VCARD_EMAIL_LABELS, DEFAULT_LABELS["email"])
+                fields["emails"].append({"email": email, "label": label})
+        elif prop.name == "CATEGORIES" and "category" not in fields:
+            # The app has one category per contact; the first listed wins
+            categories = [c.strip() for c in split_value(prop.value, ",") if c.strip()]
+            if categories:
+                fields["category"] = categories[0]
+        elif prop.name == "NOTE":
+            notes.append(unescape(prop.value))
+        elif prop.name == "PHOTO" and "profile_picture" not in fields:
+            fields["profile_picture"] = _vcard_photo(prop.params, prop.value)
+
+    fields["name"] = fields["name"] or structured_name or organization
+    fields["notes"] = "\n".join(notes)
+    return fields
+
+class ContactImporter:
+    """
+    Writes validated contacts in `insert_many` batches, skipping names the
+    user already has (loaded once) or that appeared earlier in the file.
+    """
+
+    def __init__(self, user_id: str, batch_size: int = IMPORT_BATCH_SIZE):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.existing_keys = set()
+        self.pending: List[Dict[str, Any]] = []
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    async def load_existing_keys(self):
+        cursor = contacts_collection.find({"user_id": self.user_id}, {"_id": 0, "name_key": 1, "name": 1})
+        async for doc in cursor:
+            # Contacts from before name_key was stored are matched on their normalized name
+            self.existing_keys.add(doc.get("name_key") or normalize_name(doc.get("name") or ""))
+
+    def add_error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    async def add(self, row: int, contact: Contact):
+        if contact.name_key in self.existing_keys:
+            self.skipped += 1
+            return
+        try:
+            doc = await store_profile_picture(contact.dict())
+        except HTTPException as e:
+            self.add_error(row, e.detail)
+            return
+        self.existing_keys.add(contact.name_key)
+        self.pending.append(doc)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        # One lookup per batch for the category names it uses
+        ids = await category_ids(self.user_id, {doc.get("category") for doc in batch})
+        for doc in batch:
+            store_category_id(doc, ids)
+        inserted = batch
+        try:
+            await contacts_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Names created concurrently since the keys were loaded count as skipped
+            failed = set()
+            for err in e.details.get("writeErrors", []):
+                failed.add(err["index"])
+                if err.get("code") == DUPLICATE_KEY_ERROR:
+                    self.skipped += 1
+                else:
+                    self.add_error(-1, err.get("errmsg", "Write failed"))
+            inserted = [doc for i, doc in enumerate(batch) if i not in failed]
+        self.imported += len(inserted)
+        await record_contact_changes(self.user_id, added=category_counts(inserted))
+        response_cache.invalidate_user(self.user_id)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        processed = self.imported + self.skipped + self.failed
+        return {
+            "message": f"Imported {self.imported} contacts",
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+            "rows_per_second": round(processed / elapsed, 1) if elapsed > 0 else None,
+        }
+
+def _next_batch(
+    rows: Iterator[Tuple[int, Any]],
+    build: Callable[[Any], Contact],
+    size: int
+) -> List[Tuple[int, Optional[Contact], Optional[str]]]:
+    batch = []
+    for row, raw in islice(rows, size):
+        try:
+            batch.append((row, build(raw), None))
+        except RowError as e:
+            batch.append((row, None, str(e)))
+    return batch
+
+async def run_import(
+    importer: ContactImporter,
+    rows: Iterator[Tuple[int, Any]],
+    build: Callable[[Any], Contact]
+) -> Dict[str, Any]:
+    """
+    Drain `rows` (a blocking iterator over the upload) a batch at a time on
+    the threadpool, validating with `build` there too, and write each batch.
+    """
+    await importer.load_existing_keys()
+    while True:
+        batch = await run_in_threadpool(_next_batch, rows, build, importer.batch_size)
+        if not batch:
+            break
+        for row, contact, error in batch:
+            if error is not None:
+                importer.add_error(row, error)
+            else:
+                await importer.add(row, contact)
+    await importer.flush()
+    return importer.summary()
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+import bisect
+import os
+import threading
+import time
+
+import bson
+from pymongo import monitoring
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+# Measuring reply sizes re-encodes every reply to BSON, so it is opt-in
+MEASURE_COMMAND_BYTES = os.getenv("METRICS_MONGO_BYTES", "0") == "1"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+class Registry:
+    """Minimal thread-safe metric store rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self.help: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, text: str):
+        self.help[name] = (kind, text)
+
+    def inc(self, name: str, labels: Labels, value: float = 1):
+        with self.lock:
+            self.counters[name][labels] += value
+
+    def observe(self, name: str, labels: Labels, value: float, buckets=LATENCY_BUCKETS):
+        with self.lock:
+            series = self.histograms[name]
+            if labels not in series:
+                series[labels] = Histogram(buckets)
+            series[labels].observe(value)
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name, series in self.counters.items():
+                lines += self._header(name)
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in self.histograms.items():
+                lines += self._header(name)
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", f"{bound:g}" if bound != "+Inf" else bound),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str):
+        kind, text = self.help.get(name, ("untyped", ""))
+        return [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+registry = Registry()
+registry.describe("http_request_duration_seconds", "histogram", "HTTP request latency by route")
+registry.describe("http_request_mongodb_commands", "histogram", "MongoDB commands issued per HTTP request")
+registry.describe("mongodb_commands_total", "counter", "MongoDB commands by route, command and outcome")
+registry.describe("mongodb_command_duration_seconds_total", "counter", "Time spent in MongoDB commands")
+registry.describe("mongodb_command_reply_bytes_total", "counter", "BSON bytes of MongoDB replies")
+
+class RequestStats:
+    """Mongo activity attributed to the request being served."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands: Dict[Tuple[str, str], Tuple[int, float, int]] = {}
+
+    def add(self, command: str, outcome: str, seconds: float, reply_bytes: int):
+        # Concurrent awaits within one request report from different driver threads
+        with self.lock:
+            count, total, size = self.commands.get((command, outcome), (0, 0.0, 0))
+            self.commands[(command, outcome)] = (count + 1, total + seconds, size + reply_bytes)
+
+# Motor runs pymongo on worker threads but copies the caller's context, so the
+# command listener sees the RequestStats of the request that issued the command
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def _record_command(command: str, outcome: str, seconds: float, reply_bytes: int):
+    stats = current_request.get()
+    if stats is not None:
+        stats.add(command, outcome, seconds, reply_bytes)
+        return
+    # Outside a request: startup, migrations, background jobs
+    _flush_commands("background", {(command, outcome): (1, seconds, reply_bytes)})
+
+def _flush_commands(route: str, commands):
+    for (command, outcome), (count, seconds, size) in commands.items():
+        labels = (("route", route), ("command", command), ("outcome", outcome))
+        registry.inc("mongodb_commands_total", labels, count)
+        registry.inc("mongodb_command_duration_seconds_total", labels, seconds)
+        if size:
+            registry.inc("mongodb_command_reply_bytes_total", labels, size)
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        reply_bytes = len(bson.encode(event.reply)) if MEASURE_COMMAND_BYTES else 0
+        _record_command(event.command_name, "success", event.duration_micros / 1e6, reply_bytes)
+
+    def failed(self, event):
+        _record_command(event.command_name, "failure", event.duration_micros / 1e6, 0)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and Mongo command counts per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            # FastAPI stores the matched route in the scope; label by template, not raw path
+            route = getattr(scope.get("route"), "path", "unmatched")
+            labels = (("method", scope["method"]), ("route", route), ("status", str(status_code)))
+            registry.observe("http_request_duration_seconds", labels, elapsed)
+            registry.observe(
+                "http_request_mongodb_commands",
+                (("method", scope["method"]), ("route", route)),
+                sum(count for count, _, _ in stats.commands.values()),
+                COMMAND_COUNT_BUCKETS,
+            )
+            _flush_commands(route, stats.commands)
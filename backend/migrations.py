@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+One-off data migrations for existing deployments.
+
+Each migration is idempotent and can be re-run safely:
+
+    python migrations.py backfill_name_keys
+"""
+
+import asyncio
+import sys
+
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from blobs import store_profile_picture
+from categories import DEFAULT_CATEGORY, category_ids
+from database import REDUNDANT_INDEXES, contacts_collection, create_indexes
+from normalize import normalize_name, normalize_phones
+from search import tokens_for_document
+from stats import reconcile_all_stats, reconcile_user_stats
+
+BATCH_SIZE = 1000
+
+async def _flush(collection, ops):
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        ops.clear()
+
+async def backfill_name_keys():
+    """
+    Store `name_key` on every contact so the unique (user_id, name_key) index
+    can be built. Contacts whose names already collide keep their data; the
+    newer ones get a key suffixed with their contact_id and are reported.
+    """
+    ops = []
+    updated = 0
+    collisions = []
+    current_user = None
+    seen = set()
+
+    cursor = contacts_collection.find(
+        {}, {"_id": 1, "user_id": 1, "contact_id": 1, "name": 1, "name_key": 1}
+    ).sort([("user_id", 1), ("created_at", 1), ("contact_id", 1)])
+
+    async for doc in cursor:
+        if doc["user_id"] != current_user:
+            current_user = doc["user_id"]
+            seen = set()
+
+        name_key = normalize_name(doc.get("name", ""))
+        if name_key in seen:
+            collisions.append((doc["user_id"], doc["contact_id"], doc.get("name")))
+            name_key = f"{name_key}#{doc['contact_id']}"
+        seen.add(name_key)
+
+        if doc.get("name_key") != name_key:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"name_key": name_key}}))
+            updated += 1
+        if len(ops) >= BATCH_SIZE:
+            await _flush(contacts_collection, ops)
+
+    await _flush(contacts_collection, ops)
+
+    print(f"backfill_name_keys: updated {updated} contacts")
+    for user_id, contact_id, name in collisions:
+        print(f"  duplicate name for user {user_id}: {name!r} ({contact_id})")
+
+async def backfill_search_tokens():
+    """Recompute `search_tokens` for every contact from its current fields."""
+    ops = []
+    updated = 0
+
+    cursor = contacts_collection.find(
+        {}, {"_id": 1, "name": 1, "phones": 1, "emails": 1, "notes": 1, "search_tokens": 1}
+    )
+    async for doc in cursor:
+        tokens = tokens_for_document(doc)
+        if doc.get("search_tokens") != tokens:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_tokens": tokens}}))
+            updated += 1
+        if len(ops) >= BATCH_SIZE:
+            await _flush(contacts_collection, ops)
+
+    await _flush(contacts_collection, ops)
+    print(f"backfill_search_tokens: updated {updated} contacts")
+
+async def backfill_phone_e164():
+    """Store E.164-normalized phone numbers in `phone_e164` for caller ID lookups."""
+    ops = []
+    updated = 0
+
+    async for doc in contacts_collection.find({}, {"_id": 1, "phones": 1, "phone_e164": 1}):
+        numbers = normalize_phones(p.get("number", "") for p in doc.get("phones") or [])
+        if doc.get("phone_e164") != numbers:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"phone_e164": numbers}}))
+            updated += 1
+        if len(ops) >= BATCH_SIZE:
+            await _flush(contacts_collection, ops)
+
+    await _flush(contacts_collection, ops)
+    print(f"backfill_phone_e164: updated {updated} contacts")
+
+async def extract_profile_pictures():
+    """
+    Move inline base64 data URLs out of contact documents into the blob store.
+    Pictures that are not a supported image are left in place and counted.
+    """
+    ops = []
+    moved = 0
+    rejected = 0
+
+    cursor = contacts_collection.find(
+        {"profile_picture": {"$regex": "^data:"}}, {"_id": 1, "profile_picture": 1}
+    ).batch_size(100)
+    async for doc in cursor:
+        try:
+            fields = await store_profile_picture({"profile_picture": doc["profile_picture"]})
+        except HTTPException:
+            rejected += 1
+            continue
+        if fields["profile_picture_id"]:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+            moved += 1
+        if len(ops) >= 100:
+            await _flush(contacts_collection, ops)
+
+    await _flush(contacts_collection, ops)
+    print(f"extract_profile_pictures: moved {moved} pictures, left {rejected} that are not supported images")
+
+async def reference_categories_by_id():
+    """
+    Replace the category name stored on each contact with the id of the
+    user's category of that name, creating categories that only existed as
+    names on contacts. Stats are rebuilt, since they are now counted by id.
+    """
+    unmigrated = {"category_id": {"$exists": False}}
+    migrated = 0
+    users = await contacts_collection.distinct("user_id", unmigrated)
+    for user_id in users:
+        # None also matches contacts without a category; they go to General
+        names = set(await contacts_collection.distinct("category", {"user_id": user_id, **unmigrated})) | {None}
+        ids = await category_ids(user_id, names)
+        # One update per category name, not per contact
+        for name in names:
+            result = await contacts_collection.update_many(
+                {"user_id": user_id, "category": name, **unmigrated},
+                {"$set": {"category_id": ids[name or DEFAULT_CATEGORY]}, "$unset": {"category": ""}}
+            )
+            migrated += result.modified_count
+        await reconcile_user_stats(user_id)
+    print(f"reference_categories_by_id: updated {migrated} contacts of {len(users)} users")
+
+async def reconcile_stats():
+    """Rebuild every user's materialized stats document from their contacts."""
+    count = await reconcile_all_stats()
+    print(f"reconcile_stats: rebuilt stats for {count} users")
+
+async def drop_redundant_indexes():
+    """Drop indexes that a compound index with the same leading key now covers."""
+    # Build the replacements first so queries are never left without an index
+    await create_indexes()
+    dropped = []
+    for collection, name in REDUNDANT_INDEXES:
+        if name in await collection.index_information():
+            await collection.drop_index(name)
+            dropped.append(f"{collection.name}.{name}")
+    print(f"drop_redundant_indexes: dropped {', '.join(dropped) or 'nothing'}")
+
+MIGRATIONS = {
+    "backfill_name_keys": backfill_name_keys,
+    "backfill_search_tokens": backfill_search_tokens,
+    "backfill_phone_e164": backfill_phone_e164,
+    "extract_profile_pictures": extract_profile_pictures,
+    "reference_categories_by_id": reference_categories_by_id,
+    "reconcile_stats": reconcile_stats,
+    "drop_redundant_indexes": drop_redundant_indexes,
+}
+
+async def main(names):
+    for name in names:
+        await MIGRATIONS[name]()
+    await create_indexes()
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(MIGRATIONS)
+    unknown = [name for name in names if name not in MIGRATIONS]
+    if unknown:
+        sys.exit(f"Unknown migrations: {', '.join(unknown)}. Available: {', '.join(MIGRATIONS)}")
+    asyncio.run(main(names))
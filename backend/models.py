@@ -3,6 +3,9 @@ from typing import List, Optional
 from datetime import datetime
 import uuid
 
+from normalize import normalize_name, normalize_phones
+from search import contact_search_tokens
+
 class UserRegister(BaseModel):
     email: EmailStr
     password: str
@@ -55,17 +58,63 @@ class ContactUpdate(BaseModel):
     notes: Optional[str] = None
     profile_picture: Optional[str] = None
 
+class BatchOperation(BaseModel):
+    op: str  # create, update, delete
+    contact_id: Optional[str] = None
+    data: dict = {}
+
+    @validator('op')
+    def known_op(cls, v):
+        if v not in ('create', 'update', 'delete'):
+            raise ValueError('op must be create, update or delete')
+        return v
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    ordered: bool = True
+
+class MergeRequest(BaseModel):
+    primary_id: str
+    duplicate_ids: List[str]
+
+class PhoneLookupRequest(BaseModel):
+    phones: List[str]
+    region: Optional[str] = None
+
 class Contact(BaseModel):
     contact_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     name: str
+    name_key: str = ""
     phones: List[PhoneNumber] = []
     emails: List[EmailAddress] = []
+    # The name a contact is written with; stored as category_id (see categories.py)
     category: str = "General"
+    category_id: Optional[str] = None
     notes: str = ""
     profile_picture: Optional[str] = None
+    profile_picture_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    search_tokens: List[str] = []
+    phone_e164: List[str] = []
+
+    @validator('name_key', always=True)
+    def derive_name_key(cls, v, values):
+        return normalize_name(values.get('name', ''))
+
+    @validator('search_tokens', always=True)
+    def derive_search_tokens(cls, v, values):
+        return contact_search_tokens(
+            values.get('name', ''),
+            [p.number for p in values.get('phones', [])],
+            [e.email for e in values.get('emails', [])],
+            values.get('notes', '')
+        )
+
+    @validator('phone_e164', always=True)
+    def derive_phone_e164(cls, v, values):
+        return normalize_phones(p.number for p in values.get('phones', []))
 
 class Category(BaseModel):
     category_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
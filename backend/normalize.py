@@ -0,0 +1,39 @@
+from functools import lru_cache
+from typing import Iterable, List, Optional
+import os
+import re
+import unicodedata
+
+import phonenumbers
+
+# Region assumed for numbers typed without a country code, e.g. "(415) 555-0100"
+DEFAULT_PHONE_REGION = os.getenv("DEFAULT_PHONE_REGION", "US")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_name(name: str) -> str:
+    """
+    Key used to compare contact names: accents folded, case folded and
+    whitespace collapsed, so "  José  Smith" and "jose smith" collide.
+    """
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _WHITESPACE.sub(" ", stripped.casefold()).strip()
+
+@lru_cache(maxsize=8192)
+def normalize_phone(number: str, region: str = DEFAULT_PHONE_REGION) -> Optional[str]:
+    """
+    E.164 form of a phone number ("+14155550100"), or None when it cannot be
+    read as one. Extensions are dropped, so a desk line matches its base number.
+    """
+    try:
+        parsed = phonenumbers.parse(number or "", region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+def normalize_phones(numbers: Iterable[str]) -> List[str]:
+    """Distinct E.164 numbers for a contact's `phone_e164` index field."""
+    return sorted({e164 for e164 in map(normalize_phone, numbers) if e164})
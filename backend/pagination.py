@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import base64
+import json
+
+SortKeys = List[Tuple[str, int]]
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+def _sort_signature(sort_keys: SortKeys) -> str:
+    # "name,contact_id" or "-created_at,-contact_id"
+    return ",".join(("" if direction == 1 else "-") + field for field, direction in sort_keys)
+
+def encode_cursor(doc: Dict[str, Any], sort_keys: SortKeys) -> str:
+    """Build an opaque cursor pointing just past `doc` in `sort_keys` order."""
+    values = [_encode_value(doc.get(field)) for field, _ in sort_keys]
+    raw = json.dumps({"k": _sort_signature(sort_keys), "v": values}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_keys: SortKeys) -> List[Any]:
+    """
+    Decode a cursor from `encode_cursor`. Raises ValueError if it is malformed
+    or was issued for a different sort order, whose values would silently
+    select the wrong page.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(payload, dict) or payload.get("k") != _sort_signature(sort_keys):
+        raise ValueError("Invalid cursor")
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise ValueError("Invalid cursor")
+    return [_decode_value(v) for v in values]
+
+def keyset_filter(sort_keys: SortKeys, values: List[Any]) -> Dict[str, Any]:
+    """
+    Filter matching documents strictly after `values` in `sort_keys` order.
+
+    For keys (a, b) this expands to `a > va OR (a == va AND b > vb)`, which an
+    index on the same keys answers with a single range seek instead of a skip.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort_keys):
+        clause = {f: values[j] for j, (f, _) in enumerate(sort_keys[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
@@ -0,0 +1,25 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+
+class ProcessPool:
+    """
+    A ProcessPoolExecutor for CPU-bound work that would otherwise hold the GIL
+    and stall the event loop. Workers start on first use rather than on
+    import, and a pool that was shut down starts again when next used.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run `fn(*args)` in a worker; both must be picklable."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,22 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+def _default(value: Any):
+    # Anything orjson has no native encoding for (e.g. a stray ObjectId)
+    return str(value)
+
+def dumps(content: Any) -> bytes:
+    """Encode Mongo documents as JSON; datetimes become ISO 8601 like jsonable_encoder's."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson. Handlers return it directly so FastAPI
+    skips `jsonable_encoder`, which walks every value of a large contact list
+    in Python before `json.dumps` gets to run.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
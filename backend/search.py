@@ -0,0 +1,114 @@
+from typing import Any, Dict, Iterable, List, Optional
+import re
+
+from normalize import normalize_name
+
+# Longest note-derived token list stored per contact; keeps documents bounded
+MAX_NOTE_TOKENS = 64
+# Shortest phone suffix indexed, so "0100" finds "+1 415-555-0100"
+MIN_PHONE_SUFFIX = 4
+
+_WORD = re.compile(r"\w+")
+_EMAIL_PARTS = re.compile(r"[._+\-]+")
+_EDGE_PUNCTUATION = re.compile(r"^\W+|\W+$")
+
+# Relevance ordering for search results; contact_id keeps positions unique
+SEARCH_SORT_KEYS = [("_score", -1), ("name_key", 1), ("contact_id", 1)]
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(normalize_name(text))
+
+def _digits(number: str) -> str:
+    return "".join(c for c in number if c.isdigit())
+
+def contact_search_tokens(
+    name: str,
+    phones: Iterable[str] = (),
+    emails: Iterable[str] = (),
+    notes: Optional[str] = ""
+) -> List[str]:
+    """
+    Tokens stored in `search_tokens` for the (user_id, search_tokens) index.
+    Queries match them by prefix, so only word starts and phone suffixes
+    need to be materialized here.
+    """
+    tokens = set(_words(name))
+
+    for number in phones:
+        digits = _digits(number)
+        for start in range(0, len(digits) - MIN_PHONE_SUFFIX + 1):
+            tokens.add(digits[start:])
+
+    for email in emails:
+        email = normalize_name(email)
+        local, _, domain = email.partition("@")
+        tokens.update(t for t in (email, local, domain) if t)
+        tokens.update(t for t in _EMAIL_PARTS.split(local) if t)
+        tokens.update(t for t in domain.split(".") if t)
+
+    note_tokens = []
+    for word in _words(notes or ""):
+        if word not in tokens and word not in note_tokens:
+            note_tokens.append(word)
+    tokens.update(note_tokens[:MAX_NOTE_TOKENS])
+
+    return sorted(tokens)
+
+def tokens_for_document(doc: Dict[str, Any]) -> List[str]:
+    return contact_search_tokens(
+        doc.get("name", ""),
+        [p.get("number", "") for p in doc.get("phones") or []],
+        [e.get("email", "") for e in doc.get("emails") or []],
+        doc.get("notes", "")
+    )
+
+def parse_search_terms(search: str) -> List[str]:
+    """
+    Split user input into normalized terms the same way stored tokens are
+    split, so "mary-jane" and "o'brien" search for their words. Phone-like
+    input collapses to digits; email addresses stay whole, as they are
+    also stored whole.
+    """
+    digits = _digits(search)
+    if digits and not re.search(r"[^\d\s+()\-.]", search):
+        return [digits]
+    terms = []
+    for part in normalize_name(search).split():
+        part = _EDGE_PUNCTUATION.sub("", part)
+        terms.extend([part] if "@" in part else _WORD.findall(part))
+    return list(dict.fromkeys(terms))
+
+def build_search_pipeline(
+    user_id: str,
+    terms: List[str],
+    category_id: Optional[str] = None,
+    after: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Ranked search: every term must prefix-match a token (an index range scan
+    per term), then contacts whose name matches rank above notes/phone/email hits.
+    """
+    match: Dict[str, Any] = {
+        "user_id": user_id,
+        "$and": [{"search_tokens": re.compile("^" + re.escape(t))} for t in terms]
+    }
+    if category_id:
+        match["category_id"] = category_id
+
+    name_hits = [
+        {"$cond": [{"$regexMatch": {"input": "$name_key", "regex": r"(^|\W)" + re.escape(t)}}, 2, 0]}
+        for t in terms
+    ]
+    # The terms in order, separated by whatever the name has between words
+    phrase = "^" + r"\W+".join(re.escape(t) for t in terms)
+    exact = {"$cond": [{"$regexMatch": {"input": "$name_key", "regex": phrase + "$"}}, 5, 0]}
+    leading = {"$cond": [{"$regexMatch": {"input": "$name_key", "regex": phrase}}, 1, 0]}
+
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"_score": {"$add": [len(terms), exact, leading] + name_hits}}},
+    ]
+    if after is not None:
+        pipeline.append({"$match": after})
+    pipeline.append({"$sort": dict(SEARCH_SORT_KEYS)})
+    return pipeline
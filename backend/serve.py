@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Production entry point: builds indexes once, then runs the API in N uvicorn
+worker processes. With a single worker the app runs in this process and
+builds its indexes on startup instead.
+
+    python serve.py --workers 4 --port 8001
+
+Workers default to WEB_CONCURRENCY, else the number of CPUs. Each worker has
+its own MongoDB connection pool (MONGO_MAX_POOL_SIZE etc., see database.py),
+so the server sees up to workers x maxPoolSize connections.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import uvicorn
+
+def bootstrap_indexes():
+    # Imported here so the parent only touches the database when asked to.
+    # This closes the shared client, so the app must not be served from this
+    # process afterwards.
+    from database import close_client, create_indexes
+
+    started = time.perf_counter()
+    asyncio.run(create_indexes())
+    close_client()
+    print(f"serve: indexes ready in {time.perf_counter() - started:.2f}s", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8001)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 0)) or os.cpu_count())
+    parser.add_argument("--skip-indexes", action="store_true", help="assume indexes already exist")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    if args.skip_indexes:
+        os.environ["INDEX_BOOTSTRAP"] = "skip"
+    elif args.workers > 1:
+        # Only this process builds indexes; workers are fresh processes that
+        # inherit the env and skip it
+        bootstrap_indexes()
+        os.environ["INDEX_BOOTSTRAP"] = "skip"
+    # else: uvicorn imports the app into this process, whose lifespan builds them
+
+    uvicorn.run(
+        "server:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+
+if __name__ == "__main__":
+    main()
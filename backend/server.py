@@ -1,26 +1,72 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, status, Query
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, status, Path, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pymongo import MongoClient
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from collections import Counter
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional
 import os
 from dotenv import load_dotenv
-import base64
 import io
-import csv
-import json
 
 from models import (
     UserRegister, UserLogin, User, ContactCreate, ContactUpdate, 
-    Contact, Category, Token, PhoneNumber, EmailAddress
+    Contact, Category, Token, BatchRequest, MergeRequest, PhoneLookupRequest
 )
-from auth import hash_password, verify_password, create_access_token, get_current_user
+from auth import (
+    hash_password_async, verify_and_update_password_async, create_access_token, get_current_user,
+    shutdown_hash_pool
+)
+from batch import MAX_BATCH_OPERATIONS, ContactBatch, build_contact_update
+from cache import response_cache
+from categories import (
+    DEFAULT_CATEGORY, category_ids, category_map, resolve_category_id, store_category_id, with_category_names
+)
+from blobs import (
+    PICTURE_CONTENT_TYPES, blob_store, parse_byte_range, pick_variant, picture_url, store_picture_variants,
+    store_profile_picture
+)
+from duplicates import DEFAULT_MIN_SCORE, duplicates_pool, find_duplicates, merge_contacts
+from database import (
+    users_collection, contacts_collection, categories_collection, close_client, create_indexes
+)
+from metrics import MetricsMiddleware, registry
+from normalize import DEFAULT_PHONE_REGION, normalize_phone
+from pagination import encode_cursor, decode_cursor, keyset_filter
+from responses import FastJSONResponse
+from exporters import max_multi_values, stream_csv, stream_json, stream_vcard
+from images import UploadLimitMiddleware, image_pool, process_image, read_limited
+from importers import (
+    ContactImporter, ImportFileError, RowError, contact_fields_from_csv_row, contact_fields_from_vcard,
+    contact_from_fields, iter_csv_rows, iter_json_array, iter_vcards, run_import
+)
+from stats import category_key, get_user_stats, record_contact_changes
+from sync import SyncTokenExpired, contact_changes, record_deletions
+from search import SEARCH_SORT_KEYS, build_search_pipeline, parse_search_terms
+from versions import bump_data_version, data_etag, etag_headers, etag_matches, get_data_version
 
 load_dotenv()
 
-app = FastAPI(title="Contact Book API")
+# "startup" builds indexes in every process; the multi-worker launcher builds
+# them once up front and sets "skip" for its workers (see serve.py)
+INDEX_BOOTSTRAP = os.getenv("INDEX_BOOTSTRAP", "startup")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if INDEX_BOOTSTRAP == "startup":
+        await create_indexes()
+    yield
+    image_pool.shutdown()
+    shutdown_hash_pool()
+    duplicates_pool.shutdown()
+    close_client()
+
+app = FastAPI(title="Contact Book API", lifespan=lifespan)
 
+# Innermost, so its 413 still gets CORS headers
+app.add_middleware(UploadLimitMiddleware, paths=["/api/upload-profile-picture"])
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,46 +74,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# Outermost, so its latency covers the whole stack
+app.add_middleware(MetricsMiddleware)
 
-# MongoDB connection
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
-DATABASE_NAME = os.getenv("DATABASE_NAME", "contactbook")
-
-client = MongoClient(MONGO_URL)
-db = client[DATABASE_NAME]
-
-# Collections
-users_collection = db["users"]
-contacts_collection = db["contacts"]
-categories_collection = db["categories"]
-
-# Create indexes
-users_collection.create_index("email", unique=True)
-contacts_collection.create_index("user_id")
-categories_collection.create_index("user_id")
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+# Upper bound on phone/email column pairs in a CSV export
+MAX_CSV_VALUE_COLUMNS = 20
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # ==================== AUTH ROUTES ====================
 
 @app.post("/api/auth/register", response_model=Token)
 async def register(user_data: UserRegister):
     # Check if user exists
-    if users_collection.find_one({"email": user_data.email}):
+    if await users_collection.find_one({"email": user_data.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
     user = User(
         email=user_data.email,
         name=user_data.name,
-        hashed_password=hash_password(user_data.password)
+        hashed_password=await hash_password_async(user_data.password)
     )
     
     user_dict = user.dict()
-    users_collection.insert_one(user_dict)
+    await users_collection.insert_one(user_dict)
     
     # Create default categories
     default_categories = ["Family", "Friends", "Work", "General"]
@@ -79,7 +119,7 @@ async def register(user_data: UserRegister):
             name=cat_name,
             color=color
         )
-        categories_collection.insert_one(category.dict())
+        await categories_collection.insert_one(category.dict())
     
     # Create token
     access_token = create_access_token(data={"sub": user.user_id})
@@ -97,14 +137,23 @@ async def register(user_data: UserRegister):
 @app.post("/api/auth/login", response_model=Token)
 async def login(user_data: UserLogin):
     # Find user
-    user_doc = users_collection.find_one({"email": user_data.email})
+    user_doc = await users_collection.find_one({"email": user_data.email})
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Verify password
-    if not verify_password(user_data.password, user_doc["hashed_password"]):
+    verified, new_hash = await verify_and_update_password_async(
+        user_data.password, user_doc["hashed_password"]
+    )
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Re-hash with the configured bcrypt cost if it has changed
+    if new_hash:
+        await users_collection.update_one(
+            {"user_id": user_doc["user_id"]}, {"$set": {"hashed_password": new_hash}}
+        )
+    
     # Create token
     access_token = create_access_token(data={"sub": user_doc["user_id"]})
     
@@ -120,76 +169,273 @@ async def login(user_data: UserLogin):
 
 @app.get("/api/auth/me")
 async def get_me(user_id: str = Depends(get_current_user)):
-    user_doc = users_collection.find_one({"user_id": user_id})
+    # Profiles cannot be edited, so the TTL alone bounds staleness
+    cached = response_cache.get(user_id, "auth_me", None)
+    if cached:
+        return cached
+    
+    user_doc = await users_collection.find_one({"user_id": user_id})
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return {
+    response = FastJSONResponse({
         "user_id": user_doc["user_id"],
         "email": user_doc["email"],
         "name": user_doc["name"]
-    }
+    })
+    response_cache.put(user_id, "auth_me", None, response)
+    return response
 
 # ==================== CONTACT ROUTES ====================
 
 @app.post("/api/contacts", status_code=status.HTTP_201_CREATED)
 async def create_contact(contact_data: ContactCreate, user_id: str = Depends(get_current_user)):
-    # Check for duplicates
-    existing = contacts_collection.find_one({
-        "user_id": user_id,
-        "name": {"$regex": f"^{contact_data.name}$", "$options": "i"}
-    })
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Contact with this name already exists")
-    
     contact = Contact(
         user_id=user_id,
         **contact_data.dict()
     )
     
-    contact_dict = contact.dict()
-    contacts_collection.insert_one(contact_dict)
+    contact_dict = await store_profile_picture(contact.dict())
+    store_category_id(contact_dict, await category_ids(user_id, [contact.category]))
+    # The unique (user_id, name_key) index rejects duplicates
+    try:
+        await contacts_collection.insert_one(contact_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Contact with this name already exists")
+    await record_contact_changes(user_id, added=Counter([contact_dict["category_id"]]))
+    response_cache.invalidate_user(user_id)
     
-    # Remove MongoDB _id
+    # Remove MongoDB _id and internal fields
+    contact_dict["category"] = contact.category or DEFAULT_CATEGORY
     contact_dict.pop("_id", None)
-    return contact_dict
+    contact_dict.pop("search_tokens", None)
+    contact_dict.pop("phone_e164", None)
+    return FastJSONResponse(contact_dict, status_code=status.HTTP_201_CREATED)
+
+# Fields a client may request through `fields=` on the contacts list
+CONTACT_FIELDS = set(Contact.__fields__) - {"user_id", "search_tokens", "phone_e164"}
+# Default projection: strip Mongo's _id and the internal search and phone index fields
+CONTACT_PROJECTION = {"_id": 0, "search_tokens": 0, "phone_e164": 0}
+# Caller ID answers: enough to show who is calling
+LOOKUP_PROJECTION = {
+    "_id": 0, "contact_id": 1, "name": 1, "category": 1, "category_id": 1, "profile_picture": 1, "phone_e164": 1,
+}
+
+def build_contacts_query(user_id: str, category_id: Optional[str] = None) -> dict:
+    query = {"user_id": user_id}
+    
+    # Category filter
+    if category_id:
+        query["category_id"] = category_id
+    
+    return query
+
+def contacts_sort_keys(sort_by: str):
+    # contact_id breaks ties so every contact has a unique position for keyset paging
+    sort_order = 1 if sort_by == "name" else -1
+    return [(sort_by, sort_order), ("contact_id", sort_order)]
+
+def contacts_projection(fields: Optional[str], sort_keys) -> dict:
+    if not fields:
+        return CONTACT_PROJECTION
+    
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - CONTACT_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    # The category name is looked up from its id
+    if "category" in requested:
+        requested.add("category_id")
+    projection = {"_id": 0}
+    for field in requested | {key for key, _ in sort_keys}:
+        projection[field] = 1
+    return projection
 
 @app.get("/api/contacts")
 async def get_contacts(
+    request: Request,
     user_id: str = Depends(get_current_user),
     search: Optional[str] = None,
     category: Optional[str] = None,
-    sort_by: str = Query("name", regex="^(name|created_at|updated_at)$")
+    sort_by: str = Query("name", regex="^(name|created_at|updated_at)$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    query = {"user_id": user_id}
-    
-    # Search filter
-    if search:
-        query["name"] = {"$regex": search, "$options": "i"}
-    
-    # Category filter
-    if category:
-        query["category"] = category
+    # Search results are ordered by relevance instead of sort_by
+    terms = parse_search_terms(search) if search else []
+    sort_keys = SEARCH_SORT_KEYS if terms else contacts_sort_keys(sort_by)
+    projection = contacts_projection(fields, sort_keys)
+    
+    # Resume after the last contact of the previous page
+    after = None
+    if cursor:
+        try:
+            after = keyset_filter(sort_keys, decode_cursor(cursor, sort_keys))
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="Invalid cursor; cursors only resume the sort and search they came from"
+            )
+    
+    # Unchanged since the client's copy: answer without querying contacts
+    version = await get_data_version(user_id)
+    etag = data_etag(request, user_id, version)
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    
+    # Search results vary too much to be worth caching
+    cacheable = not terms
+    if cacheable:
+        cached = response_cache.get(user_id, "contacts", request.query_params, version)
+        if cached:
+            return cached
+    
+    # Contacts reference categories by id; `category` may be a name or an id
+    categories = await category_map(user_id, version)
+    category_id = (categories.id_for(category) or category) if category else None
+    
+    if terms:
+        pipeline = build_search_pipeline(user_id, terms, category_id, after)
+        pipeline.append({"$project": projection})
+        if limit is not None:
+            pipeline.append({"$limit": limit + 1})
+        contacts_cursor = contacts_collection.aggregate(pipeline)
+    else:
+        query = build_contacts_query(user_id, category_id)
+        if after:
+            query = {"$and": [query, after]}
+        contacts_cursor = contacts_collection.find(query, projection).sort(sort_keys)
+        if limit is not None:
+            contacts_cursor = contacts_cursor.limit(limit + 1)
+    
+    # With a limit, one extra row is fetched to learn whether another page exists
+    contacts = await contacts_cursor.to_list(length=None)
+    headers = etag_headers(etag)
+    if limit is not None and len(contacts) > limit:
+        contacts = contacts[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(contacts[-1], sort_keys)
     
-    # Sort
-    sort_order = 1 if sort_by == "name" else -1
-    contacts = list(contacts_collection.find(query).sort(sort_by, sort_order))
-    
-    # Remove MongoDB _id
     for contact in contacts:
-        contact.pop("_id", None)
-    
-    return contacts
+        contact.pop("_score", None)
+    with_category_names(contacts, categories)
+    # Returned as a response so FastAPI does not run jsonable_encoder over every contact
+    response = FastJSONResponse(contacts, headers=headers)
+    if cacheable:
+        response_cache.put(user_id, "contacts", request.query_params, response, version)
+    return response
+
+@app.get("/api/contacts/changes")
+async def get_contact_changes(
+    user_id: str = Depends(get_current_user),
+    since: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    # Delta sync. Without `since` every contact is paged through; with a token,
+    # only contacts written since then plus the ids of deleted ones. Clients
+    # follow next_token while has_more, apply contacts then deleted, and keep
+    # the final next_token for their next sync.
+    try:
+        changes = await contact_changes(user_id, since, limit, CONTACT_PROJECTION)
+    except SyncTokenExpired:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Sync token expired; resync from scratch")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    # Renaming a category does not touch its contacts; clients refresh
+    # category names from /api/categories, which has its own ETag
+    with_category_names(changes["contacts"], await category_map(user_id))
+    return FastJSONResponse(changes)
+
+MAX_LOOKUP_NUMBERS = int(os.getenv("MAX_LOOKUP_NUMBERS", 500))
+
+@app.get("/api/contacts/lookup")
+async def lookup_phone(
+    phone: str,
+    region: str = DEFAULT_PHONE_REGION,
+    user_id: str = Depends(get_current_user)
+):
+    # Caller ID: one seek on the (user_id, phone_e164) multikey index
+    e164 = normalize_phone(phone, region.upper())
+    if not e164:
+        raise HTTPException(status_code=400, detail="Not a valid phone number")
+    
+    contacts = await contacts_collection.find(
+        {"user_id": user_id, "phone_e164": e164}, LOOKUP_PROJECTION
+    ).to_list(length=None)
+    for contact in contacts:
+        contact.pop("phone_e164", None)
+    with_category_names(contacts, await category_map(user_id))
+    return FastJSONResponse({"phone": e164, "contacts": contacts})
+
+@app.post("/api/contacts/lookup")
+async def lookup_phones(lookup: PhoneLookupRequest, user_id: str = Depends(get_current_user)):
+    if len(lookup.phones) > MAX_LOOKUP_NUMBERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_NUMBERS} numbers per lookup")
+    
+    region = (lookup.region or DEFAULT_PHONE_REGION).upper()
+    normalized = [normalize_phone(phone, region) for phone in lookup.phones]
+    wanted = {e164 for e164 in normalized if e164}
+    
+    # All numbers in a single $in query, then matched back to the inputs
+    matches = {e164: [] for e164 in wanted}
+    if wanted:
+        categories = await category_map(user_id)
+        cursor = contacts_collection.find(
+            {"user_id": user_id, "phone_e164": {"$in": list(wanted)}}, LOOKUP_PROJECTION
+        )
+        async for contact in cursor:
+            with_category_names([contact], categories)
+            numbers = contact.pop("phone_e164", [])
+            for e164 in wanted.intersection(numbers):
+                matches[e164].append(contact)
+    
+    return FastJSONResponse({
+        "results": [
+            {"input": phone, "phone": e164, "contacts": matches.get(e164, []) if e164 else []}
+            for phone, e164 in zip(lookup.phones, normalized)
+        ]
+    })
+
+@app.get("/api/contacts/duplicates")
+async def get_duplicates(
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    min_score: float = Query(DEFAULT_MIN_SCORE, ge=0, le=1),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)
+):
+    # Scans the whole book, so reuse the result until the user's data changes
+    version = await get_data_version(user_id)
+    cached = response_cache.get(user_id, "duplicates", request.query_params, version)
+    if cached:
+        return cached
+    
+    response = FastJSONResponse(await find_duplicates(user_id, min_score, limit))
+    response_cache.put(user_id, "duplicates", request.query_params, response, version)
+    return response
+
+@app.post("/api/contacts/merge")
+async def merge_duplicate_contacts(merge: MergeRequest, user_id: str = Depends(get_current_user)):
+    merged = await merge_contacts(user_id, merge.primary_id, merge.duplicate_ids)
+    merged.pop("search_tokens", None)
+    merged.pop("phone_e164", None)
+    with_category_names([merged], await category_map(user_id))
+    return FastJSONResponse(merged)
 
 @app.get("/api/contacts/{contact_id}")
-async def get_contact(contact_id: str, user_id: str = Depends(get_current_user)):
-    contact = contacts_collection.find_one({"contact_id": contact_id, "user_id": user_id})
+async def get_contact(request: Request, contact_id: str, user_id: str = Depends(get_current_user)):
+    version = await get_data_version(user_id)
+    etag = data_etag(request, user_id, version)
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    
+    contact = await contacts_collection.find_one(
+        {"contact_id": contact_id, "user_id": user_id}, CONTACT_PROJECTION
+    )
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     
-    contact.pop("_id", None)
-    return contact
+    with_category_names([contact], await category_map(user_id, version))
+    return FastJSONResponse(contact, headers=etag_headers(etag))
 
 @app.put("/api/contacts/{contact_id}")
 async def update_contact(
@@ -197,58 +443,152 @@ async def update_contact(
     contact_data: ContactUpdate,
     user_id: str = Depends(get_current_user)
 ):
-    contact = contacts_collection.find_one({"contact_id": contact_id, "user_id": user_id})
+    contact = await contacts_collection.find_one({"contact_id": contact_id, "user_id": user_id})
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     
     # Update fields
     update_data = contact_data.dict(exclude_unset=True)
-    update_data["updated_at"] = datetime.utcnow()
+    ids = await category_ids(user_id, [update_data["category"]]) if "category" in update_data else None
+    update_data = await build_contact_update(contact, update_data, ids)
     
-    contacts_collection.update_one(
-        {"contact_id": contact_id, "user_id": user_id},
-        {"$set": update_data}
-    )
+    try:
+        updated_contact = await contacts_collection.find_one_and_update(
+            {"contact_id": contact_id, "user_id": user_id},
+            {"$set": update_data},
+            projection=CONTACT_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Contact with this name already exists")
     
-    updated_contact = contacts_collection.find_one({"contact_id": contact_id, "user_id": user_id})
-    updated_contact.pop("_id", None)
-    return updated_contact
+    # Counts cancel out when the category is unchanged, but the data version still moves
+    if updated_contact:
+        await record_contact_changes(
+            user_id,
+            added=Counter([category_key(updated_contact)]),
+            removed=Counter([category_key(contact)])
+        )
+        response_cache.invalidate_user(user_id)
+        with_category_names([updated_contact], await category_map(user_id))
+    
+    return FastJSONResponse(updated_contact)
 
 @app.delete("/api/contacts/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_contact(contact_id: str, user_id: str = Depends(get_current_user)):
-    result = contacts_collection.delete_one({"contact_id": contact_id, "user_id": user_id})
-    if result.deleted_count == 0:
+    deleted = await contacts_collection.find_one_and_delete(
+        {"contact_id": contact_id, "user_id": user_id}, projection={"_id": 0, "category": 1, "category_id": 1}
+    )
+    if not deleted:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await record_contact_changes(user_id, removed=Counter([category_key(deleted)]))
+    await record_deletions(user_id, [contact_id])
+    response_cache.invalidate_user(user_id)
     return None
 
+@app.post("/api/contacts/batch")
+async def batch_contacts(batch: BatchRequest, user_id: str = Depends(get_current_user)):
+    if len(batch.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(
+            status_code=400, detail=f"A batch may contain at most {MAX_BATCH_OPERATIONS} operations"
+        )
+    # Per-operation outcomes are in the body; the request itself succeeds
+    return FastJSONResponse(await ContactBatch(user_id, batch.operations, batch.ordered).run())
+
 # ==================== CATEGORY ROUTES ====================
 
 @app.get("/api/categories")
-async def get_categories(user_id: str = Depends(get_current_user)):
-    categories = list(categories_collection.find({"user_id": user_id}))
-    for cat in categories:
-        cat.pop("_id", None)
-    return categories
+async def get_categories(request: Request, user_id: str = Depends(get_current_user)):
+    version = await get_data_version(user_id)
+    etag = data_etag(request, user_id, version)
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    cached = response_cache.get(user_id, "categories", None, version)
+    if cached:
+        return cached
+    
+    categories = await categories_collection.find({"user_id": user_id}, {"_id": 0}).to_list(length=None)
+    response = FastJSONResponse(categories, headers=etag_headers(etag))
+    response_cache.put(user_id, "categories", None, response, version)
+    return response
 
 @app.post("/api/categories", status_code=status.HTTP_201_CREATED)
 async def create_category(name: str, color: str = "#008CBA", user_id: str = Depends(get_current_user)):
     # Check if category exists
-    existing = categories_collection.find_one({"user_id": user_id, "name": name})
+    existing = await categories_collection.find_one({"user_id": user_id, "name": name})
     if existing:
         raise HTTPException(status_code=400, detail="Category already exists")
     
     category = Category(user_id=user_id, name=name, color=color)
     category_dict = category.dict()
-    categories_collection.insert_one(category_dict)
+    await categories_collection.insert_one(category_dict)
+    await bump_data_version(user_id)
+    response_cache.invalidate_user(user_id)
     
     category_dict.pop("_id", None)
-    return category_dict
+    return FastJSONResponse(category_dict, status_code=status.HTTP_201_CREATED)
+
+@app.put("/api/categories/{category_id}")
+async def update_category(
+    category_id: str,
+    name: Optional[str] = None,
+    color: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    changes = {key: value for key, value in (("name", name), ("color", color)) if value}
+    if not changes:
+        raise HTTPException(status_code=400, detail="Give a new name or color")
+    if name:
+        existing = await categories_collection.find_one(
+            {"user_id": user_id, "name": name}, {"_id": 0, "category_id": 1}
+        )
+        if existing and existing["category_id"] != category_id:
+            raise HTTPException(status_code=400, detail="Category already exists")
+    
+    # Contacts hold the id, so a rename is this one write however many use it
+    category = await categories_collection.find_one_and_update(
+        {"category_id": category_id, "user_id": user_id},
+        {"$set": changes},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    await bump_data_version(user_id)
+    response_cache.invalidate_user(user_id)
+    return FastJSONResponse(category)
 
 @app.delete("/api/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_category(category_id: str, user_id: str = Depends(get_current_user)):
-    result = categories_collection.delete_one({"category_id": category_id, "user_id": user_id})
-    if result.deleted_count == 0:
+async def delete_category(
+    category_id: str,
+    reassign_to: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    categories = await category_map(user_id)
+    if category_id not in categories.by_id:
         raise HTTPException(status_code=404, detail="Category not found")
+    if reassign_to and reassign_to not in categories.by_id:
+        raise HTTPException(status_code=404, detail="Category to reassign contacts to not found")
+    
+    # Its contacts move to `reassign_to`, or to General
+    target = reassign_to or await resolve_category_id(user_id, DEFAULT_CATEGORY)
+    if target == category_id:
+        raise HTTPException(status_code=400, detail="Choose another category for its contacts with reassign_to")
+    
+    # One update over the (user_id, category_id, ...) index; updated_at moves so delta sync sees it
+    moved = await contacts_collection.update_many(
+        {"user_id": user_id, "category_id": category_id},
+        {"$set": {"category_id": target, "updated_at": datetime.utcnow()}}
+    )
+    await categories_collection.delete_one({"category_id": category_id, "user_id": user_id})
+    if moved.modified_count:
+        await record_contact_changes(
+            user_id,
+            added=Counter({target: moved.modified_count}),
+            removed=Counter({category_id: moved.modified_count})
+        )
+    await bump_data_version(user_id)
+    response_cache.invalidate_user(user_id)
     return None
 
 # ==================== FILE UPLOAD ====================
@@ -259,145 +599,181 @@ async def upload_profile_picture(file: UploadFile = File(...), user_id: str = De
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Read and encode to base64
-    contents = await file.read()
-    base64_encoded = base64.b64encode(contents).decode("utf-8")
-    data_url = f"data:{file.content_type};base64,{base64_encoded}"
+    # The body was capped by UploadLimitMiddleware; check the file itself, then
+    # resize in the image process pool
+    contents = await read_limited(file)
+    variants = await process_image(contents)
+    
+    # Store once per distinct image; the largest rendition indexes the others
+    picture_id, variant_ids = await store_picture_variants(variants)
+    
+    return {
+        "url": picture_url(picture_id),
+        "picture_id": picture_id,
+        "variants": {size: picture_url(blob_id) for size, blob_id in variant_ids.items()},
+        "original_bytes": len(contents),
+        "stored_bytes": sum(len(data) for data in variants.values()),
+        "bytes_saved": len(contents) - len(variants[max(variants)])
+    }
+
+@app.get("/api/pictures/{picture_id}")
+async def get_picture(
+    request: Request,
+    picture_id: str = Path(..., regex="^[0-9a-f]{64}$"),
+    size: Optional[int] = Query(None, ge=1)
+):
+    # Pictures are addressed by content hash, so they never change once stored
+    info = await blob_store.info(picture_id)
+    if info and size and info.variants:
+        info = await blob_store.info(pick_variant(info, size))
+    if not info:
+        raise HTTPException(status_code=404, detail="Picture not found")
+    
+    etag = f'"{info.blob_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+        # Served from the API origin, so never sniffed or rendered as a document
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": "default-src 'none'",
+    }
+    media_type = info.content_type
+    if media_type not in PICTURE_CONTENT_TYPES:
+        # Stored before pictures were re-encoded; download it, never render it
+        media_type = "application/octet-stream"
+        headers["Content-Disposition"] = "attachment"
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), info.length)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{info.length}"
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+    
+    status_code = status.HTTP_200_OK
+    start, end = 0, info.length - 1
+    if byte_range:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.length}"
+    headers["Content-Length"] = str(end - start + 1)
     
-    return {"url": data_url}
+    return StreamingResponse(
+        blob_store.read(info.blob_id, start, end),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
 
 # ==================== IMPORT/EXPORT ====================
 
 @app.post("/api/contacts/import/json")
 async def import_json(file: UploadFile = File(...), user_id: str = Depends(get_current_user)):
+    def build(item):
+        if not isinstance(item, dict):
+            raise RowError("Expected a JSON object")
+        return contact_from_fields(user_id, item)
+    
+    # Parse the upload incrementally instead of loading the whole array
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig")
+    rows = enumerate(iter_json_array(stream), start=1)
     try:
-        contents = await file.read()
-        data = json.loads(contents)
-        
-        imported_count = 0
-        for item in data:
-            # Check if contact exists
-            existing = contacts_collection.find_one({
-                "user_id": user_id,
-                "name": {"$regex": f"^{item.get('name', '')}$", "$options": "i"}
-            })
-            
-            if not existing:
-                contact = Contact(
-                    user_id=user_id,
-                    name=item.get("name", ""),
-                    phones=[PhoneNumber(**p) for p in item.get("phones", [])],
-                    emails=[EmailAddress(**e) for e in item.get("emails", [])],
-                    category=item.get("category", "General"),
-                    notes=item.get("notes", ""),
-                    profile_picture=item.get("profile_picture")
-                )
-                contacts_collection.insert_one(contact.dict())
-                imported_count += 1
-        
-        return {"message": f"Imported {imported_count} contacts"}
-    except Exception as e:
+        return await run_import(ContactImporter(user_id), rows, build)
+    except (ImportFileError, UnicodeDecodeError) as e:
         raise HTTPException(status_code=400, detail=f"Invalid JSON file: {str(e)}")
+    finally:
+        stream.detach()
 
 @app.post("/api/contacts/import/csv")
 async def import_csv(file: UploadFile = File(...), user_id: str = Depends(get_current_user)):
+    def build(row):
+        return contact_from_fields(user_id, contact_fields_from_csv_row(row))
+    
+    # Decode and parse lazily from the spooled upload; memory stays at one batch
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
     try:
-        contents = await file.read()
-        csv_data = contents.decode("utf-8")
-        reader = csv.DictReader(io.StringIO(csv_data))
-        
-        imported_count = 0
-        for row in reader:
-            # Check if contact exists
-            existing = contacts_collection.find_one({
-                "user_id": user_id,
-                "name": {"$regex": f"^{row.get('name', '')}$", "$options": "i"}
-            })
-            
-            if not existing:
-                phones = []
-                if row.get("phone"):
-                    phones.append(PhoneNumber(number=row["phone"], label="mobile"))
-                
-                emails = []
-                if row.get("email"):
-                    emails.append(EmailAddress(email=row["email"], label="personal"))
-                
-                contact = Contact(
-                    user_id=user_id,
-                    name=row.get("name", ""),
-                    phones=phones,
-                    emails=emails,
-                    category=row.get("category", "General"),
-                    notes=row.get("notes", "")
-                )
-                contacts_collection.insert_one(contact.dict())
-                imported_count += 1
-        
-        return {"message": f"Imported {imported_count} contacts"}
-    except Exception as e:
+        return await run_import(ContactImporter(user_id), iter_csv_rows(stream), build)
+    except (ImportFileError, UnicodeDecodeError) as e:
         raise HTTPException(status_code=400, detail=f"Invalid CSV file: {str(e)}")
+    finally:
+        stream.detach()
 
-@app.get("/api/contacts/export/json")
-async def export_json(user_id: str = Depends(get_current_user)):
-    contacts = list(contacts_collection.find({"user_id": user_id}))
-    
-    # Remove MongoDB _id
-    for contact in contacts:
-        contact.pop("_id", None)
-    
-    json_str = json.dumps(contacts, default=str, indent=2)
+@app.post("/api/contacts/import/vcard")
+async def import_vcard(file: UploadFile = File(...), user_id: str = Depends(get_current_user)):
+    def build(lines):
+        return contact_from_fields(user_id, contact_fields_from_vcard(lines))
     
+    # Cards are unfolded and parsed one at a time; embedded photos go to the blob store
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await run_import(ContactImporter(user_id), iter_vcards(stream), build)
+    except (ImportFileError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid vCard file: {str(e)}")
+    finally:
+        stream.detach()
+
+@app.get("/api/contacts/export/json")
+async def export_json(
+    user_id: str = Depends(get_current_user),
+    format: str = Query("json", regex="^(json|ndjson)$")
+):
+    ndjson = format == "ndjson"
     return StreamingResponse(
-        io.BytesIO(json_str.encode()),
-        media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=contacts.json"}
+        stream_json(user_id, ndjson=ndjson),
+        media_type="application/x-ndjson" if ndjson else "application/json",
+        headers={"Content-Disposition": f"attachment; filename=contacts.{format}"}
     )
 
 @app.get("/api/contacts/export/csv")
-async def export_csv(user_id: str = Depends(get_current_user)):
-    contacts = list(contacts_collection.find({"user_id": user_id}))
-    
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=["name", "phone", "email", "category", "notes"])
-    writer.writeheader()
-    
-    for contact in contacts:
-        phone = contact.get("phones", [{}])[0].get("number", "") if contact.get("phones") else ""
-        email = contact.get("emails", [{}])[0].get("email", "") if contact.get("emails") else ""
-        
-        writer.writerow({
-            "name": contact.get("name", ""),
-            "phone": phone,
-            "email": email,
-            "category": contact.get("category", ""),
-            "notes": contact.get("notes", "")
-        })
+async def export_csv(
+    user_id: str = Depends(get_current_user),
+    phones: Optional[int] = Query(None, ge=1, le=MAX_CSV_VALUE_COLUMNS),
+    emails: Optional[int] = Query(None, ge=1, le=MAX_CSV_VALUE_COLUMNS)
+):
+    # Without explicit column counts, expand to fit the contact with the most values
+    if phones is None or emails is None:
+        widest = await max_multi_values(user_id)
+        phones = phones or min(widest["phones"], MAX_CSV_VALUE_COLUMNS)
+        emails = emails or min(widest["emails"], MAX_CSV_VALUE_COLUMNS)
     
     return StreamingResponse(
-        io.BytesIO(output.getvalue().encode()),
+        stream_csv(user_id, phones, emails),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=contacts.csv"}
     )
 
+@app.get("/api/contacts/export/vcard")
+async def export_vcard(
+    user_id: str = Depends(get_current_user),
+    version: str = Query("3.0", regex=r"^(3\.0|4\.0)$"),
+    photos: bool = True
+):
+    return StreamingResponse(
+        stream_vcard(user_id, version, photos),
+        media_type="text/vcard",
+        headers={"Content-Disposition": "attachment; filename=contacts.vcf"}
+    )
+
 # ==================== STATISTICS ====================
 
 @app.get("/api/stats")
-async def get_stats(user_id: str = Depends(get_current_user)):
-    total_contacts = contacts_collection.count_documents({"user_id": user_id})
-    
-    # Count by category
-    pipeline = [
-        {"$match": {"user_id": user_id}},
-        {"$group": {"_id": "$category", "count": {"$sum": 1}}}
-    ]
-    by_category = list(contacts_collection.aggregate(pipeline))
-    
-    return {
-        "total_contacts": total_contacts,
-        "by_category": {item["_id"]: item["count"] for item in by_category}
-    }
-
+async def get_stats(request: Request, user_id: str = Depends(get_current_user)):
+    version = await get_data_version(user_id)
+    etag = data_etag(request, user_id, version)
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    cached = response_cache.get(user_id, "stats", None, version)
+    if cached:
+        return cached
+    
+    # Maintained incrementally by every contact write; see stats.py
+    response = FastJSONResponse(await get_user_stats(user_id), headers=etag_headers(etag))
+    response_cache.put(user_id, "stats", None, response, version)
+    return response
+
+# Single-process development server; production runs serve.py
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,103 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+
+from categories import category_map
+from database import contacts_collection, stats_collection, users_collection
+from versions import DATA_VERSION_FIELD, NEEDS_RECONCILE_FIELD
+
+def _encode_key(name: str) -> str:
+    # Category ids (names, before the category_id migration) become field
+    # names; "." and "$" are not allowed there
+    return (name or "").replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def _decode_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+def category_key(contact: Dict[str, Any]) -> Optional[str]:
+    """What a contact is counted under: its category id, or its name if not yet migrated."""
+    return contact.get("category_id") or contact.get("category")
+
+def category_counts(contacts: Iterable[Dict[str, Any]]) -> Counter:
+    return Counter(category_key(contact) for contact in contacts)
+
+async def record_contact_changes(
+    user_id: str,
+    added: Optional[Counter] = None,
+    removed: Optional[Counter] = None
+):
+    """
+    Apply contact writes to the user's stats document with one atomic $inc.
+    `added`/`removed` count contacts entering/leaving each category id; an edited
+    contact is both. Any change also bumps the user's data version.
+    """
+    added = added or Counter()
+    removed = removed or Counter()
+    increments = Counter()
+    for category, count in added.items():
+        increments[f"by_category.{_encode_key(category)}"] += count
+    for category, count in removed.items():
+        increments[f"by_category.{_encode_key(category)}"] -= count
+    increments = {key: value for key, value in increments.items() if value}
+
+    total = sum(added.values()) - sum(removed.values())
+    if total:
+        increments["total_contacts"] = total
+    if added or removed:
+        increments[DATA_VERSION_FIELD] = 1
+    if increments:
+        # Increments only hold on top of existing counts; a document this creates
+        # is marked so get_user_stats recomputes it from the contacts
+        await stats_collection.update_one(
+            {"user_id": user_id},
+            {"$inc": increments, "$setOnInsert": {NEEDS_RECONCILE_FIELD: True}},
+            upsert=True
+        )
+
+async def reconcile_user_stats(user_id: str) -> Dict[str, Any]:
+    """Recompute a user's stats document from the contacts collection."""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": {"$ifNull": ["$category_id", "$category"]}, "count": {"$sum": 1}}}
+    ]
+    by_category = await contacts_collection.aggregate(pipeline).to_list(length=None)
+    doc = {
+        "user_id": user_id,
+        "total_contacts": sum(item["count"] for item in by_category),
+        "by_category": {_encode_key(item["_id"]): item["count"] for item in by_category}
+    }
+    # Counts are replaced; the data version keeps increasing
+    await stats_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {key: value for key, value in doc.items() if key != "user_id"},
+            "$inc": {DATA_VERSION_FIELD: 1},
+            "$unset": {NEEDS_RECONCILE_FIELD: ""}
+        },
+        upsert=True
+    )
+    return doc
+
+async def reconcile_all_stats() -> int:
+    count = 0
+    async for user in users_collection.find({}, {"_id": 0, "user_id": 1}):
+        await reconcile_user_stats(user["user_id"])
+        count += 1
+    return count
+
+async def get_user_stats(user_id: str) -> Dict[str, Any]:
+    doc = await stats_collection.find_one({"user_id": user_id}, {"_id": 0})
+    if doc is None or doc.get(NEEDS_RECONCILE_FIELD) or "total_contacts" not in doc:
+        # First read for a user that predates materialized stats, or whose first
+        # write only counted itself
+        doc = await reconcile_user_stats(user_id)
+    # Counted by id so renames never touch stats; names are looked up on read
+    categories = await category_map(user_id)
+    by_category = Counter()
+    for key, count in (doc.get("by_category") or {}).items():
+        if count > 0:
+            key = _decode_key(key)
+            by_category[categories.name(key) or key] += count
+    return {
+        "total_contacts": doc.get("total_contacts", 0),
+        "by_category": dict(by_category)
+    }
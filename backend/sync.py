@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+import os
+
+from database import TOMBSTONE_TTL_DAYS, contacts_collection, tombstones_collection
+from pagination import decode_cursor, encode_cursor, keyset_filter
+
+# Writes stamp updated_at before they commit and worker clocks drift a little,
+# so each sync re-reads this much history. Clients apply changes idempotently.
+SYNC_OVERLAP = timedelta(seconds=int(os.getenv("SYNC_OVERLAP_SECONDS", 5)))
+SYNC_SORT_KEYS = [("updated_at", 1), ("contact_id", 1)]
+# Token layout: changes since `since`, for a sync that started at `started`,
+# resuming after (updated_at, contact_id) when a page was cut short
+_TOKEN_FIELDS = [("since", 1), ("started", 1), ("updated_at", 1), ("contact_id", 1)]
+
+class SyncTokenExpired(ValueError):
+    """Deletions older than the token may already be gone; the client must resync."""
+
+async def record_deletions(user_id: str, contact_ids: Iterable[str]):
+    deleted_at = datetime.utcnow()
+    tombstones = [
+        {"user_id": user_id, "contact_id": contact_id, "deleted_at": deleted_at} for contact_id in contact_ids
+    ]
+    if tombstones:
+        await tombstones_collection.insert_many(tombstones, ordered=False)
+
+def encode_sync_token(since: Optional[datetime], started: Optional[datetime],
+                      last: Optional[Dict[str, Any]] = None) -> str:
+    last = last or {}
+    return encode_cursor(
+        {"since": since, "started": started, "updated_at": last.get("updated_at"),
+         "contact_id": last.get("contact_id")},
+        _TOKEN_FIELDS
+    )
+
+def decode_sync_token(token: str):
+    """(since, started, after) from a token; raises ValueError if it is malformed."""
+    since, started, updated_at, contact_id = decode_cursor(token, _TOKEN_FIELDS)
+    for value in (since, started):
+        if value is not None and not isinstance(value, datetime):
+            raise ValueError("Invalid sync token")
+    after = [updated_at, contact_id] if contact_id is not None else None
+    return since, started, after
+
+async def contact_changes(user_id: str, token: Optional[str], limit: int, projection: Dict[str, Any]):
+    """
+    One page of contacts written since `token`, oldest first, plus the ids
+    deleted since then on the last page. Without a token every contact is
+    returned, so the same loop performs the initial full sync.
+    """
+    now = datetime.utcnow()
+    since, started, after = decode_sync_token(token) if token else (None, None, None)
+    if since is not None and since < now - timedelta(days=TOMBSTONE_TTL_DAYS):
+        raise SyncTokenExpired("Sync token expired")
+    started = started or now
+
+    query: Dict[str, Any] = {"user_id": user_id}
+    if since is not None:
+        query["updated_at"] = {"$gte": since}
+    if after:
+        query = {"$and": [query, keyset_filter(SYNC_SORT_KEYS, after)]}
+    cursor = contacts_collection.find(query, projection).sort(SYNC_SORT_KEYS).limit(limit + 1)
+    contacts = await cursor.to_list(length=None)
+
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        return {
+            "contacts": contacts,
+            "deleted": [],
+            "has_more": True,
+            "next_token": encode_sync_token(since, started, contacts[-1]),
+        }
+
+    deleted = []
+    if since is not None:
+        tombstones = tombstones_collection.find(
+            {"user_id": user_id, "deleted_at": {"$gte": since}}, {"_id": 0, "contact_id": 1}
+        )
+        deleted = [doc["contact_id"] async for doc in tombstones]
+    # Anything written while this sync was paging is picked up by the next one
+    return {
+        "contacts": contacts,
+        "deleted": deleted,
+        "has_more": False,
+        "next_token": encode_sync_token(started - SYNC_OVERLAP, None),
+    }
@@ -0,0 +1,14 @@
+"""
+Unit tests for the backend modules; none of them need a running MongoDB.
+
+    cd backend && python -m pytest tests
+
+The API as a whole is exercised against a live server by backend_test.py
+and final_backend_test.py at the repository root.
+"""
+
+import os
+import sys
+
+# Modules import each other by bare name, as when server.py is run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
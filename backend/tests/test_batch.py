@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import batch
+from batch import ContactBatch
+from importers import DUPLICATE_KEY_ERROR
+from models import BatchOperation
+
+USER = "u1"
+EXISTING = {"contact_id": "c1", "name": "Ann", "category_id": "cat-general", "phones": [], "emails": [], "notes": None}
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+class FakeContacts:
+    """Just enough of the contacts collection for ContactBatch.run."""
+
+    def __init__(self, docs, write_errors=()):
+        self.docs = docs
+        self.write_errors = list(write_errors)
+        self.requests = None
+        self.ordered = None
+
+    def find(self, query, projection):
+        ids = set(query["contact_id"]["$in"])
+        return _Cursor([dict(doc) for doc in self.docs if doc["contact_id"] in ids])
+
+    async def bulk_write(self, requests, ordered):
+        self.requests, self.ordered = requests, ordered
+        if self.write_errors:
+            raise BulkWriteError({"writeErrors": self.write_errors})
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Replace the database-backed collaborators; returns what they were called with."""
+    calls = {"category_names": [], "changes": None, "deleted": None}
+
+    async def category_ids(user_id, names):
+        names = list(names)
+        calls["category_names"].extend(names)
+        return {name or "General": f"cat-{(name or 'General').lower()}" for name in names}
+
+    async def record_contact_changes(user_id, added=None, removed=None):
+        calls["changes"] = (added, removed)
+
+    async def record_deletions(user_id, contact_ids):
+        calls["deleted"] = list(contact_ids)
+
+    monkeypatch.setattr(batch, "category_ids", category_ids)
+    monkeypatch.setattr(batch, "record_contact_changes", record_contact_changes)
+    monkeypatch.setattr(batch, "record_deletions", record_deletions)
+    return calls
+
+def run_batch(monkeypatch, operations, ordered, write_errors=()):
+    contacts = FakeContacts([dict(EXISTING)], write_errors)
+    monkeypatch.setattr(batch, "contacts_collection", contacts)
+    summary = asyncio.run(
+        ContactBatch(USER, [BatchOperation(**op) for op in operations], ordered=ordered).run()
+    )
+    return summary, contacts
+
+def statuses(summary):
+    return [result["status"] for result in summary["results"]]
+
+def test_unordered_reports_each_failure_and_writes_the_rest(monkeypatch, recorded):
+    summary, contacts = run_batch(monkeypatch, [
+        {"op": "create", "data": {"name": "Bo", "category": "Work"}},
+        {"op": "create", "data": {"name": ""}},
+        {"op": "update", "contact_id": "missing", "data": {"category": "Ghost"}},
+        {"op": "update", "data": {"notes": "no id"}},
+        {"op": "create", "data": {"name": "Cy", "category": [1]}},
+        {"op": "delete", "contact_id": "c1"},
+    ], ordered=False)
+
+    assert statuses(summary) == [201, 400, 404, 400, 400, 204]
+    assert (summary["succeeded"], summary["failed"]) == (2, 4)
+    assert [type(request) for request in contacts.requests] == [InsertOne, DeleteOne]
+    assert contacts.ordered is False
+    # Categories are only resolved, and so only created, for operations being written
+    assert recorded["category_names"] == ["Work"]
+    assert recorded["deleted"] == ["c1"]
+    added, removed = recorded["changes"]
+    assert added == {"cat-work": 1} and removed == {"cat-general": 1}
+
+def test_ordered_stops_at_first_invalid_operation(monkeypatch, recorded):
+    summary, contacts = run_batch(monkeypatch, [
+        {"op": "update", "contact_id": "c1", "data": {"notes": "first"}},
+        {"op": "create", "data": {"name": "Cy", "category": {}}},
+        {"op": "create", "data": {"name": "Di", "category": "Later"}},
+    ], ordered=True)
+
+    assert statuses(summary) == [200, 400, 424]
+    assert [type(request) for request in contacts.requests] == [UpdateOne]
+    assert recorded["category_names"] == []
+
+def test_later_operations_see_earlier_deletes(monkeypatch, recorded):
+    summary, _ = run_batch(monkeypatch, [
+        {"op": "delete", "contact_id": "c1"},
+        {"op": "update", "contact_id": "c1", "data": {"notes": "too late"}},
+    ], ordered=False)
+
+    assert statuses(summary) == [204, 404]
+
+def test_unordered_write_errors_map_per_operation(monkeypatch, recorded):
+    summary, _ = run_batch(monkeypatch, [
+        {"op": "create", "data": {"name": "Ann"}},
+        {"op": "create", "data": {"name": "Bo"}},
+        {"op": "update", "contact_id": "c1", "data": {"notes": "x"}},
+    ], ordered=False, write_errors=[
+        {"index": 0, "code": DUPLICATE_KEY_ERROR, "errmsg": "E11000 duplicate key"},
+        {"index": 2, "code": 2, "errmsg": "BadValue"},
+    ])
+
+    assert statuses(summary) == [400, 201, 500]
+    assert summary["results"][0]["error"] == "Contact with this name already exists"
+    assert summary["results"][2]["error"] == "BadValue"
+    # Only the write that landed is counted
+    added, removed = recorded["changes"]
+    assert added == {"cat-general": 1} and not removed
+
+def test_ordered_write_error_marks_later_writes_not_executed(monkeypatch, recorded):
+    summary, _ = run_batch(monkeypatch, [
+        {"op": "create", "data": {"name": "Bo"}},
+        {"op": "create", "data": {"name": "Ann"}},
+        {"op": "delete", "contact_id": "c1"},
+    ], ordered=True, write_errors=[
+        {"index": 1, "code": DUPLICATE_KEY_ERROR, "errmsg": "E11000 duplicate key"},
+    ])
+
+    assert statuses(summary) == [201, 400, 424]
+    assert recorded["deleted"] == []
+
+def test_write_error_indexes_skip_operations_that_were_never_queued(monkeypatch, recorded):
+    # writeErrors index into the queued writes, not into the request's operations
+    summary, _ = run_batch(monkeypatch, [
+        {"op": "create", "data": {"name": ""}},
+        {"op": "create", "data": {"name": "Bo"}},
+        {"op": "create", "data": {"name": "Ann"}},
+    ], ordered=False, write_errors=[
+        {"index": 1, "code": DUPLICATE_KEY_ERROR, "errmsg": "E11000 duplicate key"},
+    ])
+
+    assert statuses(summary) == [400, 201, 400]
+    assert summary["results"][2]["error"] == "Contact with this name already exists"
+
+@pytest.mark.parametrize("ordered, expected", [(True, [201, 400, 424]), (False, [201, 400, 201])])
+def test_rejected_picture_fails_only_its_operation(monkeypatch, recorded, ordered, expected):
+    summary, contacts = run_batch(monkeypatch, [
+        {"op": "create", "data": {"name": "Bo"}},
+        {"op": "create", "data": {"name": "Cy", "profile_picture": "data:text/html;base64,PHNjcmlwdD4="}},
+        {"op": "create", "data": {"name": "Di"}},
+    ], ordered=ordered)
+
+    assert statuses(summary) == expected
+    assert "JPEG, PNG" in summary["results"][1]["error"]
+    assert len(contacts.requests) == expected.count(201)
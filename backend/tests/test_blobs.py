@@ -0,0 +1,117 @@
+import asyncio
+import base64
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+import blobs
+from blobs import BlobInfo, parse_byte_range, parse_data_url, pick_variant, store_profile_picture
+from images import MAX_UPLOAD_BYTES, OUTPUT_CONTENT_TYPE, THUMBNAIL_SIZES
+
+class FakeBlobStore:
+    def __init__(self):
+        self.blobs = {}
+
+    async def put(self, data, content_type, variants=None):
+        blob_id = blobs.blob_id_for(data)
+        self.blobs[blob_id] = (data, content_type, variants or {})
+        return blob_id
+
+def png(width=32, height=32) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, "PNG")
+    return output.getvalue()
+
+def data_url(media_type: str, data: bytes) -> str:
+    return f"data:{media_type};base64,{base64.b64encode(data).decode()}"
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeBlobStore()
+    monkeypatch.setattr(blobs, "blob_store", fake)
+    return fake
+
+def test_parse_data_url():
+    assert parse_data_url("data:image/png;base64,AAEC") == ("image/png", b"\x00\x01\x02")
+    assert parse_data_url("data:;base64,AAEC") == ("application/octet-stream", b"\x00\x01\x02")
+    assert parse_data_url("data:image/png,raw") is None
+    assert parse_data_url("https://example.com/a.png") is None
+
+def test_data_url_picture_is_re_encoded_under_its_own_type(store):
+    fields = asyncio.run(store_profile_picture({"profile_picture": data_url("image/png", png())}))
+
+    data, content_type, variants = store.blobs[fields["profile_picture_id"]]
+    assert content_type == OUTPUT_CONTENT_TYPE
+    assert Image.open(io.BytesIO(data)).format == "WEBP"
+    assert fields["profile_picture"] == f"/api/pictures/{fields['profile_picture_id']}"
+    # Stored with its thumbnails, like an upload
+    assert sorted(map(int, variants)) == list(THUMBNAIL_SIZES)
+    assert set(variants.values()) == set(store.blobs)
+    assert all(store.blobs[blob_id][1] == OUTPUT_CONTENT_TYPE for blob_id in variants.values())
+
+def test_metadata_is_stripped_from_data_url_pictures(store):
+    exif = Image.Exif()
+    exif[0x010F] = "SecretCam"
+    output = io.BytesIO()
+    Image.new("RGB", (32, 32)).save(output, "JPEG", exif=exif)
+
+    fields = asyncio.run(store_profile_picture({"profile_picture": data_url("image/jpeg", output.getvalue())}))
+    assert b"SecretCam" not in store.blobs[fields["profile_picture_id"]][0]
+
+def test_oversized_data_url_is_refused_before_decoding(store, monkeypatch):
+    def no_decode(value):
+        raise AssertionError("decoded an oversized picture")
+
+    monkeypatch.setattr(blobs, "parse_data_url", no_decode)
+    value = "data:image/png;base64," + "A" * (MAX_UPLOAD_BYTES * 4 // 3 + 4096)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(store_profile_picture({"profile_picture": value}))
+    assert raised.value.status_code == 413
+
+@pytest.mark.parametrize("value", [
+    data_url("text/html", b"<script>alert(1)</script>"),
+    data_url("image/svg+xml", b"<svg onload='alert(1)'/>"),
+    # Declared as a PNG, but it is not one
+    data_url("image/png", b"<script>alert(1)</script>"),
+    # A PNG declared as something that is never decoded
+    data_url("application/octet-stream", png()),
+    "data:text/html,<script>alert(1)</script>",
+])
+def test_anything_but_a_raster_image_is_rejected(store, value):
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(store_profile_picture({"profile_picture": value}))
+    assert raised.value.status_code == 400
+    assert store.blobs == {}
+
+def test_stored_and_external_pictures_are_referenced(store):
+    blob_id = "ab" * 32
+
+    fields = asyncio.run(store_profile_picture({"profile_picture": f"https://api.example/api/pictures/{blob_id}"}))
+    assert (fields["profile_picture_id"], fields["profile_picture"]) == (blob_id, f"/api/pictures/{blob_id}")
+
+    fields = asyncio.run(store_profile_picture({"profile_picture": "https://cdn.example/me.jpg"}))
+    assert (fields["profile_picture_id"], fields["profile_picture"]) == (None, "https://cdn.example/me.jpg")
+    assert asyncio.run(store_profile_picture({"name": "Ann"})) == {"name": "Ann"}
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=0-5000", (0, 999)),
+    ("items=0-1", None),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 1000) == expected
+
+def test_unsatisfiable_range():
+    with pytest.raises(ValueError):
+        parse_byte_range("bytes=1000-", 1000)
+
+def test_pick_variant():
+    info = BlobInfo("big", 10, OUTPUT_CONTENT_TYPE, {"64": "s", "256": "m", "512": "big"})
+
+    assert [pick_variant(info, size) for size in (10, 64, 65, 1000)] == ["s", "s", "m", "big"]
+    assert pick_variant(BlobInfo("only", 10, OUTPUT_CONTENT_TYPE), 64) == "only"
@@ -0,0 +1,199 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.datastructures import QueryParams
+
+import cache
+import server
+import stats
+import versions
+from cache import ENTRY_OVERHEAD_BYTES, ResponseCache
+from categories import CategoryMap
+from responses import FastJSONResponse
+
+USER = "u1"
+
+def response(size: int) -> FastJSONResponse:
+    """A response whose cache entry is exactly `size` bytes."""
+    return FastJSONResponse("x" * (size - ENTRY_OVERHEAD_BYTES - 2))
+
+def params(query: str = "") -> QueryParams:
+    return QueryParams(query)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_hit_returns_the_stored_body_for_the_same_version():
+    responses = ResponseCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000)
+    stored = FastJSONResponse([{"name": "Ann"}], headers={"ETag": '"1-abc"'})
+    responses.put(USER, "contacts", params("b=2&a=1"), stored, version=1)
+
+    hit = responses.get(USER, "contacts", params("a=1&b=2"), version=1)
+    assert hit.body == stored.body
+    assert hit.headers["etag"] == '"1-abc"'
+    assert hit.media_type == "application/json"
+    assert responses.get(USER, "contacts", params("a=1"), version=1) is None
+    assert responses.get("u2", "contacts", params("a=1&b=2"), version=1) is None
+
+def test_a_newer_data_version_misses_and_drops_the_entry():
+    responses = ResponseCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000)
+    responses.put(USER, "contacts", params(), response(1000), version=1)
+
+    # Another worker wrote and bumped the version; this process was never told
+    assert responses.get(USER, "contacts", params(), version=2) is None
+    assert responses.stats()["entries"] == 0
+    assert responses.size == 0
+
+def test_entries_expire_after_the_ttl(clock):
+    responses = ResponseCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000)
+    responses.put(USER, "contacts", params(), response(1000), version=1)
+
+    clock[0] += 59
+    assert responses.get(USER, "contacts", params(), version=1) is not None
+    clock[0] += 1
+    assert responses.get(USER, "contacts", params(), version=1) is None
+    assert responses.stats() == {"entries": 0, "bytes": 0, "hits": 1, "misses": 1, "evictions": 1}
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    responses = ResponseCache(max_bytes=3000, ttl=60, max_entry_bytes=3000)
+    for name in ("a", "b", "c"):
+        responses.put(USER, name, params(), response(1000), version=1)
+    # Reading "a" makes "b" the least recently used
+    assert responses.get(USER, "a", params(), version=1) is not None
+
+    responses.put(USER, "d", params(), response(1000), version=1)
+    assert [key[1] for key in responses.entries] == ["c", "a", "d"]
+    assert responses.size == 3000
+
+    responses.put(USER, "e", params(), response(2000), version=1)
+    assert [key[1] for key in responses.entries] == ["d", "e"]
+
+def test_oversized_entries_are_not_stored():
+    responses = ResponseCache(max_bytes=10_000, ttl=60, max_entry_bytes=1000)
+    responses.put(USER, "small", params(), response(1000), version=1)
+    responses.put(USER, "big", params(), response(1001), version=1)
+
+    assert [key[1] for key in responses.entries] == ["small"]
+
+def test_replacing_an_entry_keeps_the_size_right():
+    responses = ResponseCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000)
+    responses.put(USER, "contacts", params(), response(1000), version=1)
+    responses.put(USER, "contacts", params(), response(2000), version=2)
+
+    assert responses.size == 2000
+    assert responses.get(USER, "contacts", params(), version=2) is not None
+
+def test_invalidate_user_drops_only_that_users_entries():
+    responses = ResponseCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000)
+    responses.put(USER, "contacts", params(), response(1000), version=1)
+    responses.put(USER, "categories", None, response(1000), version=1)
+    responses.put("u2", "contacts", params(), response(1000), version=1)
+
+    responses.invalidate_user(USER)
+    assert [key[0] for key in responses.entries] == ["u2"]
+    assert responses.keys_by_user == {"u2": {("u2", "contacts", ())}}
+    assert responses.size == 1000
+
+def test_disabled_cache_stores_nothing():
+    responses = ResponseCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000, enabled=False)
+    responses.put(USER, "contacts", params(), response(1000), version=1)
+
+    assert responses.get(USER, "contacts", params(), version=1) is None
+    assert not responses.entries
+
+class FakeStats:
+    """The user_stats collection, as far as data versions and $inc go."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["user_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["user_id"])
+        if doc is None:
+            doc = self.docs[query["user_id"]] = {"user_id": query["user_id"], **update.get("$setOnInsert", {})}
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda doc: doc.get(field), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs
+
+class FakeContacts:
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query, projection):
+        return _Cursor([
+            {key: value for key, value in doc.items() if key not in ("_id", "search_tokens", "phone_e164")}
+            for doc in self.docs if all(doc.get(field) == value for field, value in query.items())
+        ])
+
+    async def insert_one(self, doc):
+        doc["_id"] = len(self.docs)
+        self.docs.append(dict(doc))
+
+@pytest.fixture
+def api(monkeypatch):
+    """The app over in-memory contacts and stats, with a fresh response cache."""
+    stats_docs, contacts = FakeStats(), FakeContacts()
+    categories = CategoryMap([{"category_id": "cat-general", "name": "General"}])
+
+    async def category_map(user_id, version=None):
+        return categories
+
+    async def category_ids(user_id, names):
+        return {name or "General": "cat-general" for name in names}
+
+    monkeypatch.setattr(versions, "stats_collection", stats_docs)
+    monkeypatch.setattr(stats, "stats_collection", stats_docs)
+    monkeypatch.setattr(server, "contacts_collection", contacts)
+    monkeypatch.setattr(server, "category_map", category_map)
+    monkeypatch.setattr(server, "category_ids", category_ids)
+    monkeypatch.setattr(server, "response_cache", ResponseCache(10_000_000, 300, 1_000_000))
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    yield TestClient(server.app), contacts, stats_docs
+    server.app.dependency_overrides.clear()
+
+def names(client):
+    response = client.get("/api/contacts")
+    assert response.status_code == 200
+    return [contact["name"] for contact in response.json()]
+
+def test_cached_contacts_list_is_not_stale_after_a_write(api):
+    client, _, _ = api
+    assert names(client) == []
+    assert names(client) == []
+    assert server.response_cache.hits == 1
+
+    assert client.post("/api/contacts", json={"name": "Ann"}).status_code == 201
+    assert names(client) == ["Ann"]
+
+def test_write_from_another_worker_is_not_served_stale(api):
+    client, contacts, stats_docs = api
+    assert client.post("/api/contacts", json={"name": "Ann"}).status_code == 201
+    assert names(client) == ["Ann"]
+    assert names(client) == ["Ann"]
+    assert server.response_cache.hits == 1
+
+    # Written by another process: this process's cache is not invalidated,
+    # only the shared data version moves
+    contacts.docs.append({"user_id": USER, "contact_id": "c2", "name": "Bo", "category_id": "cat-general"})
+    stats_docs.docs[USER]["data_version"] += 1
+    assert names(client) == ["Ann", "Bo"]
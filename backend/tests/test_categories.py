@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime
+
+import categories
+from categories import DEFAULT_CATEGORY, CategoryMap, store_category_id, with_category_names
+
+DOCS = [
+    {"category_id": "g", "name": DEFAULT_CATEGORY, "created_at": datetime(2024, 1, 1)},
+    {"category_id": "w", "name": "Work", "created_at": datetime(2024, 1, 2)},
+    {"category_id": "w2", "name": "Work", "created_at": datetime(2024, 1, 3)},
+]
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+class FakeCategories:
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+
+    def find(self, query, projection=None):
+        self.reads += 1
+        return _Cursor(self.docs)
+
+def test_category_map_looks_up_by_id_and_name():
+    mapping = CategoryMap(DOCS)
+
+    assert mapping.name("w") == "Work"
+    assert mapping.name("gone") is None
+    # The oldest of two same-named categories wins
+    assert mapping.id_for("Work") == "w"
+    assert mapping.id_for(None) == "g"
+
+def test_store_category_id_swaps_the_name_for_its_id():
+    ids = {"Work": "w", DEFAULT_CATEGORY: "g"}
+
+    assert store_category_id({"name": "Ann", "category": "Work"}, ids) == {"name": "Ann", "category_id": "w"}
+    assert store_category_id({"name": "Bo", "category": None}, ids) == {"name": "Bo", "category_id": "g"}
+
+def test_with_category_names_reads_current_names():
+    contacts = [{"category_id": "w"}, {"category_id": "gone"}, {"name": "legacy"}]
+
+    with_category_names(contacts, CategoryMap([{"category_id": "w", "name": "Office"}]))
+    assert contacts == [{"category_id": "w", "category": "Office"}, {"category_id": "gone", "category": None},
+                        {"name": "legacy"}]
+
+def test_category_map_is_cached_per_data_version(monkeypatch):
+    fake = FakeCategories(list(reversed(DOCS)))
+    monkeypatch.setattr(categories, "categories_collection", fake)
+    monkeypatch.setattr(categories, "_maps", categories.OrderedDict())
+
+    first = asyncio.run(categories.category_map("u1", version=3))
+    assert asyncio.run(categories.category_map("u1", version=3)) is first
+    assert fake.reads == 1
+    # Sorted by creation even though the query returned them newest first
+    assert first.id_for("Work") == "w"
+
+    fake.docs = [{"category_id": "w", "name": "Office", "created_at": datetime(2024, 1, 2)}]
+    assert asyncio.run(categories.category_map("u1", version=4)).name("w") == "Office"
+    assert fake.reads == 2
+
+def test_category_maps_are_bounded(monkeypatch):
+    monkeypatch.setattr(categories, "categories_collection", FakeCategories(DOCS))
+    monkeypatch.setattr(categories, "_maps", categories.OrderedDict())
+    monkeypatch.setattr(categories, "CATEGORY_MAP_USERS", 2)
+
+    for user_id in ("u1", "u2", "u3"):
+        asyncio.run(categories.category_map(user_id, version=1))
+    assert list(categories._maps) == ["u2", "u3"]
@@ -0,0 +1,87 @@
+import pytest
+
+from duplicates import blocking_keys, find_duplicate_pairs, merged_fields, score_pair, soundex
+from normalize import normalize_name
+
+def contact(contact_id, name, phones=(), emails=(), **fields):
+    return {
+        "contact_id": contact_id,
+        "name": name,
+        "name_key": normalize_name(name),
+        "phones": [{"number": number, "label": "mobile"} for number in phones],
+        "emails": [{"email": email, "label": "personal"} for email in emails],
+        **fields,
+    }
+
+def pair_ids(pairs):
+    return {tuple(sorted(c["contact_id"] for c in pair["contacts"])) for pair in pairs}
+
+@pytest.mark.parametrize("word, code", [
+    ("robert", "R163"), ("rupert", "R163"), ("ashcraft", "A261"), ("tymczak", "T522"),
+    ("pfister", "P236"), ("honeyman", "H555"), ("lee", "L000"), ("john", "J500"), ("jon", "J500"), ("", ""),
+])
+def test_soundex(word, code):
+    assert soundex(word) == code
+
+def test_blocking_keys_use_e164_phones_emails_and_both_name_orders():
+    a = contact("a", "John Smith", phones=["(415) 555-0100"], emails=["John@Example.com"])
+    b = contact("b", "Smith, Jon", phones=["+1 415 555 0100"], emails=["john@example.com"])
+
+    assert blocking_keys(a) == blocking_keys(b) == {
+        "phone:+14155550100", "email:john@example.com", "name:J500:S530",
+    }
+
+def test_contacts_without_phone_e164_are_normalized_on_the_fly():
+    stored = contact("a", "Ann", phones=["415-555-0100"], phone_e164=["+14155550100"])
+    legacy = contact("b", "Ann", phones=["415-555-0100"])
+
+    assert "phone:+14155550100" in blocking_keys(stored) & blocking_keys(legacy)
+
+def test_score_pair_reasons():
+    a = contact("a", "John Smith", phones=["+14155550100"], emails=["j@example.com"])
+
+    assert score_pair(a, contact("b", "John Smith", phones=["415 555 0100"], emails=["J@example.com"])) == (
+        1.0, ["phone", "email", "name"]
+    )
+    score, reasons = score_pair(a, contact("c", "Jon Smith"))
+    assert reasons == ["name"] and 0.5 < score < 0.6
+    assert score_pair(a, contact("d", "Zed Quux", phones=["+14155550100"]))[1] == ["phone"]
+
+def test_find_duplicate_pairs_only_compares_within_blocks():
+    contacts = [
+        contact("1", "John Smith", phones=["+14155550100"]),
+        contact("2", "Jon Smith", phones=["(415) 555-0100"]),
+        contact("3", "Maria Rossi", emails=["maria@example.com"]),
+        contact("4", "M. Rossi", emails=["MARIA@example.com"]),
+        contact("5", "Unrelated Person", phones=["+12125550199"]),
+    ]
+
+    pairs, stats = find_duplicate_pairs(contacts, min_score=0.6)
+
+    assert pair_ids(pairs) == {("1", "2"), ("3", "4")}
+    assert stats == {"contacts": 5, "compared": 2, "skipped_blocks": 0}
+    assert [pair["score"] for pair in pairs] == sorted((pair["score"] for pair in pairs), reverse=True)
+
+def test_oversized_blocks_are_skipped():
+    # A shared switchboard number would otherwise compare everyone with everyone
+    contacts = [contact(str(i), f"Person{i} Name{i}", phones=["+14155550000"]) for i in range(6)]
+
+    pairs, stats = find_duplicate_pairs(contacts, min_score=0.0, max_block_size=5)
+
+    assert pairs == []
+    # The phone block, and the name block: Person/Name code the same for everyone
+    assert stats["compared"] == 0 and stats["skipped_blocks"] == 2
+
+def test_merged_fields_keeps_distinct_values():
+    primary = contact("p", "John Smith", phones=["(415) 555-0100"], emails=["j@example.com"], notes="first",
+                      profile_picture=None)
+    duplicate = contact("d", "Jon Smith", phones=["+1 415 555 0100", "+12125550199"],
+                        emails=["J@EXAMPLE.COM", "jon@work.example"], notes="second",
+                        profile_picture="/api/pictures/" + "a" * 64)
+
+    fields = merged_fields(primary, [duplicate])
+
+    assert [p["number"] for p in fields["phones"]] == ["(415) 555-0100", "+12125550199"]
+    assert [e["email"] for e in fields["emails"]] == ["j@example.com", "jon@work.example"]
+    assert fields["notes"] == "first\nsecond"
+    assert fields["profile_picture"] == duplicate["profile_picture"]
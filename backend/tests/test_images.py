@@ -0,0 +1,144 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image, UnidentifiedImageError
+
+from images import (
+    MULTIPART_OVERHEAD, THUMBNAIL_SIZES, UploadLimitMiddleware, process_image, read_limited, render_variants
+)
+
+LIMIT = 1000
+
+class RecordingApp:
+    """Reads the whole body like a multipart parser, then answers 200."""
+
+    def __init__(self):
+        self.body = b""
+        self.disconnected = False
+
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self.disconnected = True
+                break
+            self.body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+def call(middleware, path, chunks, content_length=None):
+    headers = [(b"content-length", str(content_length).encode())] if content_length is not None else []
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return next(m["status"] for m in sent if m["type"] == "http.response.start"), sent
+
+def test_body_within_the_limit_passes_through():
+    app = RecordingApp()
+    status, _ = call(UploadLimitMiddleware(app, ["/upload"], LIMIT), "/upload", [b"a" * 500, b"b" * 500], 1000)
+
+    assert status == 200
+    assert app.body == b"a" * 500 + b"b" * 500
+
+def test_large_content_length_is_refused_before_reading():
+    app = RecordingApp()
+    status, _ = call(UploadLimitMiddleware(app, ["/upload"], LIMIT), "/upload", [b"x"],
+                     LIMIT + MULTIPART_OVERHEAD + 1)
+
+    assert status == 413
+    assert app.body == b""
+
+def test_body_without_content_length_is_cut_off():
+    app = RecordingApp()
+    chunk = b"x" * 4096
+    chunks = [chunk] * ((LIMIT + MULTIPART_OVERHEAD) // len(chunk) + 5)
+    status, sent = call(UploadLimitMiddleware(app, ["/upload"], LIMIT), "/upload", chunks)
+
+    assert status == 413
+    assert app.disconnected
+    assert len(app.body) <= LIMIT + MULTIPART_OVERHEAD
+    # Only the 413 reaches the client, not the app's own answer
+    assert [m.get("status") for m in sent if m["type"] == "http.response.start"] == [413]
+
+def test_other_paths_are_not_limited():
+    app = RecordingApp()
+    status, _ = call(UploadLimitMiddleware(app, ["/upload"], LIMIT), "/other", [b"x" * 50000], 50000)
+
+    assert status == 200
+    assert len(app.body) == 50000
+
+def test_read_limited():
+    upload = UploadFile(io.BytesIO(b"x" * 100), filename="a.png")
+    assert asyncio.run(read_limited(upload, 100)) == b"x" * 100
+
+    upload = UploadFile(io.BytesIO(b"x" * 101), filename="a.png")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(read_limited(upload, 100))
+    assert raised.value.status_code == 413
+
+def encode(image: Image.Image, format: str, **params) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format, **params)
+    return output.getvalue()
+
+def test_variants_come_out_at_every_size():
+    variants = render_variants(encode(Image.new("RGB", (2000, 1000), "red"), "JPEG"))
+
+    assert sorted(variants) == list(THUMBNAIL_SIZES)
+    for size, data in variants.items():
+        with Image.open(io.BytesIO(data)) as image:
+            assert (image.format, image.size) == ("WEBP", (size, size // 2))
+
+def test_orientation_is_applied_and_metadata_dropped():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90 degrees clockwise to display
+    exif[0x010F] = "SecretCam"
+    variants = render_variants(encode(Image.new("RGB", (1200, 600)), "JPEG", exif=exif))
+
+    with Image.open(io.BytesIO(variants[512])) as image:
+        assert image.size == (256, 512)
+        assert b"SecretCam" not in variants[512]
+
+def test_palette_images_keep_transparency():
+    image = Image.new("P", (100, 100))
+    variants = render_variants(encode(image, "GIF", transparency=0))
+
+    with Image.open(io.BytesIO(variants[64])) as thumbnail:
+        assert thumbnail.mode == "RGBA"
+
+def test_images_over_the_pixel_limit_are_refused(monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100 * 100)
+    data = encode(Image.new("L", (120, 120)), "PNG")
+
+    # Between one and two times the limit Pillow only warns
+    with pytest.raises(Image.DecompressionBombWarning):
+        render_variants(data)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 60 * 60)
+    with pytest.raises(Image.DecompressionBombError):
+        render_variants(data)
+
+def test_other_formats_are_not_decoded():
+    with pytest.raises(UnidentifiedImageError):
+        render_variants(encode(Image.new("RGB", (10, 10)), "BMP"))
+
+def test_decompression_bomb_is_a_400():
+    # A few KB of PNG that decodes to far more pixels than the limit
+    data = encode(Image.new("1", (8000, 8000)), "PNG", optimize=True)
+    assert len(data) < 100 * 1024
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(process_image(data))
+    assert raised.value.status_code == 400
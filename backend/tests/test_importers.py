@@ -0,0 +1,75 @@
+import io
+import json
+import re
+
+import pytest
+
+import importers
+from importers import ImportFileError, RowError, _JSONArrayReader, contact_from_fields, iter_json_array
+
+DOCUMENT = [
+    {"name": "Ann [work], \"AJ\"", "phones": [{"number": "+1 415 555 0100"}], "notes": "a\nb\\c"},
+    12345678901234567890,
+    -0.5e10,
+    True,
+    None,
+    "Zoë 🦊 ,]",
+    [[], {}, [1, [2, [3]]]],
+    {"emails": [{"email": "x@example.com", "label": "work"}], "category": "Friends"},
+]
+
+def read_all(text: str, chunk_size: int):
+    return list(_JSONArrayReader(io.StringIO(text), chunk_size=chunk_size))
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64, 4096])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_elements_survive_every_chunk_boundary(chunk_size, indent):
+    # Every split point falls inside some string, number, literal or separator
+    text = json.dumps(DOCUMENT, indent=indent, ensure_ascii=False)
+
+    assert read_all(text, chunk_size) == DOCUMENT
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+def test_number_at_end_of_chunk_is_not_cut_short(chunk_size):
+    # 123 must not be read as 1 or 12 when the chunk ends mid-number
+    assert read_all("[1,123,45678]", chunk_size) == [1, 123, 45678]
+
+@pytest.mark.parametrize("text", ["[]", "  [ ]  ", "\n[\n]\n"])
+def test_empty_array(text):
+    assert read_all(text, 1) == []
+
+def test_elements_are_yielded_before_the_array_is_read():
+    stream = io.StringIO("[" + ",".join(json.dumps({"name": f"N{i}"}) for i in range(10000)) + "]")
+    elements = iter_json_array(stream)
+
+    assert next(elements) == {"name": "N0"}
+    assert stream.tell() < len(stream.getvalue())
+
+@pytest.mark.parametrize("text, message", [
+    ('{"name": "Ann"}', "Expected one of '['"),
+    ("", "end of file"),
+    ('[{"name": "Ann"}', "end of file"),
+    ('[{"name": "Ann"} {"name": "Bo"}]', "Expected one of ',]'"),
+    ('[{"name": "Ann",]', "Expecting property name"),
+    ("[1,,2]", "Expecting value"),
+])
+def test_malformed_documents_raise_import_file_error(text, message):
+    with pytest.raises(ImportFileError, match=re.escape(message)):
+        read_all(text, 4)
+
+def test_oversized_element_is_rejected(monkeypatch):
+    monkeypatch.setattr(importers, "MAX_JSON_ITEM_SIZE", 100)
+    text = json.dumps([{"notes": "x" * 50}, {"notes": "x" * 500}])
+
+    elements = iter(_JSONArrayReader(io.StringIO(text), chunk_size=16))
+    assert next(elements) == {"notes": "x" * 50}
+    with pytest.raises(ImportFileError, match="too large"):
+        list(elements)
+
+def test_contact_from_fields_validates_like_create():
+    contact = contact_from_fields("u1", {"name": " Ann ", "category": "Work", "unknown": "ignored", "notes": None})
+
+    assert contact.user_id == "u1"
+    assert contact.category == "Work"
+    with pytest.raises(RowError, match="name"):
+        contact_from_fields("u1", {"name": ""})
@@ -0,0 +1,32 @@
+import pytest
+
+from normalize import normalize_name, normalize_phone, normalize_phones
+
+@pytest.mark.parametrize("name, key", [
+    ("  José  Smith", "jose smith"),
+    ("JOSE\tSMITH", "jose smith"),
+    ("Straße", "strasse"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_name(name, key):
+    assert normalize_name(name) == key
+
+@pytest.mark.parametrize("number, region, e164", [
+    ("(415) 555-0100", "US", "+14155550100"),
+    ("+1 415.555.0100", "US", "+14155550100"),
+    ("415-555-0100 ext. 12", "US", "+14155550100"),
+    ("030 1234567", "DE", "+49301234567"),
+    ("+49 30 1234567", "US", "+49301234567"),
+])
+def test_normalize_phone(number, region, e164):
+    assert normalize_phone(number, region) == e164
+
+@pytest.mark.parametrize("number", ["", "not a number", "12", "+1 555"])
+def test_unreadable_phone_numbers_are_none(number):
+    assert normalize_phone(number, "US") is None
+
+def test_normalize_phones_is_distinct_and_sorted():
+    assert normalize_phones(["(415) 555-0100", "+14155550100", "junk", "+1 212 555 0100"]) == [
+        "+12125550100", "+14155550100",
+    ]
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, keyset_filter
+
+NAME_SORT = [("name", 1), ("contact_id", 1)]
+CREATED_SORT = [("created_at", -1), ("contact_id", -1)]
+
+def test_cursor_round_trips_strings_and_datetimes():
+    doc = {"name": "Zoë O'Brien", "created_at": datetime(2024, 5, 1, 12, 30, 15, 250000), "contact_id": "c-1"}
+
+    assert decode_cursor(encode_cursor(doc, NAME_SORT), NAME_SORT) == ["Zoë O'Brien", "c-1"]
+    assert decode_cursor(encode_cursor(doc, CREATED_SORT), CREATED_SORT) == [doc["created_at"], "c-1"]
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor({"name": "?" * 50 + "/+", "contact_id": "x"}, NAME_SORT)
+
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+def test_cursor_from_another_sort_order_is_rejected():
+    cursor = encode_cursor({"name": "Ann", "contact_id": "c-1"}, NAME_SORT)
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, CREATED_SORT)
+    # Same fields, other direction
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, [("name", -1), ("contact_id", -1)])
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "W10", "eyJrIjoibmFtZSxjb250YWN0X2lkIiwidiI6WzFdfQ"])
+def test_malformed_cursor_is_rejected(cursor):
+    # "W10" is [] and the last one {"k":"name,contact_id","v":[1]}: wrong shape, too few values
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, NAME_SORT)
+
+def test_keyset_filter_expands_ties_in_sort_order():
+    assert keyset_filter(NAME_SORT, ["Ann", "c-1"]) == {"$or": [
+        {"name": {"$gt": "Ann"}},
+        {"name": "Ann", "contact_id": {"$gt": "c-1"}},
+    ]}
+    when = datetime(2024, 1, 1)
+    assert keyset_filter(CREATED_SORT, [when, "c-1"]) == {"$or": [
+        {"created_at": {"$lt": when}},
+        {"created_at": when, "contact_id": {"$lt": "c-1"}},
+    ]}
+    assert keyset_filter([("contact_id", 1)], ["c-1"]) == {"contact_id": {"$gt": "c-1"}}
@@ -0,0 +1,25 @@
+import asyncio
+import os
+
+from pools import ProcessPool
+
+def test_work_runs_in_another_process_and_restarts_after_shutdown():
+    pool = ProcessPool(1)
+
+    async def pids():
+        return await pool.run(os.getpid)
+
+    try:
+        first = asyncio.run(pids())
+        assert first != os.getpid()
+        pool.shutdown()
+        assert pool._executor is None
+        assert asyncio.run(pids()) != os.getpid()
+    finally:
+        pool.shutdown()
+
+def test_unused_pool_starts_nothing():
+    pool = ProcessPool(2)
+    pool.shutdown()
+
+    assert pool._executor is None
@@ -0,0 +1,79 @@
+import re
+
+import pytest
+
+from search import MAX_NOTE_TOKENS, build_search_pipeline, contact_search_tokens, parse_search_terms
+
+def finds(query: str, name: str = "", phones=(), emails=(), notes: str = "") -> bool:
+    """Whether a search matches a contact, as the $match stage on search_tokens would."""
+    tokens = contact_search_tokens(name, phones, emails, notes)
+    terms = parse_search_terms(query)
+    return bool(terms) and all(any(token.startswith(term) for token in tokens) for term in terms)
+
+def score(pipeline, name_key: str) -> int:
+    """The _score stage of a search pipeline, evaluated for one name_key."""
+    total = 0
+    for part in pipeline[1]["$addFields"]["_score"]["$add"]:
+        if isinstance(part, int):
+            total += part
+        else:
+            condition, hit, _ = part["$cond"]
+            if re.search(condition["$regexMatch"]["regex"], name_key):
+                total += hit
+    return total
+
+@pytest.mark.parametrize("search, terms", [
+    ("Mary-Jane", ["mary", "jane"]),
+    ("Mary-", ["mary"]),
+    ("O'Brien", ["o", "brien"]),
+    ("St. John", ["st", "john"]),
+    ("  José   SMITH ", ["jose", "smith"]),
+    ("e-commerce e-commerce", ["e", "commerce"]),
+    ("(415) 555-0100", ["4155550100"]),
+    ("+1 415.555.0100", ["14155550100"]),
+    ("Jane.Doe@Example.com", ["jane.doe@example.com"]),
+    ("<jane@example.com>, bob", ["jane@example.com", "bob"]),
+    ("- . '", []),
+])
+def test_parse_search_terms(search, terms):
+    assert parse_search_terms(search) == terms
+
+@pytest.mark.parametrize("query, name, notes", [
+    ("mary-jane", "Mary-Jane Watson", ""),
+    ("Mary-", "Mary-Jane Watson", ""),
+    ("o'brien", "Conan O'Brien", ""),
+    ("st. john", "St. John Rivers", ""),
+    ("e-commerce", "Ann", "Runs an e-commerce shop"),
+    ("jose", "José Álvarez", ""),
+])
+def test_searches_with_punctuation_find_the_contact(query, name, notes):
+    assert finds(query, name, notes=notes)
+
+def test_phone_and_email_searches():
+    phones, emails = ["+1 (415) 555-0100"], ["Jane.Doe+work@Mail.Example.com"]
+
+    for query in ("0100", "555-0100", "4155550100", "jane", "doe", "work", "jane.doe+work@mail", "example"):
+        assert finds(query, "Jane Doe", phones, emails), query
+    assert not finds("9999", "Jane Doe", phones, emails)
+    assert not finds("jane smith", "Jane Doe", phones, emails)
+
+def test_contact_search_tokens():
+    tokens = contact_search_tokens("Mary-Jane O'Brien", ["415-555-0100"], ["mj@ex.org"], "VIP client")
+
+    assert {"mary", "jane", "o", "brien", "vip", "client"} <= set(tokens)
+    assert {"4155550100", "155550100", "0100"} <= set(tokens)
+    assert "100" not in tokens
+    assert {"mj@ex.org", "mj", "ex.org", "ex", "org"} <= set(tokens)
+    assert tokens == sorted(tokens)
+
+def test_note_tokens_are_bounded():
+    notes = " ".join(f"word{i}" for i in range(MAX_NOTE_TOKENS * 2))
+
+    assert len(contact_search_tokens("Ann", notes=notes)) == MAX_NOTE_TOKENS + 1
+
+def test_exact_and_leading_names_rank_first():
+    pipeline = build_search_pipeline("u1", parse_search_terms("mary-jane"))
+
+    assert pipeline[0]["$match"]["user_id"] == "u1"
+    scores = {key: score(pipeline, key) for key in ("mary-jane", "mary-jane watson", "anne mary-jane", "mary smith")}
+    assert scores["mary-jane"] > scores["mary-jane watson"] > scores["anne mary-jane"] > scores["mary smith"]
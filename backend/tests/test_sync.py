@@ -0,0 +1,35 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import TOMBSTONE_TTL_DAYS
+from pagination import encode_cursor
+from sync import SyncTokenExpired, contact_changes, decode_sync_token, encode_sync_token
+
+def test_token_round_trips_a_finished_sync():
+    since = datetime(2024, 5, 1, 12, 30)
+
+    assert decode_sync_token(encode_sync_token(since, None)) == (since, None, None)
+
+def test_token_round_trips_a_page_cut_short():
+    started = datetime(2024, 5, 1, 12, 30)
+    last = {"contact_id": "c9", "updated_at": datetime(2024, 5, 1, 12, 29), "name": "ignored"}
+
+    assert decode_sync_token(encode_sync_token(None, started, last)) == (None, started, [last["updated_at"], "c9"])
+
+@pytest.mark.parametrize("token", [
+    "not-a-token",
+    "",
+    # A contacts page cursor is not a sync token
+    encode_cursor({"name": "Ann", "contact_id": "c1"}, [("name", 1), ("contact_id", 1)]),
+])
+def test_malformed_tokens_raise_value_error(token):
+    with pytest.raises(ValueError):
+        decode_sync_token(token)
+
+def test_token_older_than_tombstones_has_expired():
+    since = datetime.utcnow() - timedelta(days=TOMBSTONE_TTL_DAYS + 1)
+
+    with pytest.raises(SyncTokenExpired):
+        asyncio.run(contact_changes("u1", encode_sync_token(since, None), 10, {}))
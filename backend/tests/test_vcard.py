@@ -0,0 +1,155 @@
+import base64
+import io
+
+import pytest
+
+from exporters import vcard_card
+from importers import ImportFileError, contact_fields_from_vcard, iter_vcards
+from vcard import FOLD_WIDTH, VCardError, escape, fold, iter_logical_lines, parse_line, split_value, unescape
+
+def logical_lines(text: str, max_length: int = 10000):
+    return [line for _, line in iter_logical_lines(io.StringIO(text), max_length)]
+
+def cards(text: str):
+    return list(iter_vcards(io.StringIO(text)))
+
+def test_folded_lines_are_unfolded_with_their_line_number():
+    text = "BEGIN:VCARD\r\nNOTE:first \r\n part\r\n\t and tab\r\nFN:Ann\r\nEND:VCARD\r\n"
+
+    assert list(iter_logical_lines(io.StringIO(text), 1000)) == [
+        (1, "BEGIN:VCARD"), (2, "NOTE:first part and tab"), (5, "FN:Ann"), (6, "END:VCARD"),
+    ]
+
+def test_quoted_printable_soft_breaks_join_lines():
+    text = "NOTE;ENCODING=QUOTED-PRINTABLE;CHARSET=UTF-8:Z=C3=B6e line=\r\n two=0D=0Athree\r\nFN:Ann\r\n"
+
+    lines = logical_lines(text)
+    assert lines == ["NOTE;ENCODING=QUOTED-PRINTABLE;CHARSET=UTF-8:Z=C3=B6e line two=0D=0Athree", "FN:Ann"]
+    assert parse_line(lines[0]).value == "Zöe line two\r\nthree"
+
+def test_plain_value_ending_in_equals_is_not_joined():
+    assert logical_lines("NOTE:a=\r\nFN:Ann\r\n") == ["NOTE:a=", "FN:Ann"]
+
+def test_overlong_lines_are_rejected_without_buffering_them():
+    with pytest.raises(VCardError, match="too long"):
+        logical_lines("PHOTO:" + "A" * 500, max_length=100)
+    with pytest.raises(VCardError, match="too long"):
+        logical_lines("PHOTO:" + "A" * 60 + "\r\n" + "".join(" " + "A" * 60 + "\r\n" for _ in range(3)), max_length=100)
+
+def test_parse_line_params_groups_and_quoted_colons():
+    prop = parse_line('item1.TEL;TYPE="work,voice";PREF=1:+1 415 555 0100')
+    assert (prop.name, prop.value, prop.types()) == ("TEL", "+1 415 555 0100", ["work", "voice"])
+
+    # vCard 2.1 bare types
+    assert parse_line("TEL;CELL;PREF:555").types() == ["cell", "pref"]
+    # A quoted parameter value may contain ":" and ";"
+    prop = parse_line('PHOTO;X-NOTE="a:b;c":http://example.com/p.jpg')
+    assert prop.params["X-NOTE"] == ["a:b;c"] and prop.value == "http://example.com/p.jpg"
+
+    with pytest.raises(VCardError):
+        parse_line("no value here")
+
+@pytest.mark.parametrize("value", ["plain", "a;b,c\\d", "line one\nline two", "", "trailing\\"])
+def test_escape_round_trips(value):
+    assert unescape(escape(value)) == value
+
+def test_split_value_respects_escapes():
+    assert split_value(r"Smith;John\;Jr;;Dr.;") == ["Smith", "John;Jr", "", "Dr.", ""]
+    assert split_value(r"Work\,Team,Friends", ",") == ["Work,Team", "Friends"]
+
+@pytest.mark.parametrize("line", [
+    "NOTE:" + "x" * 200,
+    "NOTE:" + "Zoë 🦊 " * 40,
+    "FN:short",
+])
+def test_fold_keeps_octet_width_and_unfolds_back(line):
+    folded = fold(line)
+    physical = folded.split("\r\n")[:-1]
+
+    assert all(len(part.encode("utf-8")) <= FOLD_WIDTH for part in physical)
+    assert all(part.startswith(" ") for part in physical[1:])
+    assert logical_lines(folded) == [line]
+
+def test_iter_vcards_yields_each_card_with_its_start_line():
+    text = "\r\nBEGIN:VCARD\r\nFN:Ann\r\nEND:VCARD\r\nbegin:vcard\r\nFN:Bo\r\n NUS\r\nend:vcard\r\n"
+
+    assert cards(text) == [(2, ["FN:Ann"]), (5, ["FN:BoNUS"])]
+
+@pytest.mark.parametrize("text, message", [
+    ("FN:Ann\r\n", "expected BEGIN:VCARD"),
+    ("BEGIN:VCARD\r\nFN:Ann\r\n", "no END:VCARD"),
+    ("BEGIN:VCARD\r\nFN:Ann\r\nBEGIN:VCARD\r\n", "no END:VCARD"),
+])
+def test_iter_vcards_rejects_broken_files(text, message):
+    with pytest.raises(ImportFileError, match=message):
+        cards(text)
+
+def test_contact_fields_from_vcard_21_quoted_printable_card():
+    text = (
+        "BEGIN:VCARD\r\nVERSION:2.1\r\n"
+        "N;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:M=C3=BCller;J=C3=BCrgen;;;\r\n"
+        "TEL;CELL;PREF:+49 30 1234567\r\nTEL;WORK:030 7654321\r\n"
+        "EMAIL;INTERNET;WORK:j@work.example\r\n"
+        "NOTE;ENCODING=QUOTED-PRINTABLE:first=0D=0A=\r\nsecond\r\n"
+        "END:VCARD\r\n"
+    )
+    (_, lines), = cards(text)
+
+    fields = contact_fields_from_vcard(lines)
+    assert fields["name"] == "Jürgen Müller"
+    assert fields["phones"] == [{"number": "+49 30 1234567", "label": "mobile"},
+                                {"number": "030 7654321", "label": "work"}]
+    assert fields["emails"] == [{"email": "j@work.example", "label": "work"}]
+    assert fields["notes"] == "first\r\nsecond"
+
+def test_contact_fields_from_vcard_40_card():
+    photo = base64.b64encode(b"\x89PNG fake").decode()
+    text = (
+        "BEGIN:VCARD\r\nVERSION:4.0\r\nFN:Ann\\, PhD\r\n"
+        'TEL;VALUE=uri;TYPE="home,voice":tel:+1-415-555-0100\r\n'
+        "EMAIL;TYPE=home:ann@example.com\r\nCATEGORIES:Friends,Work\r\n"
+        f"PHOTO:data:image/png;base64,{photo}\r\nEND:VCARD\r\n"
+    )
+    (_, lines), = cards(text)
+
+    fields = contact_fields_from_vcard(lines)
+    assert fields["name"] == "Ann, PhD"
+    assert fields["phones"] == [{"number": "+1-415-555-0100", "label": "home"}]
+    assert fields["emails"] == [{"email": "ann@example.com", "label": "personal"}]
+    assert fields["category"] == "Friends"
+    assert fields["profile_picture"] == f"data:image/png;base64,{photo}"
+
+def test_name_falls_back_to_n_then_org():
+    assert contact_fields_from_vcard(["N:Smith;John;;Dr.;"])["name"] == "Dr. John Smith"
+    assert contact_fields_from_vcard(["ORG:Acme;Sales"])["name"] == "Acme"
+
+@pytest.mark.parametrize("version", ["3.0", "4.0"])
+def test_exported_card_imports_back(version):
+    contact = {
+        "contact_id": "c1",
+        "name": "Zoë O'Brien-Smith",
+        "phones": [{"number": "+1 415 555 0100", "label": "mobile"}, {"number": "555-0199", "label": "work"}],
+        "emails": [{"email": "zoe@example.com", "label": "personal"}, {"email": "z@work.example", "label": "work"}],
+        "category": "Family",
+        "notes": "Likes; commas, and\nnew lines " + "long " * 30,
+    }
+    photo = ("image/webp", base64.b64encode(b"webp-bytes" * 40).decode())
+
+    (_, lines), = cards(vcard_card(contact, version, photo))
+    fields = contact_fields_from_vcard(lines)
+
+    for key in ("name", "phones", "emails", "category", "notes"):
+        assert fields[key] == contact[key]
+    assert fields["profile_picture"] == f"data:image/webp;base64,{photo[1]}"
+
+@pytest.mark.parametrize("line, kept", [
+    ("PHOTO;ENCODING=b;TYPE=JPEG:AAAA", True),
+    ("PHOTO;ENCODING=BASE64;PNG:AAAA", True),
+    ("PHOTO;ENCODING=b;TYPE=svg+xml:AAAA", False),
+    ("PHOTO;ENCODING=b;TYPE=text/html:AAAA", False),
+    ("PHOTO:data:image/webp;base64,AAAA", True),
+    ("PHOTO:data:text/html;base64,AAAA", False),
+    ("PHOTO;VALUE=uri:https://example.com/me.jpg", True),
+])
+def test_only_raster_photos_are_kept(line, kept):
+    assert (contact_fields_from_vcard(["FN:Ann", line]).get("profile_picture") is not None) == kept
@@ -0,0 +1,168 @@
+"""
+vCard (RFC 2426 / RFC 6350) content lines: unfolding, parsing, escaping and
+folding. Versions 3.0 and 4.0 are written; 2.1 files, which many phones
+still export, are read too (bare type parameters, quoted-printable values).
+"""
+
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+import quopri
+
+# Octets per physical line before folding, not counting CRLF (RFC 6350 3.2)
+FOLD_WIDTH = 75
+CRLF = "\r\n"
+
+class VCardError(ValueError):
+    """A line that cannot be read as a vCard property."""
+
+class Property(NamedTuple):
+    name: str
+    params: Dict[str, List[str]]
+    value: str
+
+    def types(self) -> List[str]:
+        # 4.0 may quote the list: TYPE="work,voice"
+        return [t.strip().lower() for value in self.params.get("TYPE", []) for t in value.split(",")]
+
+def iter_logical_lines(stream: TextIO, max_length: int) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (line number, unfolded line) pairs, reading one physical line at a
+    time. A line starting with a space or tab continues the previous one; a
+    2.1 quoted-printable value ending in "=" continues on the next line.
+    Raises VCardError for an unfolded line longer than `max_length`.
+    """
+    pending: Optional[str] = None
+    start = 0
+    # readline with a limit, so one enormous physical line is never buffered whole
+    lines = iter(lambda: stream.readline(max_length + 1), "")
+    for number, line in enumerate(lines, start=1):
+        if len(line) > max_length and not line.endswith(("\n", "\r")):
+            raise VCardError(f"line {number}: line too long")
+        line = line.rstrip("\r\n")
+        if pending is not None:
+            if pending.endswith("=") and _is_quoted_printable(pending):
+                pending = pending[:-1] + line
+            elif line[:1] in (" ", "\t"):
+                pending += line[1:]
+            else:
+                yield start, pending
+                pending, start = line, number
+            if len(pending) > max_length:
+                raise VCardError(f"line {start}: property too long")
+            continue
+        pending, start = line, number
+    if pending is not None:
+        yield start, pending
+
+def _is_quoted_printable(line: str) -> bool:
+    head = line.split(":", 1)[0].upper()
+    return "QUOTED-PRINTABLE" in head
+
+def _split_unquoted(text: str, separator: str) -> List[str]:
+    """Split on `separator` outside double quotes."""
+    if '"' not in text:
+        return text.split(separator)
+    parts, current, quoted = [], [], False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif char == separator and not quoted:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+def _value_start(line: str) -> int:
+    """Index of the ":" ending the name and parameters, which may quote a ":" of their own."""
+    quoted = False
+    # Only the short head is scanned; values (a whole photo) are never walked
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ":" and not quoted:
+            return index
+    return -1
+
+def parse_line(line: str) -> Property:
+    """Parse `[group.]NAME;PARAM=a,b;...:value`; raises VCardError if there is no value."""
+    colon = _value_start(line)
+    if colon < 0:
+        raise VCardError(f"Not a vCard property: {line[:40]!r}")
+    head, value = line[:colon], line[colon + 1:]
+    name, *raw_params = _split_unquoted(head, ";")
+    params: Dict[str, List[str]] = {}
+    for raw in raw_params:
+        key, sep, values = raw.partition("=")
+        if not sep:
+            # vCard 2.1: TEL;CELL;PREF:...
+            key, values = "TYPE", key
+        for item in _split_unquoted(values, ","):
+            params.setdefault(key.strip().upper(), []).append(item.strip().strip('"'))
+
+    if "QUOTED-PRINTABLE" in (v.upper() for v in params.get("ENCODING", [])):
+        charset = (params.get("CHARSET") or ["utf-8"])[0]
+        value = quopri.decodestring(value.encode("latin-1", "replace")).decode(charset, "replace")
+    return Property(name.rpartition(".")[2].upper(), params, value)
+
+def unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    out, chars = [], iter(value)
+    for char in chars:
+        if char == "\\":
+            following = next(chars, "")
+            out.append("\n" if following in ("n", "N") else following)
+        else:
+            out.append(char)
+    return "".join(out)
+
+def split_value(value: str, separator: str = ";") -> List[str]:
+    """Components of a structured (N, ADR) or list (CATEGORIES) value, unescaped."""
+    parts, current, escaped = [], [], False
+    for char in value:
+        if escaped:
+            current.append("\\" + char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == separator:
+            parts.append(unescape("".join(current)))
+            current = []
+        else:
+            current.append(char)
+    parts.append(unescape("".join(current)))
+    return parts
+
+def escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+def fold(line: str) -> str:
+    """Fold a content line at FOLD_WIDTH octets without splitting a UTF-8 character."""
+    if len(line) <= FOLD_WIDTH and line.isascii():
+        return line + CRLF
+    if line.isascii():
+        # Embedded photos: plain slicing is much faster than counting octets
+        chunks = [line[:FOLD_WIDTH]]
+        chunks += [line[i:i + FOLD_WIDTH - 1] for i in range(FOLD_WIDTH, len(line), FOLD_WIDTH - 1)]
+        return (CRLF + " ").join(chunks) + CRLF
+
+    chunks, current, size, width = [], [], 0, FOLD_WIDTH
+    for char in line:
+        octets = len(char.encode("utf-8"))
+        if size + octets > width:
+            chunks.append("".join(current))
+            # Continuation lines start with a space, which counts toward the width
+            current, size, width = [], 0, FOLD_WIDTH - 1
+        current.append(char)
+        size += octets
+    chunks.append("".join(current))
+    return (CRLF + " ").join(chunks) + CRLF
+
+def content_line(name: str, value: str, params: Optional[Dict[str, str]] = None) -> str:
+    """A folded `NAME;KEY=value:value` line; `value` must already be escaped."""
+    head = name + "".join(f";{key}={param}" for key, param in (params or {}).items())
+    return fold(f"{head}:{value}")
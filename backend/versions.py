@@ -0,0 +1,49 @@
+from typing import Dict
+import hashlib
+
+from fastapi import Request
+
+from database import stats_collection
+
+# Per-user counter stored on the user_stats document. It only ever increases:
+# every contact or category write bumps it, so (version, URL) names exactly one
+# response body and can be used as a strong ETag.
+DATA_VERSION_FIELD = "data_version"
+# Set when a write creates the stats document before its counts exist (a user
+# from before materialized stats); the next read recomputes them.
+NEEDS_RECONCILE_FIELD = "needs_reconcile"
+
+async def get_data_version(user_id: str) -> int:
+    """
+    Read this before querying the data it versions: writes bump the version
+    after they land, so a body can be newer than its version but never older.
+    """
+    doc = await stats_collection.find_one({"user_id": user_id}, {"_id": 0, DATA_VERSION_FIELD: 1})
+    return (doc or {}).get(DATA_VERSION_FIELD, 0)
+
+async def bump_data_version(user_id: str):
+    await stats_collection.update_one(
+        {"user_id": user_id},
+        {"$inc": {DATA_VERSION_FIELD: 1}, "$setOnInsert": {NEEDS_RECONCILE_FIELD: True}},
+        upsert=True
+    )
+
+def data_etag(request: Request, user_id: str, version: int) -> str:
+    # The same version renders differently per path and query (filters, pages, fields)
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.sha1(f"{user_id}:{request.url.path}?{query}".encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    # Browsers may keep the body but must revalidate it on every use
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -5,9 +5,11 @@ Tests all endpoints according to the review request specifications
 """
 
 import requests
+import base64
 import json
 import time
 import sys
+import uuid
 from typing import Dict, Any, Optional
 
 class ContactBookAPITester:
@@ -384,6 +386,403 @@ class ContactBookAPITester:
             error_msg = response.json().get("detail", "Unknown error") if response else "No response"
             self.log_test("Delete Contact", False, f"Contact deletion failed: {error_msg}")
 
+    def test_paginate_contacts(self):
+        """Keyset pagination: limit, X-Next-Cursor and fields"""
+        if not self.token:
+            self.log_test("Paginate Contacts", False, "No authentication token available")
+            return
+        
+        for i in range(3):
+            self.make_request("POST", "/api/contacts", {"name": f"Page Test {uuid.uuid4().hex[:8]} {i}"})
+        
+        first = self.make_request("GET", "/api/contacts", {"limit": 2, "fields": "name,category"})
+        if not first or first.status_code != 200:
+            self.log_test("Paginate Contacts", False, f"First page failed: {first.status_code if first else 'No response'}")
+            return
+        cursor = first.headers.get("X-Next-Cursor")
+        page = first.json()
+        extra_fields = {field for contact in page for field in contact} - {"contact_id", "name", "category", "category_id"}
+        if len(page) != 2 or not cursor or extra_fields:
+            self.log_test("Paginate Contacts", False, "Unexpected first page", {"page": page, "cursor": cursor})
+            return
+        
+        second = self.make_request("GET", "/api/contacts", {"limit": 2, "fields": "name,category", "cursor": cursor})
+        if not second or second.status_code != 200:
+            self.log_test("Paginate Contacts", False, f"Second page failed: {second.status_code if second else 'No response'}")
+            return
+        seen = {contact["contact_id"] for contact in page}
+        if any(contact["contact_id"] in seen for contact in second.json()):
+            self.log_test("Paginate Contacts", False, "Pages overlap", second.json())
+            return
+        self.log_test("Paginate Contacts", True, "Two pages of 2 contacts with a cursor between them")
+        
+        # A cursor only continues the sort it was issued for
+        mismatched = self.make_request("GET", "/api/contacts", {"limit": 2, "cursor": cursor, "sort_by": "created_at"})
+        # A 4xx response is falsy, so compare against None
+        if mismatched is not None and mismatched.status_code == 400:
+            self.log_test("Cursor Sort Mismatch", True, "Cursor from another sort order rejected")
+        else:
+            self.log_test("Cursor Sort Mismatch", False,
+                         f"Expected 400, got {mismatched.status_code if mismatched is not None else 'No response'}")
+
+    def test_import_json(self):
+        """Streaming JSON import: valid, duplicate and invalid elements"""
+        if not self.token:
+            self.log_test("Import JSON", False, "No authentication token available")
+            return
+        
+        name = f"Json Import {uuid.uuid4().hex[:8]}"
+        payload = json.dumps([
+            {"name": name, "phones": [{"number": "+14155550150", "label": "work"}], "category": "Work"},
+            {"name": name},
+            {"name": ""},
+            "not an object"
+        ])
+        response = self.make_request("POST", "/api/contacts/import/json",
+                                     files={"file": ("contacts.json", payload, "application/json")})
+        if response is not None and response.status_code == 200:
+            summary = response.json()
+            counts = (summary.get("imported"), summary.get("skipped"), summary.get("failed"))
+            if counts == (1, 1, 2) and [error["row"] for error in summary.get("errors", [])] == [3, 4]:
+                self.log_test("Import JSON", True, "1 imported, 1 duplicate skipped, 2 invalid rows reported")
+            else:
+                self.log_test("Import JSON", False, f"Unexpected import summary: {counts}", summary)
+        else:
+            error_msg = response.json().get("detail", "Unknown error") if response is not None else "No response"
+            self.log_test("Import JSON", False, f"JSON import failed: {error_msg}")
+        
+        response = self.make_request("POST", "/api/contacts/import/json",
+                                     files={"file": ("contacts.json", '{"name": "Not an array"}', "application/json")})
+        if response is not None and response.status_code == 400:
+            self.log_test("Import JSON Not An Array", True, "Non-array document rejected")
+        else:
+            self.log_test("Import JSON Not An Array", False,
+                         f"Expected 400, got {response.status_code if response is not None else 'No response'}")
+
+    def test_batch_operations(self):
+        """Batch create/update/delete with per-operation results"""
+        if not self.token:
+            self.log_test("Batch Operations", False, "No authentication token available")
+            return
+        
+        name = f"Batch {uuid.uuid4().hex[:8]}"
+        operations = [
+            {"op": "create", "data": {"name": name, "category": "Work"}},
+            {"op": "create", "data": {"name": f"{name} two", "category": [1]}},
+            {"op": "update", "contact_id": "does-not-exist", "data": {"notes": "x"}},
+            {"op": "create", "data": {"name": f"{name} three"}}
+        ]
+        response = self.make_request("POST", "/api/contacts/batch", {"operations": operations, "ordered": False})
+        if response is None or response.status_code != 200:
+            self.log_test("Batch Operations", False,
+                         f"Unordered batch failed: {response.status_code if response is not None else 'No response'}")
+            return
+        results = response.json()["results"]
+        if [result["status"] for result in results] != [201, 400, 404, 201]:
+            self.log_test("Batch Operations", False, "Unexpected unordered results", results)
+            return
+        created = [results[0]["contact_id"], results[3]["contact_id"]]
+        self.log_test("Batch Operations", True, "Unordered batch reported each operation separately")
+        
+        operations = [
+            {"op": "update", "contact_id": created[0], "data": {"notes": "batched"}},
+            {"op": "create", "data": {"name": name}},
+            {"op": "delete", "contact_id": created[1]}
+        ]
+        response = self.make_request("POST", "/api/contacts/batch", {"operations": operations, "ordered": True})
+        if response is None or response.status_code != 200:
+            self.log_test("Batch Ordered", False,
+                         f"Ordered batch failed: {response.status_code if response is not None else 'No response'}")
+            return
+        statuses = [result["status"] for result in response.json()["results"]]
+        # The duplicate name stops an ordered batch; the delete after it never runs
+        if statuses == [200, 400, 424]:
+            self.log_test("Batch Ordered", True, "Ordered batch stopped at the duplicate name")
+        else:
+            self.log_test("Batch Ordered", False, f"Unexpected ordered results: {statuses}", response.json())
+        self.make_request("POST", "/api/contacts/batch", {"operations": [
+            {"op": "delete", "contact_id": contact_id} for contact_id in created
+        ]})
+
+    def test_find_and_merge_duplicates(self):
+        """Duplicate detection across phone formats, then merge"""
+        if not self.token:
+            self.log_test("Find Duplicates", False, "No authentication token available")
+            return
+        
+        suffix = uuid.uuid4().hex[:8]
+        digits = f"{uuid.uuid4().int % 10000:04d}"
+        first = self.make_request("POST", "/api/contacts", {
+            "name": f"Dup {suffix} Person", "phones": [{"number": f"+1 212 555 {digits}", "label": "mobile"}]
+        })
+        second = self.make_request("POST", "/api/contacts", {
+            "name": f"Dupe {suffix} Person", "phones": [{"number": f"(212) 555-{digits}", "label": "work"}],
+            "emails": [{"email": f"dup_{suffix}@example.com", "label": "work"}]
+        })
+        if first is None or second is None or first.status_code != 201 or second.status_code != 201:
+            self.log_test("Find Duplicates", False, "Could not create the duplicate contacts")
+            return
+        ids = {first.json()["contact_id"], second.json()["contact_id"]}
+        
+        response = self.make_request("GET", "/api/contacts/duplicates", {"min_score": 0.6})
+        if response is None or response.status_code != 200:
+            self.log_test("Find Duplicates", False,
+                         f"Duplicates failed: {response.status_code if response is not None else 'No response'}")
+            return
+        found = [pair for pair in response.json()["pairs"]
+                 if {contact["contact_id"] for contact in pair["contacts"]} == ids]
+        if found and "phone" in found[0]["reasons"]:
+            self.log_test("Find Duplicates", True, f"Pair found with score {found[0]['score']}")
+        else:
+            self.log_test("Find Duplicates", False, "Planted pair not reported", response.json())
+            return
+        
+        primary_id, duplicate_id = first.json()["contact_id"], second.json()["contact_id"]
+        response = self.make_request("POST", "/api/contacts/merge",
+                                     {"primary_id": primary_id, "duplicate_ids": [duplicate_id]})
+        if response is None or response.status_code != 200:
+            self.log_test("Merge Contacts", False,
+                         f"Merge failed: {response.status_code if response is not None else 'No response'}")
+            return
+        merged = response.json()
+        gone = self.make_request("GET", f"/api/contacts/{duplicate_id}")
+        # The shared number is kept once; the email comes over from the duplicate
+        if (len(merged.get("phones", [])) == 1 and len(merged.get("emails", [])) == 1
+                and gone is not None and gone.status_code == 404):
+            self.log_test("Merge Contacts", True, "Duplicate folded into the primary contact and deleted")
+        else:
+            self.log_test("Merge Contacts", False, "Unexpected merge result", merged)
+        self.make_request("DELETE", f"/api/contacts/{primary_id}")
+
+    def test_vcard_import_export(self):
+        """vCard import (2.1 quoted-printable and folded 3.0 cards) and export round trip"""
+        if not self.token:
+            self.log_test("Import vCard", False, "No authentication token available")
+            return
+        
+        name = f"Vcard Import {uuid.uuid4().hex[:8]}"
+        payload = (
+            "BEGIN:VCARD\r\nVERSION:2.1\r\n"
+            f"N;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:M=C3=BCller;{name};;;\r\n"
+            "TEL;CELL;PREF:+14155550160\r\n"
+            "NOTE;ENCODING=QUOTED-PRINTABLE:first=0D=0A=\r\nsecond\r\n"
+            "END:VCARD\r\n"
+            "BEGIN:VCARD\r\nVERSION:3.0\r\n"
+            f"FN:{name} Folded\r\n"
+            "EMAIL;TYPE=INTERNET,WORK:folded@exam\r\n ple.com\r\n"
+            "END:VCARD\r\n"
+            "BEGIN:VCARD\r\nVERSION:3.0\r\nNOTE:no name\r\nEND:VCARD\r\n"
+        )
+        response = self.make_request("POST", "/api/contacts/import/vcard",
+                                     files={"file": ("contacts.vcf", payload, "text/vcard")})
+        if response is not None and response.status_code == 200:
+            summary = response.json()
+            counts = (summary.get("imported"), summary.get("skipped"), summary.get("failed"))
+            if counts == (2, 0, 1):
+                self.log_test("Import vCard", True, "2 cards imported, 1 card without a name reported")
+            else:
+                self.log_test("Import vCard", False, f"Unexpected import summary: {counts}", summary)
+        else:
+            error_msg = response.json().get("detail", "Unknown error") if response is not None else "No response"
+            self.log_test("Import vCard", False, f"vCard import failed: {error_msg}")
+        
+        response = self.make_request("GET", "/api/contacts/export/vcard?version=4.0")
+        if response is not None and response.status_code == 200:
+            # Unfold before looking for values that may have been split across lines
+            text = response.text.replace("\r\n ", "")
+            if f"FN:{name} Müller" in text and "folded@example.com" in text and "first\\nsecond" in text:
+                self.log_test("Export vCard", True, "Imported cards exported as vCard 4.0")
+            else:
+                self.log_test("Export vCard", False, "Imported contacts missing from the export")
+        else:
+            self.log_test("Export vCard", False,
+                         f"Expected 200, got {response.status_code if response is not None else 'No response'}")
+        
+        response = self.make_request("POST", "/api/contacts/import/vcard",
+                                     files={"file": ("contacts.vcf", "FN:No begin\r\n", "text/vcard")})
+        if response is not None and response.status_code == 400:
+            self.log_test("Import vCard Malformed", True, "File without BEGIN:VCARD rejected")
+        else:
+            self.log_test("Import vCard Malformed", False,
+                         f"Expected 400, got {response.status_code if response is not None else 'No response'}")
+
+    def test_contact_changes(self):
+        """Delta sync: full pass, then only new contacts and tombstones"""
+        if not self.token:
+            self.log_test("Delta Sync", False, "No authentication token available")
+            return
+        
+        token, pages = None, 0
+        while pages < 100:
+            endpoint = "/api/contacts/changes?limit=50" + (f"&since={token}" if token else "")
+            response = self.make_request("GET", endpoint)
+            if response is None or response.status_code != 200:
+                self.log_test("Delta Sync", False,
+                             f"Initial sync failed: {response.status_code if response is not None else 'No response'}")
+                return
+            page = response.json()
+            token, pages = page["next_token"], pages + 1
+            if not page["has_more"]:
+                break
+        
+        name = f"Sync {uuid.uuid4().hex[:8]}"
+        created = [self.make_request("POST", "/api/contacts", {"name": f"{name} {i}"}) for i in range(2)]
+        if any(response is None or response.status_code != 201 for response in created):
+            self.log_test("Delta Sync", False, "Could not create contacts to sync")
+            return
+        kept, removed = [response.json()["contact_id"] for response in created]
+        self.make_request("DELETE", f"/api/contacts/{removed}")
+        
+        response = self.make_request("GET", f"/api/contacts/changes?since={token}")
+        if response is not None and response.status_code == 200:
+            changes = response.json()
+            changed_ids = {contact["contact_id"] for contact in changes["contacts"]}
+            if kept in changed_ids and removed not in changed_ids and removed in changes["deleted"]:
+                self.log_test("Delta Sync", True, f"Full sync in {pages} page(s), then the new contact and one tombstone")
+            else:
+                self.log_test("Delta Sync", False, "Incremental sync missed a change", changes)
+        else:
+            self.log_test("Delta Sync", False,
+                         f"Incremental sync failed: {response.status_code if response is not None else 'No response'}")
+        self.make_request("DELETE", f"/api/contacts/{kept}")
+        
+        response = self.make_request("GET", "/api/contacts/changes?since=not-a-token")
+        if response is not None and response.status_code == 400:
+            self.log_test("Delta Sync Invalid Token", True, "Malformed sync token rejected")
+        else:
+            self.log_test("Delta Sync Invalid Token", False,
+                         f"Expected 400, got {response.status_code if response is not None else 'No response'}")
+
+    def test_phone_lookup(self):
+        """Reverse phone lookup matches numbers however they were typed"""
+        if not self.token:
+            self.log_test("Phone Lookup", False, "No authentication token available")
+            return
+        
+        # A number unique to this run, stored in local format
+        line = f"{uuid.uuid4().int % 10000:04d}"
+        contact_data = {
+            "name": f"Lookup {uuid.uuid4().hex[:8]}",
+            "phones": [{"number": f"(415) 555-{line}", "label": "work"}]
+        }
+        response = self.make_request("POST", "/api/contacts", contact_data)
+        if response is None or response.status_code != 201:
+            self.log_test("Phone Lookup", False, "Could not create a contact to look up")
+            return
+        contact_id = response.json()["contact_id"]
+        
+        response = self.make_request("GET", f"/api/contacts/lookup?phone=%2B1415555{line}")
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            if data.get("phone") == f"+1415555{line}" and contact_id in [c["contact_id"] for c in data["contacts"]]:
+                self.log_test("Phone Lookup", True, "E.164 number found the contact saved in local format")
+            else:
+                self.log_test("Phone Lookup", False, "Contact not found by its number", data)
+        else:
+            self.log_test("Phone Lookup", False,
+                         f"Lookup failed: {response.status_code if response is not None else 'No response'}")
+        
+        response = self.make_request("POST", "/api/contacts/lookup",
+                                     {"phones": [f"415.555.{line}", "+1 212 555 0199", "junk"]})
+        if response is not None and response.status_code == 200:
+            results = response.json()["results"]
+            matched = [contact_id in [c["contact_id"] for c in result["contacts"]] for result in results]
+            if matched == [True, False, False] and results[2]["phone"] is None:
+                self.log_test("Batch Phone Lookup", True, "Each input matched back to its own result")
+            else:
+                self.log_test("Batch Phone Lookup", False, "Unexpected lookup results", results)
+        else:
+            self.log_test("Batch Phone Lookup", False,
+                         f"Lookup failed: {response.status_code if response is not None else 'No response'}")
+        
+        response = self.make_request("GET", "/api/contacts/lookup?phone=junk")
+        if response is not None and response.status_code == 400:
+            self.log_test("Phone Lookup Invalid Number", True, "Unreadable number rejected")
+        else:
+            self.log_test("Phone Lookup Invalid Number", False,
+                         f"Expected 400, got {response.status_code if response is not None else 'No response'}")
+        self.make_request("DELETE", f"/api/contacts/{contact_id}")
+
+    def test_rename_and_delete_category(self):
+        """Renaming a category relabels its contacts; deleting one moves them elsewhere"""
+        if not self.token:
+            self.log_test("Rename Category", False, "No authentication token available")
+            return
+        
+        suffix = uuid.uuid4().hex[:8]
+        source = self.make_request("POST", f"/api/categories?name=Team%20{suffix}")
+        target = self.make_request("POST", f"/api/categories?name=Archive%20{suffix}")
+        if source is None or source.status_code != 201 or target is None or target.status_code != 201:
+            self.log_test("Rename Category", False, "Could not create categories")
+            return
+        source_id, target_id = source.json()["category_id"], target.json()["category_id"]
+        response = self.make_request("POST", "/api/contacts", {"name": f"Member {suffix}", "category": f"Team {suffix}"})
+        if response is None or response.status_code != 201:
+            self.log_test("Rename Category", False, "Could not create a contact in the category")
+            return
+        contact_id = response.json()["contact_id"]
+        
+        response = self.make_request("PUT", f"/api/categories/{source_id}?name=Crew%20{suffix}")
+        contact = self.make_request("GET", f"/api/contacts/{contact_id}")
+        if response is not None and response.status_code == 200 and contact is not None \
+                and contact.json().get("category") == f"Crew {suffix}":
+            self.log_test("Rename Category", True, "Contact shows the new category name")
+        else:
+            self.log_test("Rename Category", False, "Contact still shows the old category name",
+                          contact.json() if contact is not None else None)
+        
+        response = self.make_request("PUT", f"/api/categories/{source_id}?name=Archive%20{suffix}")
+        if response is not None and response.status_code == 400:
+            self.log_test("Rename Category Conflict", True, "Rename onto an existing name rejected")
+        else:
+            self.log_test("Rename Category Conflict", False,
+                         f"Expected 400, got {response.status_code if response is not None else 'No response'}")
+        
+        response = self.make_request("DELETE", f"/api/categories/{source_id}?reassign_to={target_id}")
+        contact = self.make_request("GET", f"/api/contacts/{contact_id}")
+        if response is not None and response.status_code == 204 and contact is not None \
+                and contact.json().get("category") == f"Archive {suffix}":
+            self.log_test("Delete Category Reassign", True, "Contacts moved to the chosen category")
+        else:
+            self.log_test("Delete Category Reassign", False, "Contact not moved to the chosen category",
+                          contact.json() if contact is not None else None)
+        
+        self.make_request("DELETE", f"/api/contacts/{contact_id}")
+        self.make_request("DELETE", f"/api/categories/{target_id}")
+
+    def test_upload_profile_picture(self):
+        """Picture upload stores resized variants; oversized bodies get a 413"""
+        if not self.token:
+            self.log_test("Upload Profile Picture", False, "No authentication token available")
+            return
+        
+        # An 8x8 PNG
+        png = base64.b64decode(
+            "iVBORw0KGgoAAAANSUhEUgAAAAgAAAAICAIAAABLbSncAAAAFElEQVR4nGM8ISfHgA0wYRUdtBIA0MoBFD5jqJkAAAAASUVORK5CYII="
+        )
+        response = self.make_request("POST", "/api/upload-profile-picture",
+                                     files={"file": ("face.png", png, "image/png")})
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            picture = self.make_request("GET", data["url"])
+            if picture is not None and picture.status_code == 200 \
+                    and picture.headers.get("content-type", "").startswith("image/"):
+                self.log_test("Upload Profile Picture", True, f"Stored with {len(data.get('variants', {}))} variant(s)")
+            else:
+                self.log_test("Upload Profile Picture", False, "Stored picture could not be fetched", data)
+        else:
+            error_msg = response.json().get("detail", "Unknown error") if response is not None else "No response"
+            self.log_test("Upload Profile Picture", False, f"Upload failed: {error_msg}")
+        
+        oversized = b"\0" * (11 * 1024 * 1024)
+        response = self.make_request("POST", "/api/upload-profile-picture",
+                                     files={"file": ("huge.png", oversized, "image/png")})
+        if response is not None and response.status_code == 413:
+            self.log_test("Upload Too Large", True, "Body over the upload limit rejected with 413")
+        else:
+            self.log_test("Upload Too Large", False,
+                         f"Expected 413, got {response.status_code if response is not None else 'No response'}")
+
     def run_all_tests(self):
         """Run all tests in sequence"""
         print("🚀 Starting Contact Book API Tests...")
@@ -403,6 +802,15 @@ class ContactBookAPITester:
         self.test_get_statistics()
         self.test_create_custom_category()
         self.test_duplicate_contact_detection()
+        self.test_paginate_contacts()
+        self.test_import_json()
+        self.test_batch_operations()
+        self.test_find_and_merge_duplicates()
+        self.test_vcard_import_export()
+        self.test_contact_changes()
+        self.test_phone_lookup()
+        self.test_rename_and_delete_category()
+        self.test_upload_profile_picture()
         self.test_delete_contact()
         
         # Summary
@@ -1,4 +1,5 @@
 import React from 'react';
+import { resolvePictureUrl } from '../services/api';
 
 const ContactCard = ({ contact, onEdit, onDelete }) => {
   const getInitials = (name) => {
@@ -26,7 +27,7 @@ const ContactCard = ({ contact, onEdit, onDelete }) => {
         <div className="flex items-center gap-3">
           {contact.profile_picture ? (
             <img
-              src={contact.profile_picture}
+              src={resolvePictureUrl(contact.profile_picture, 128)}
               alt={contact.name}
               className="w-14 h-14 rounded-full object-cover border-2 border-blue-500"
             />
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { uploadAPI } from '../services/api';
+import { uploadAPI, resolvePictureUrl } from '../services/api';
 
 const ContactForm = ({ contact, categories, onSubmit, onCancel }) => {
   const [formData, setFormData] = useState({
@@ -120,7 +120,7 @@ const ContactForm = ({ contact, categories, onSubmit, onCancel }) => {
       <div className="flex items-center gap-4">
         {formData.profile_picture ? (
           <img
-            src={formData.profile_picture}
+            src={resolvePictureUrl(formData.profile_picture, 256)}
             alt="Profile"
             className="w-20 h-20 rounded-full object-cover border-2 border-blue-500"
           />
@@ -11,11 +11,17 @@ import CategoryManager from '../components/CategoryManager';
 import ImportExport from '../components/ImportExport';
 import Stats from '../components/Stats';
 
+// Contacts are loaded a page at a time, with only the fields ContactCard and ContactForm use
+const PAGE_SIZE = 50;
+const CARD_FIELDS = 'contact_id,name,phones,emails,category,notes,profile_picture';
+
 const Dashboard = () => {
   const { user, logout } = useAuth();
   const { darkMode, toggleDarkMode } = useTheme();
   
   const [contacts, setContacts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [categories, setCategories] = useState([]);
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -37,14 +43,29 @@ const Dashboard = () => {
     fetchData();
   }, []);
 
+  // A cursor only continues the search, category and sort it was issued for
+  const fetchContacts = (cursor) => contactAPI.getAll({
+    search: searchQuery || undefined,
+    category: selectedCategory || undefined,
+    sort_by: sortBy,
+    limit: PAGE_SIZE,
+    fields: CARD_FIELDS,
+    cursor: cursor || undefined
+  });
+
+  const showFirstPage = (response) => {
+    setContacts(response.data);
+    setNextCursor(response.headers['x-next-cursor'] || null);
+  };
+
   const fetchData = async () => {
     try {
       const [contactsRes, categoriesRes, statsRes] = await Promise.all([
-        contactAPI.getAll(),
+        fetchContacts(),
         categoryAPI.getAll(),
         statsAPI.get()
       ]);
-      setContacts(contactsRes.data);
+      showFirstPage(contactsRes);
       setCategories(categoriesRes.data);
       setStats(statsRes.data);
     } catch (error) {
@@ -60,18 +81,25 @@ const Dashboard = () => {
 
   const handleSearch = async () => {
     try {
-      const params = {
-        search: searchQuery || undefined,
-        category: selectedCategory || undefined,
-        sort_by: sortBy
-      };
-      const response = await contactAPI.getAll(params);
-      setContacts(response.data);
+      showFirstPage(await fetchContacts());
     } catch (error) {
       showToast('Search failed', 'error');
     }
   };
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await fetchContacts(nextCursor);
+      setContacts(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      showToast('Failed to load more contacts', 'error');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     handleSearch();
   }, [searchQuery, selectedCategory, sortBy]);
@@ -234,7 +262,7 @@ const Dashboard = () => {
 
         <div className="mb-6 flex justify-between items-center">
           <h2 className="text-2xl font-bold text-gray-900 dark:text-white">
-            My Contacts ({contacts.length})
+            My Contacts ({contacts.length}{nextCursor ? '+' : ''})
           </h2>
           <button
             onClick={handleAddClick}
@@ -273,6 +301,18 @@ const Dashboard = () => {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="mt-6 text-center">
+            <button
+              onClick={handleLoadMore}
+              disabled={loadingMore}
+              className="px-6 py-3 bg-gray-100 dark:bg-gray-700 text-gray-700 dark:text-gray-200 font-semibold rounded-lg hover:bg-gray-200 dark:hover:bg-gray-600 transition-colors disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </main>
 
       <Modal
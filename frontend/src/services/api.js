@@ -17,6 +17,25 @@ export const contactAPI = {
   
   getOne: (id) => axios.get(`${API_URL}/api/contacts/${id}`, getAuthHeaders()),
   
+  // Delta sync: pass the previous response's next_token as `since`
+  getChanges: (since, limit) => axios.get(`${API_URL}/api/contacts/changes`, {
+    ...getAuthHeaders(),
+    params: { since, limit }
+  }),
+  
+  // Caller ID: contacts owning a phone number, in any common format
+  lookupPhone: (phone) => axios.get(`${API_URL}/api/contacts/lookup`, { ...getAuthHeaders(), params: { phone } }),
+  
+  getDuplicates: (minScore) => axios.get(`${API_URL}/api/contacts/duplicates`, {
+    ...getAuthHeaders(),
+    params: { min_score: minScore }
+  }),
+  
+  merge: (primaryId, duplicateIds) => axios.post(`${API_URL}/api/contacts/merge`, {
+    primary_id: primaryId,
+    duplicate_ids: duplicateIds
+  }, getAuthHeaders()),
+  
   create: (data) => axios.post(`${API_URL}/api/contacts`, data, getAuthHeaders()),
   
   update: (id, data) => axios.put(`${API_URL}/api/contacts/${id}`, data, getAuthHeaders()),
@@ -35,6 +54,12 @@ export const contactAPI = {
     return axios.post(`${API_URL}/api/contacts/import/csv`, formData, getAuthHeaders());
   },
   
+  importVCard: (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return axios.post(`${API_URL}/api/contacts/import/vcard`, formData, getAuthHeaders());
+  },
+  
   exportJSON: () => axios.get(`${API_URL}/api/contacts/export/json`, {
     ...getAuthHeaders(),
     responseType: 'blob'
@@ -43,6 +68,12 @@ export const contactAPI = {
   exportCSV: () => axios.get(`${API_URL}/api/contacts/export/csv`, {
     ...getAuthHeaders(),
     responseType: 'blob'
+  }),
+  
+  exportVCard: (version = '3.0') => axios.get(`${API_URL}/api/contacts/export/vcard`, {
+    ...getAuthHeaders(),
+    params: { version },
+    responseType: 'blob'
   })
 };
 
@@ -55,7 +86,22 @@ export const categoryAPI = {
     params: { name, color }
   }),
   
-  delete: (id) => axios.delete(`${API_URL}/api/categories/${id}`, getAuthHeaders())
+  update: (id, name, color) => axios.put(`${API_URL}/api/categories/${id}`, null, {
+    ...getAuthHeaders(),
+    params: { name, color }
+  }),
+  
+  delete: (id, reassignTo) => axios.delete(`${API_URL}/api/categories/${id}`, {
+    ...getAuthHeaders(),
+    params: { reassign_to: reassignTo }
+  })
+};
+
+// Stored pictures are served by the API under a relative /api/pictures/ path;
+// `size` picks the smallest pre-rendered thumbnail at least that many pixels wide
+export const resolvePictureUrl = (url, size) => {
+  if (!url || !url.startsWith('/')) return url;
+  return size ? `${API_URL}${url}?size=${size}` : `${API_URL}${url}`;
 };
 
 // File upload API